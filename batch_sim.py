@@ -0,0 +1,404 @@
+"""Пакетная симуляция тысяч партий змейки на NumPy.
+
+Все партии хранятся в массивах (тик посещения каждой клетки, голова,
+длина, счет, открытые пазлы) и продвигаются на один тик векторными
+операциями. Правила совпадают с snake_core.Snake / snake_core.Food:
+столкновение считается по всему телу вместе с хвостом, пазл
+открывается каждые POINTS_PER_PUZZLE очков, уровень открывается,
+когда всего пазлов собрано не меньше puzzles_needed. Еда и
+препятствия уровня - как в snake_core.SnakeGame: food_count единиц
+еды, неподвижные препятствия и препятствия, которые раз в
+MOVING_OBSTACLE_PERIOD тиков шагают в свободную клетку или
+разворачиваются.
+
+Используется для подбора редкости еды и порогов открытия уровней.
+"""
+import numpy as np
+
+from snake_core import (FOOD_TYPES, LEVELS, MOVING_OBSTACLE_PERIOD, OBSTACLE_SAFE_DISTANCE,
+                        POINTS_PER_PUZZLE, PUZZLES_PER_LEVEL, get_loot_table)
+
+# Направления в том же порядке, что snake_core.UP/DOWN/LEFT/RIGHT
+UP, DOWN, LEFT, RIGHT = 0, 1, 2, 3
+NO_ACTION = -1
+DIRECTIONS = np.array([[0, -1], [0, 1], [-1, 0], [1, 0]], dtype=np.int64)
+OPPOSITE = np.array([DOWN, UP, RIGHT, LEFT], dtype=np.int32)
+# Новое направление по текущему и желаемому: TURN[direction * 5 + action + 1].
+# NO_ACTION и разворот назад направление не меняют.
+TURN = np.array([[direction if action in (NO_ACTION, OPPOSITE[direction]) else action
+                  for action in range(NO_ACTION, 4)]
+                 for direction in range(4)], dtype=np.int32).reshape(-1)
+# Таблица жадной стратегии (голова x еда) строится для полей не больше
+# этого числа клеток - до 16 МБ
+GREEDY_TABLE_MAX_CELLS = 4096
+# Тик посещения клетки, в которую голова еще не входила
+NEVER_VISITED = np.iinfo(np.int32).min // 2
+# "Тик посещения" клетки с препятствием: больше любого тика, поэтому
+# клетка всегда занята
+OBSTACLE = np.iinfo(np.int32).max // 2
+# Пустое место в массиве еды (еду некуда положить)
+NO_FOOD = -1
+
+
+def greedy_preferences():
+    """Порядок ходов жадной стратегии, как в snake_core.greedy_action.
+
+    Строка (x еды относительно головы: 0 - левее, 1 - там же, 2 - правее) * 2
+    + (еда ниже головы): сначала ход по x, затем по y, затем остальные.
+    """
+    rows = []
+    for x_order in (LEFT, None, RIGHT):
+        for below in (False, True):
+            preferred = [] if x_order is None else [x_order]
+            preferred.append(DOWN if below else UP)
+            preferred.extend(action for action in (UP, DOWN, LEFT, RIGHT) if action not in preferred)
+            rows.append(preferred)
+    return np.array(rows, dtype=np.int32)
+
+
+GREEDY_PREFERENCES = greedy_preferences()
+
+
+def greedy_direction(head_x, head_y, food_x, food_y):
+    """Направление к еде: сначала по x, затем по y (массивы или их broadcast)"""
+    actions = np.where(food_y > head_y, DOWN, UP)
+    actions = np.where(food_x > head_x, RIGHT, actions)
+    return np.where(food_x < head_x, LEFT, actions)
+
+
+class BatchSnakeSim:
+    """N независимых партий на одном уровне, шаг - векторный.
+
+    Номера клеток и тики посещения хранятся в int32, соседние клетки
+    берутся из заранее посчитанной таблицы, а завершенные партии просто
+    выпадают из списка активных - остальные массивы не сжимаются.
+
+    Препятствия записаны прямо в таблицу посещений значением OBSTACLE,
+    поэтому проверки столкновения и свободной клетки для них те же, что
+    для тела. Еда - массив (партия, номер еды) с клетками и очками.
+    """
+
+    def __init__(self, n_games, grid_width, grid_height, level_index=0, levels=LEVELS,
+                 total_puzzles=0, food_types=None, seed=None):
+        level = levels[level_index]
+        self.n_games = n_games
+        self.grid_width = grid_width
+        self.grid_height = grid_height
+        self.n_cells = grid_width * grid_height
+        self.level_index = level_index
+        self.rng = np.random.default_rng(seed)
+        self.games = np.arange(n_games)
+
+        # Таблица еды: по умолчанию таблица уровня, как в snake_core.SnakeGame;
+        # очки по виду и общая с snake_core таблица псевдонимов
+        if food_types is None:
+            food_types = level.get("loot_table", FOOD_TYPES)
+        self.food_table = get_loot_table(food_types)
+        self.food_points_table = np.array([food["points"] for food in self.food_table.items], dtype=np.int64)
+
+        # Пороги уровней и их начальное состояние
+        self.puzzles_needed = np.array([level["puzzles_needed"] for level in levels], dtype=np.int64)
+        self.unlocked = np.tile(np.array([level["unlocked"] for level in levels], dtype=bool),
+                                (n_games, 1))
+        self.total_puzzles = np.full(n_games, total_puzzles, dtype=np.int64)
+
+        # Координаты клеток и сосед по направлению: next_cell[cell * 4 + direction]
+        cells = np.arange(self.n_cells)
+        self.cell_x = (cells % grid_width).astype(np.int32)
+        self.cell_y = (cells // grid_width).astype(np.int32)
+        next_x = (self.cell_x[:, None] + DIRECTIONS[:, 0]) % grid_width
+        next_y = (self.cell_y[:, None] + DIRECTIONS[:, 1]) % grid_height
+        self.next_cell = (next_y * grid_width + next_x).reshape(-1).astype(np.int32)
+        self.greedy_table = None
+        if self.n_cells <= GREEDY_TABLE_MAX_CELLS:
+            self.greedy_table = greedy_direction(self.cell_x[:, None], self.cell_y[:, None],
+                                                 self.cell_x, self.cell_y).astype(np.int8).reshape(-1)
+
+        # Тело не хранится: для каждой клетки запоминается тик, когда в нее
+        # вошла голова. Змейка занимает клетки, посещенные за последние
+        # body_len тиков, поэтому клетка занята, если visit > tick - body_len,
+        # а хвост освобождается сам - шаг пишет в память партии одну ячейку.
+        start = (grid_height // 2) * grid_width + grid_width // 2
+        self.visit = np.full((n_games, self.n_cells), NEVER_VISITED, dtype=np.int32)
+        self.visit[:, start] = 0
+        # Плоское представление для быстрой индексации base[g] + cell
+        self.visit_flat = self.visit.reshape(-1)
+        self.base = self.games * self.n_cells
+        self.head = np.full(n_games, start, dtype=np.int32)
+        self.body_len = np.ones(n_games, dtype=np.int32)
+        self.length = np.ones(n_games, dtype=np.int32)
+        self.direction = np.full(n_games, RIGHT, dtype=np.int32)
+
+        self.score = np.zeros(n_games, dtype=np.int64)
+        self.tick = 0
+        self.end_tick = np.zeros(n_games, dtype=np.int64)
+        self.game_over = np.zeros(n_games, dtype=bool)
+        self.board_full = np.zeros(n_games, dtype=bool)
+        self.game_won = np.zeros(n_games, dtype=bool)
+
+        # Порядок открытия пазлов (как random.shuffle в snake_core.Snake)
+        self.puzzle_order = np.argsort(self.rng.random((n_games, PUZZLES_PER_LEVEL)), axis=1)
+        self.revealed_count = np.zeros(n_games, dtype=np.int64)
+        self.revealed_mask = np.zeros((n_games, PUZZLES_PER_LEVEL), dtype=bool)
+
+        # Еда: клетка, очки и тик появления (ближайшую из равных стратегия
+        # выбирает по старшинству, как snake_core.greedy_action)
+        self.food_count = level.get("food_count", 1)
+        self.food_cell = np.full((n_games, self.food_count), NO_FOOD, dtype=np.int32)
+        self.food_points = np.zeros((n_games, self.food_count), dtype=np.int64)
+        self.food_tick = np.zeros((n_games, self.food_count), dtype=np.int64)
+        for slot in range(self.food_count):
+            self.spawn_food(self.games, np.full(n_games, slot))
+
+        self.obstacle_count = level.get("obstacles", 0)
+        self.moving_count = level.get("moving_obstacles", 0)
+        self.moving_cell = np.zeros((n_games, self.moving_count), dtype=np.int32)
+        self.moving_direction = np.zeros((n_games, self.moving_count), dtype=np.int32)
+        self.place_obstacles(start)
+
+        # Номера незавершенных партий и буфер ходов стратегии
+        self.active = np.flatnonzero(~self.finished)
+        self.actions = np.full(n_games, NO_ACTION, dtype=np.int32)
+
+    @property
+    def finished(self):
+        return self.game_over | self.game_won
+
+    @property
+    def ticks(self):
+        """Тиков сыграно в каждой партии"""
+        return np.where(self.finished, self.end_tick, self.tick)
+
+    def occupied(self, games, cells):
+        """Занята ли клетка cells[i] телом в партии games[i]"""
+        return self.visit_flat[self.base[games] + cells] > self.tick - self.body_len[games]
+
+    def taken(self, games, cells):
+        """Занята ли клетка телом, препятствием или другой едой"""
+        return self.occupied(games, cells) | (self.food_cell[games] == cells[:, None]).any(axis=1)
+
+    def spawn_food(self, games, slots, attempts=4):
+        """Новая еда на место slots[i] в случайной свободной клетке партии games[i].
+
+        Сначала несколько раундов выбора случайной клетки с отбрасыванием
+        занятых (равномерно по свободным клеткам и дешево, пока змейка
+        короткая), для оставшихся партий - выбор по всем свободным клеткам.
+        """
+        if len(games) == 0:
+            return
+        # С одной едой проверять другую еду не нужно: съеденная еда лежала
+        # в клетке, где теперь голова
+        taken = self.occupied if self.food_count == 1 else self.taken
+        cells = self.rng.integers(0, self.n_cells, size=len(games))
+        pending = np.flatnonzero(taken(games, cells))
+        for _ in range(attempts):
+            if len(pending) == 0:
+                break
+            cells[pending] = self.rng.integers(0, self.n_cells, size=len(pending))
+            retry = taken(games[pending], cells[pending])
+            pending = pending[retry]
+
+        stuck = games[:0]
+        if len(pending):
+            # Случайный ключ для каждой клетки, занятые клетки исключаем
+            keys = self.rng.random((len(pending), self.n_cells))
+            tail_tick = self.tick - self.body_len[games[pending]]
+            keys[self.visit[games[pending]] > tail_tick[:, None]] = -1.0
+            rows, food_slots = np.nonzero(self.food_cell[games[pending]] != NO_FOOD)
+            keys[rows, self.food_cell[games[pending][rows], food_slots]] = -1.0
+            cells[pending] = keys.argmax(axis=1)
+            full = keys[np.arange(len(pending)), cells[pending]] < 0
+            cells[pending[full]] = NO_FOOD
+            stuck = games[pending[full]]
+
+        types = self.food_table.sample_indices(self.rng, len(games))
+
+        self.food_cell[games, slots] = cells
+        self.food_points[games, slots] = self.food_points_table[types]
+        self.food_tick[games, slots] = self.tick
+
+        # Змейка заняла все поле и еды не осталось - конец игры
+        if len(stuck):
+            stuck = stuck[(self.food_cell[stuck] == NO_FOOD).all(axis=1)]
+            self.game_over[stuck] = True
+            self.board_full[stuck] = True
+
+    def place_obstacles(self, start):
+        """Препятствия в случайных свободных клетках, кроме пути перед головой.
+
+        Как snake_core.SnakeGame.place_obstacles: сначала неподвижные,
+        затем движущиеся со случайным направлением.
+        """
+        count = self.obstacle_count + self.moving_count
+        if not count:
+            return
+        # Случайный ключ для каждой клетки; голова, еда и клетки перед
+        # головой (змейка стартует вправо) исключены
+        keys = self.rng.random((self.n_games, self.n_cells))
+        keys[self.visit != NEVER_VISITED] = -1.0
+        rows, food_slots = np.nonzero(self.food_cell != NO_FOOD)
+        keys[rows, self.food_cell[rows, food_slots]] = -1.0
+        safe_cells = self.next_cell[start * 4 + RIGHT]
+        for _ in range(OBSTACLE_SAFE_DISTANCE):
+            keys[:, safe_cells] = -1.0
+            safe_cells = self.next_cell[safe_cells * 4 + RIGHT]
+
+        # count клеток с наибольшими ключами в случайном порядке
+        chosen = np.argpartition(-keys, count - 1, axis=1)[:, :count]
+        chosen_keys = np.take_along_axis(keys, chosen, axis=1)
+        if (chosen_keys < 0).any():
+            raise ValueError(f"Поле {self.grid_width}x{self.grid_height} слишком мало "
+                             f"для {count} препятствий уровня {self.level_index + 1}")
+        cells = np.take_along_axis(chosen, np.argsort(-chosen_keys, axis=1), axis=1)
+        self.visit[self.games[:, None], cells] = OBSTACLE
+        self.moving_cell[:] = cells[:, self.obstacle_count:]
+        self.moving_direction[:] = self.rng.integers(0, 4, size=(self.n_games, self.moving_count))
+
+    def move_obstacles(self):
+        """Шаг движущихся препятствий незавершенных партий (только в свободные клетки)"""
+        if not self.moving_count or self.tick % MOVING_OBSTACLE_PERIOD:
+            return
+        games = self.active
+        base = self.base[games]
+        # По одному препятствию за раз, как в snake_core: следующее видит
+        # уже сдвинутые
+        for obstacle in range(self.moving_count):
+            cell = self.moving_cell[games, obstacle]
+            direction = self.moving_direction[games, obstacle]
+            target = self.next_cell[(cell << 2) | direction]
+            blocked = self.taken(games, target)
+            self.moving_direction[games[blocked], obstacle] = OPPOSITE[direction[blocked]]
+            moving = ~blocked
+            self.visit_flat[base[moving] + cell[moving]] = NEVER_VISITED
+            self.visit_flat[base[moving] + target[moving]] = OBSTACLE
+            self.moving_cell[games[moving], obstacle] = target[moving]
+
+    def step(self, actions=None):
+        """Один тик всех незавершенных партий; actions - коды направлений или -1"""
+        active = self.active
+        if len(active) == 0:
+            return
+        self.tick += 1
+
+        # Смена направления (разворот назад запрещен)
+        direction = self.direction[active]
+        if actions is not None:
+            direction = TURN[direction * 5 + np.asarray(actions)[active] + 1]
+            self.direction[active] = direction
+
+        new_cell = self.next_cell[(self.head[active] << 2) | direction]
+        cell_index = self.base[active] + new_cell
+
+        # Столкновение с собой: тело до хода - клетки, посещенные за
+        # последние body_len тиков, вместе с хвостом
+        body_len = self.body_len[active]
+        collided = self.visit_flat[cell_index] >= self.tick - body_len
+
+        # Голова в новую клетку; хвост остается на месте, пока змейка растет.
+        # Врезавшиеся партии доигрывают этот тик вхолостую - их поле больше
+        # не понадобится, а в занятой клетке еды не бывает
+        self.visit_flat[cell_index] = self.tick
+        self.head[active] = new_cell
+        self.body_len[active] = body_len + (body_len < self.length[active])
+
+        if self.food_count == 1:
+            eating = new_cell == self.food_cell[:, 0][active]
+            eaters = active[eating]
+            slots = np.zeros(len(eaters), dtype=np.int64)
+        else:
+            hit = self.food_cell[active] == new_cell[:, None]
+            eating = hit.any(axis=1)
+            eaters = active[eating]
+            slots = hit[eating].argmax(axis=1)
+        if collided.any():
+            crashed = active[collided]
+            self.game_over[crashed] = True
+            self.end_tick[crashed] = self.tick
+            self.active = active[~collided]
+
+        # Еда
+        if len(eaters):
+            self.grow(eaters, self.food_points[eaters, slots])
+            self.spawn_food(eaters, slots)
+            done = self.finished[eaters]
+            if done.any():
+                self.end_tick[eaters[done]] = self.tick
+                self.active = self.active[~self.finished[self.active]]
+        self.move_obstacles()
+
+    def grow(self, games, points):
+        self.length[games] += 1
+        self.score[games] += points
+
+        # Открываем новый пазл каждые POINTS_PER_PUZZLE очков
+        reveal = (self.score[games] // POINTS_PER_PUZZLE > self.revealed_count[games]) & \
+                 (self.revealed_count[games] < PUZZLES_PER_LEVEL)
+        revealing = games[reveal]
+        if len(revealing) == 0:
+            return
+        puzzles = self.puzzle_order[revealing, self.revealed_count[revealing]]
+        self.revealed_mask[revealing, puzzles] = True
+        self.revealed_count[revealing] += 1
+        self.total_puzzles[revealing] += 1
+        self.game_won[revealing] = self.revealed_count[revealing] == PUZZLES_PER_LEVEL
+
+        # Открытие уровней по общему числу пазлов
+        self.unlocked[revealing] |= self.total_puzzles[revealing, None] >= self.puzzles_needed
+
+    def nearest_food(self, games, head):
+        """Клетка ближайшей еды (из равных - самой старой), как в snake_core.greedy_action"""
+        if self.food_count == 1:
+            return self.food_cell[:, 0][games]
+        food = self.food_cell[games]
+        distance = np.abs(self.cell_x[food] - self.cell_x[head, None]) + \
+            np.abs(self.cell_y[food] - self.cell_y[head, None])
+        order = (distance.astype(np.int64) << 32) | self.food_tick[games]
+        order[food == NO_FOOD] = np.iinfo(np.int64).max
+        return food[np.arange(len(games)), order.argmin(axis=1)]
+
+    def greedy_actions(self):
+        """Направление к еде для незавершенных партий (как snake_core.greedy_action)"""
+        active = self.active
+        head = self.head[active]
+        food = self.nearest_food(active, head)
+        if self.obstacle_count or self.moving_count:
+            # Порядок ходов к еде; первый, который не ведет в препятствие
+            # (разворот назад змейка игнорирует и едет прямо)
+            x_order = np.sign(self.cell_x[food] - self.cell_x[head]) + 1
+            preferred = GREEDY_PREFERENCES[x_order * 2 + (self.cell_y[food] > self.cell_y[head])]
+            direction = TURN[self.direction[active, None] * 5 + preferred + 1]
+            target = self.next_cell[(head[:, None] << 2) | direction]
+            solid = self.visit_flat[self.base[active, None] + target] == OBSTACLE
+            # Если препятствия со всех сторон, argmax дает первый ход
+            choice = (~solid).argmax(axis=1)
+            self.actions[active] = preferred[np.arange(len(active)), choice]
+        elif self.greedy_table is not None:
+            self.actions[active] = self.greedy_table[head * self.n_cells + food]
+        else:
+            self.actions[active] = greedy_direction(self.cell_x[head], self.cell_y[head],
+                                                    self.cell_x[food], self.cell_y[food])
+        return self.actions
+
+    def run(self, max_ticks, policy=None):
+        """Прогон до завершения всех партий или max_ticks тиков"""
+        if policy is None:
+            policy = BatchSnakeSim.greedy_actions
+        for _ in range(max_ticks):
+            if len(self.active) == 0:
+                break
+            self.step(policy(self))
+        return self.summary()
+
+    def summary(self):
+        """Итоги по всем партиям в виде словаря массивов"""
+        return {
+            "ticks": self.ticks,
+            "score": self.score.copy(),
+            "length": self.length.copy(),
+            "puzzles": self.revealed_count.copy(),
+            "total_puzzles": self.total_puzzles.copy(),
+            "game_won": self.game_won.copy(),
+            "game_over": self.game_over.copy(),
+            "board_full": self.board_full.copy(),
+            "unlocked": self.unlocked.copy(),
+        }
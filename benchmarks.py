@@ -0,0 +1,166 @@
+"""Микро-бенчмарки отрисовки игры.
+
+Запуск: python benchmarks.py
+Работает без окна и звука (dummy-драйверы SDL).
+"""
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+
+import batch_sim
+import snake_core
+import test as game
+import texture_pack
+
+
+def measure(func, repeats=200):
+    """Среднее время одного вызова func в миллисекундах"""
+    func()  # прогрев (построение кэшей)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        func()
+    return (time.perf_counter() - start) * 1000 / repeats
+
+
+def draw_grid_per_cell(surface):
+    """Старая отрисовка сетки: отдельная поверхность на каждую клетку"""
+    for y in range(0, game.HEIGHT, game.GRID_SIZE):
+        for x in range(0, game.WIDTH, game.GRID_SIZE):
+            grid_surface = pygame.Surface((game.GRID_SIZE, game.GRID_SIZE), pygame.SRCALPHA)
+            grid_surface.fill((255, 255, 255, 30))
+            surface.blit(grid_surface, (x, y))
+
+
+def bench_grid():
+    """Время кадра для сетки: до и после кэширования слоя"""
+    surface = pygame.Surface((game.WIDTH, game.HEIGHT))
+    before = measure(lambda: draw_grid_per_cell(surface))
+    after = measure(lambda: game.draw_grid(surface))
+    print(f"draw_grid: до {before:.3f} мс/кадр, после {after:.3f} мс/кадр "
+          f"(x{before / after:.1f})")
+
+
+def bench_level_backgrounds():
+    """Загрузка фонов всех уровней с пустым кэшем: JPEG против пакета текстур"""
+    game.init_game()
+    pack_path = os.path.join(tempfile.mkdtemp(), "bench.pack")
+    texture_pack.build_pack(pack_path)
+    size = (game.WIDTH, game.HEIGHT)
+
+    def load_all(pack):
+        assets = game.AssetManager(pack)
+        for level in game.LEVELS:
+            assets.scaled_image(level["background_file"], size)
+
+    before = measure(lambda: load_all(None), repeats=5)
+    after = measure(lambda: load_all(pack_path), repeats=5)
+    print(f"фоны уровней: JPEG {before:.1f} мс, пакет {after:.1f} мс (x{before / after:.1f})")
+
+
+def bench_simulation(batch_sizes=(4096, 16384, 65536), max_ticks=5000):
+    """Тиков в секунду: партии по одной на Python и пакетом на NumPy.
+
+    Пакет прогоняется при нескольких размерах: чем больше партий, тем
+    меньше доля постоянных накладных расходов NumPy на тик.
+    """
+    rng = random.Random(1)
+    ticks = 0
+    start = time.perf_counter()
+    for _ in range(256):
+        sim_game = snake_core.SnakeGame(0, snake_core.Progress(snake_core.copy_levels()),
+                                        game.GRID_WIDTH, game.GRID_HEIGHT, rng=rng)
+        while not sim_game.finished and sim_game.ticks < max_ticks:
+            sim_game.step(snake_core.greedy_action(sim_game))
+        ticks += sim_game.ticks
+    single = ticks / (time.perf_counter() - start)
+
+    results = {}
+    for n_games in batch_sizes:
+        start = time.perf_counter()
+        batch = batch_sim.BatchSnakeSim(n_games, game.GRID_WIDTH, game.GRID_HEIGHT, seed=1)
+        summary = batch.run(max_ticks)
+        results[n_games] = summary["ticks"].sum() / (time.perf_counter() - start)
+    best = max(results, key=results.get)
+    sizes = ", ".join(f"{n_games}: {rate:,.0f}" for n_games, rate in results.items())
+    print(f"симуляция: по одной {single:,.0f} тиков/с, пакетом {sizes} тиков/с; "
+          f"лучше всего N={best} (x{results[best] / single:.1f})")
+
+
+# Запуск игры в отдельном процессе: время импорта, создания окна,
+# первого кадра меню и первой обработки событий меню
+STARTUP_SCRIPT = """
+import json, os, tempfile, time
+start = time.perf_counter()
+import pygame
+import test as game
+imported = time.perf_counter()
+display_on_import = pygame.display.get_init()
+game.PROGRESS_DB_FILE = os.path.join(tempfile.mkdtemp(), "bench.db")
+game.init_game()
+window = time.perf_counter()
+game.load_progress()
+ui = game.open_main_menu()
+ui.render(game.screen)
+first_frame = time.perf_counter()
+game.ASSETS.poll_prefetched()
+pygame.event.get()
+interactive = time.perf_counter()
+print(json.dumps({
+    "import": imported - start,
+    "window": window - start,
+    "first_frame": first_frame - start,
+    "interactive": interactive - start,
+    "display_on_import": display_on_import,
+}))
+"""
+
+SNAKE_CORE_IMPORT_SCRIPT = """
+import json, time
+start = time.perf_counter()
+import snake_core
+print(json.dumps({"import": time.perf_counter() - start}))
+"""
+
+
+def run_startup_script(script):
+    """Результат скрипта, запущенного в новом интерпретаторе"""
+    output = subprocess.run([sys.executable, "-c", script], cwd=os.path.dirname(os.path.abspath(__file__)),
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def bench_startup(runs=5):
+    """Время запуска игры (медиана по runs запускам), мс"""
+    results = [run_startup_script(STARTUP_SCRIPT) for _ in range(runs)]
+    core = [run_startup_script(SNAKE_CORE_IMPORT_SCRIPT)["import"] for _ in range(runs)]
+
+    def median_ms(values):
+        return sorted(values)[len(values) // 2] * 1000
+
+    print(f"запуск: import test {median_ms([r['import'] for r in results]):.1f} мс, "
+          f"окно {median_ms([r['window'] for r in results]):.1f} мс, "
+          f"первый кадр {median_ms([r['first_frame'] for r in results]):.1f} мс, "
+          f"меню готово {median_ms([r['interactive'] for r in results]):.1f} мс "
+          f"(import snake_core {median_ms(core):.1f} мс)")
+    if any(r["display_on_import"] for r in results):
+        print("ВНИМАНИЕ: import test инициализирует дисплей")
+
+
+def main():
+    bench_startup()
+    bench_grid()
+    bench_level_backgrounds()
+    bench_simulation()
+
+
+if __name__ == "__main__":
+    main()
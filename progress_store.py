@@ -0,0 +1,356 @@
+"""Сохранение прогресса игры без задержек игрового цикла.
+
+Прогресс хранится в базе SQLite (game_progress.db, ProfileStore): для
+каждого профиля игрока - настройки и счетчик пазлов, состояние уровней
+и рекорды. Игра только ставит события в очередь, а фоновый поток
+применяет их к таблицам базы пачкой не раньше чем через delay секунд
+после первого события. Чтение профиля сначала сбрасывает очередь.
+
+Файлы прежних версий только читаются при первом запуске, чтобы
+перенести прогресс в первый профиль: снимок game_progress.json плюс
+журнал событий game_progress.journal или старый game_progress.txt.
+"""
+import copy
+import json
+import os
+import sqlite3
+import threading
+import time
+
+def apply_event(state, event):
+    """Применение одного события журнала к состоянию прогресса"""
+    kind = event["kind"]
+    if kind == "snapshot":
+        state.clear()
+        state.update(copy.deepcopy(event["state"]))
+    elif kind == "puzzle_collected":
+        state["total_puzzles"] = event["total_puzzles"]
+    elif kind in ("level_completed", "level_unlocked"):
+        levels = state.setdefault("levels", [])
+        while len(levels) <= event["level"]:
+            levels.append({"unlocked": False, "completed": False})
+        flag = "completed" if kind == "level_completed" else "unlocked"
+        levels[event["level"]][flag] = True
+    elif kind == "setting_changed":
+        state[event["name"]] = event["value"]
+
+def read_journal(path):
+    """События из журнала; оборванная последняя строка пропускается"""
+    events = []
+    if not os.path.exists(path):
+        return events
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                events.append(json.loads(line))
+            except ValueError:
+                break
+    return events
+
+def read_legacy_txt(path):
+    """Прогресс из старого формата game_progress.txt (строки ключ=значение)"""
+    state = {"levels": []}
+    with open(path, "r") as f:
+        for line in f:
+            key, sep, value = line.strip().partition("=")
+            if not sep:
+                continue
+            if key == "total_puzzles":
+                state["total_puzzles"] = int(value)
+            elif key.startswith("level_"):
+                _, index, flag = key.split("_")
+                levels = state["levels"]
+                while len(levels) <= int(index):
+                    levels.append({"unlocked": False, "completed": False})
+                levels[int(index)][flag] = value == "1"
+    return state
+
+def read_journal_progress(snapshot_path, journal_path):
+    """Состояние прежней версии: снимок плюс события журнала (None, если ничего нет).
+
+    Только чтение - файлы прежней версии не меняются.
+    """
+    state = {}
+    found = False
+    if os.path.exists(snapshot_path):
+        with open(snapshot_path, "r") as f:
+            state = json.load(f)
+        found = True
+    events = read_journal(journal_path)
+    for event in events:
+        apply_event(state, event)
+    return state if found or events else None
+
+def load_legacy_progress(snapshot_path, journal_path, txt_path):
+    """Прогресс из файлов прежних версий (json + журнал или txt) или None"""
+    state = read_journal_progress(snapshot_path, journal_path)
+    if state is None and os.path.exists(txt_path):
+        state = read_legacy_txt(txt_path)
+    return state
+
+PROFILE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS profiles (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    total_puzzles INTEGER NOT NULL DEFAULT 0,
+    snake_speed INTEGER NOT NULL DEFAULT 10,
+    snake_color_index INTEGER NOT NULL DEFAULT 0,
+    music_volume REAL NOT NULL DEFAULT 0.5,
+    sound_volume REAL NOT NULL DEFAULT 1.0,
+    last_played REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS profiles_last_played ON profiles (last_played DESC);
+
+CREATE TABLE IF NOT EXISTS level_state (
+    profile_id INTEGER NOT NULL REFERENCES profiles (id) ON DELETE CASCADE,
+    level_index INTEGER NOT NULL,
+    unlocked INTEGER NOT NULL DEFAULT 0,
+    completed INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (profile_id, level_index)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS high_scores (
+    id INTEGER PRIMARY KEY,
+    profile_id INTEGER NOT NULL REFERENCES profiles (id) ON DELETE CASCADE,
+    level_index INTEGER NOT NULL,
+    score INTEGER NOT NULL,
+    puzzles INTEGER NOT NULL,
+    time REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS high_scores_profile ON high_scores (profile_id, level_index, score DESC);
+CREATE INDEX IF NOT EXISTS high_scores_level ON high_scores (level_index, score DESC);
+"""
+
+# Запросы хранилища профилей. Текст каждого запроса постоянный, а значения
+# передаются параметрами, поэтому sqlite3 компилирует его один раз и берет
+# готовый из кэша соединения.
+SQL_SELECT_PROFILE = "SELECT id FROM profiles WHERE name = ?"
+SQL_INSERT_PROFILE = "INSERT OR IGNORE INTO profiles (name, last_played) VALUES (?, ?)"
+SQL_TOUCH_PROFILE = "UPDATE profiles SET last_played = ? WHERE id = ?"
+SQL_RECENT_PROFILES = "SELECT id, name FROM profiles ORDER BY last_played DESC LIMIT ? OFFSET ?"
+SQL_COUNT_PROFILES = "SELECT COUNT(*) FROM profiles"
+# Поиск по началу имени - диапазон по уникальному индексу name
+SQL_FIND_PROFILES = (
+    "SELECT id, name FROM profiles WHERE name >= ? AND name < ? ORDER BY name LIMIT ? OFFSET ?"
+)
+SQL_COUNT_FOUND = "SELECT COUNT(*) FROM profiles WHERE name >= ? AND name < ?"
+SQL_LOAD_PROFILE = (
+    "SELECT total_puzzles, snake_speed, snake_color_index, music_volume, sound_volume "
+    "FROM profiles WHERE id = ?"
+)
+SQL_LOAD_LEVELS = (
+    "SELECT level_index, unlocked, completed FROM level_state "
+    "WHERE profile_id = ? ORDER BY level_index"
+)
+SQL_SAVE_PROFILE = (
+    "UPDATE profiles SET total_puzzles = ?, snake_speed = ?, snake_color_index = ?, "
+    "music_volume = ?, sound_volume = ? WHERE id = ?"
+)
+SQL_DELETE_LEVELS = "DELETE FROM level_state WHERE profile_id = ?"
+SQL_SAVE_LEVEL = (
+    "INSERT INTO level_state (profile_id, level_index, unlocked, completed) VALUES (?, ?, ?, ?) "
+    "ON CONFLICT (profile_id, level_index) DO UPDATE SET "
+    "unlocked = excluded.unlocked, completed = excluded.completed"
+)
+SQL_SET_TOTAL_PUZZLES = "UPDATE profiles SET total_puzzles = ? WHERE id = ?"
+SQL_LEVEL_FLAG = {
+    "level_completed": (
+        "INSERT INTO level_state (profile_id, level_index, completed) VALUES (?, ?, 1) "
+        "ON CONFLICT (profile_id, level_index) DO UPDATE SET completed = 1"
+    ),
+    "level_unlocked": (
+        "INSERT INTO level_state (profile_id, level_index, unlocked) VALUES (?, ?, 1) "
+        "ON CONFLICT (profile_id, level_index) DO UPDATE SET unlocked = 1"
+    ),
+}
+SQL_SET_SETTING = {
+    name: f"UPDATE profiles SET {name} = ? WHERE id = ?"
+    for name in ("snake_speed", "snake_color_index", "music_volume", "sound_volume")
+}
+SQL_INSERT_HIGH_SCORE = (
+    "INSERT INTO high_scores (profile_id, level_index, score, puzzles, time) VALUES (?, ?, ?, ?, ?)"
+)
+SQL_HIGH_SCORES = (
+    "SELECT score, puzzles, time FROM high_scores "
+    "WHERE profile_id = ? AND level_index = ? ORDER BY score DESC LIMIT ?"
+)
+
+def name_range(prefix):
+    """Границы [prefix, конец) имен, начинающихся с prefix (сравнение BINARY по UTF-8)"""
+    return prefix, prefix + chr(0x10FFFF)
+
+class ProfileStore:
+    """Прогресс многих профилей в базе SQLite.
+
+    База открыта в режиме WAL: фоновый поток пишет события одной
+    транзакцией на пачку, а чтение профиля при переключении не ждет
+    записи на диск. Профиль ищется по уникальному индексу имени,
+    уровни и рекорды - по индексам, начинающимся с profile_id, поэтому
+    переключение не зависит от числа профилей в базе.
+
+    Запись идет из фонового потока: record() только ставит событие в
+    очередь (O(1) для игрового цикла), а поток сбрасывает события пачкой
+    не раньше чем через delay секунд после первого из них.
+
+    События те же, что в журнале прежней версии (apply_event), плюс
+    "high_score"; у каждого события есть поле profile - id профиля.
+    """
+    def __init__(self, db_path, delay=0.5):
+        self.delay = delay
+        self.condition = threading.Condition()
+        self.write_lock = threading.Lock()
+        self.pending = []
+        self.dirty_since = None
+        self.closed = False
+        self.thread = None
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, cached_statements=64)
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute("PRAGMA synchronous = NORMAL")
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.executescript(PROFILE_SCHEMA)
+
+    def record(self, kind, **data):
+        """Добавить событие в очередь (запись - в фоновом потоке)"""
+        event = {"time": round(time.time(), 3), "kind": kind}
+        event.update(data)
+        with self.condition:
+            self.pending.append(event)
+            if self.dirty_since is None:
+                self.dirty_since = time.monotonic()
+            if self.thread is None and not self.closed:
+                self.thread = threading.Thread(target=self.run, daemon=True)
+                self.thread.start()
+            self.condition.notify()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.pending and not self.closed:
+                    self.condition.wait()
+                if not self.pending:
+                    return
+                # Ждем окончания интервала, собирая новые события
+                deadline = self.dirty_since + self.delay
+                while not self.closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+            self.flush()
+
+    def take_pending(self):
+        with self.condition:
+            events = self.pending
+            self.pending = []
+            self.dirty_since = None
+            return events
+
+    def flush(self):
+        """Немедленная запись накопленных событий"""
+        with self.write_lock:
+            events = self.take_pending()
+            if not events:
+                return
+            try:
+                self.write_events(events)
+            except Exception as e:
+                print(f"Ошибка сохранения прогресса: {e}")
+
+    def profile_count(self, prefix=""):
+        """Число профилей (с именем, начинающимся с prefix)"""
+        with self.write_lock:
+            if not prefix:
+                return self.conn.execute(SQL_COUNT_PROFILES).fetchone()[0]
+            return self.conn.execute(SQL_COUNT_FOUND, name_range(prefix)).fetchone()[0]
+
+    def open_profile(self, name):
+        """id профиля с именем name (новый профиль создается)"""
+        with self.write_lock, self.conn:
+            now = time.time()
+            self.conn.execute(SQL_INSERT_PROFILE, (name, now))
+            profile_id = self.conn.execute(SQL_SELECT_PROFILE, (name,)).fetchone()[0]
+            self.conn.execute(SQL_TOUCH_PROFILE, (now, profile_id))
+            return profile_id
+
+    def has_profile(self, name):
+        with self.write_lock:
+            return self.conn.execute(SQL_SELECT_PROFILE, (name,)).fetchone() is not None
+
+    def recent_profiles(self, limit=10, offset=0):
+        """Последние игравшие профили: список пар (id, имя)"""
+        with self.write_lock:
+            return self.conn.execute(SQL_RECENT_PROFILES, (limit, offset)).fetchall()
+
+    def find_profiles(self, prefix, limit=10, offset=0):
+        """Профили с именем, начинающимся с prefix, по алфавиту: список (id, имя)"""
+        with self.write_lock:
+            return self.conn.execute(SQL_FIND_PROFILES, (*name_range(prefix), limit, offset)).fetchall()
+
+    def load(self, profile_id):
+        """Состояние профиля в том же виде, что снимок прежней версии"""
+        # События из очереди сначала попадают в базу, иначе чтение их не увидит
+        self.flush()
+        with self.write_lock:
+            row = self.conn.execute(SQL_LOAD_PROFILE, (profile_id,)).fetchone()
+            if row is None:
+                return None
+            state = dict(zip(("total_puzzles", "snake_speed", "snake_color_index",
+                              "music_volume", "sound_volume"), row))
+            state["levels"] = []
+            for level_index, unlocked, completed in self.conn.execute(SQL_LOAD_LEVELS, (profile_id,)):
+                while len(state["levels"]) < level_index:
+                    state["levels"].append({"unlocked": False, "completed": False})
+                state["levels"].append({"unlocked": bool(unlocked), "completed": bool(completed)})
+            return state
+
+    def import_state(self, profile_id, state):
+        """Сразу записать полное состояние профиля (перенос старых файлов)"""
+        with self.write_lock, self.conn:
+            self.apply({"kind": "snapshot", "profile": profile_id, "state": state})
+
+    def high_scores(self, profile_id, level_index, limit=10):
+        """Лучшие результаты профиля на уровне: список (очки, пазлы, время)"""
+        self.flush()
+        with self.write_lock:
+            return self.conn.execute(SQL_HIGH_SCORES, (profile_id, level_index, limit)).fetchall()
+
+    def write_events(self, events):
+        # Вся пачка - одна транзакция (один fsync журнала WAL)
+        with self.conn:
+            for event in events:
+                self.apply(event)
+
+    def apply(self, event):
+        kind = event["kind"]
+        profile_id = event["profile"]
+        if kind == "snapshot":
+            state = event["state"]
+            self.conn.execute(SQL_SAVE_PROFILE, (
+                state.get("total_puzzles", 0), state.get("snake_speed", 10),
+                state.get("snake_color_index", 0), state.get("music_volume", 0.5),
+                state.get("sound_volume", 1.0), profile_id))
+            self.conn.execute(SQL_DELETE_LEVELS, (profile_id,))
+            self.conn.executemany(SQL_SAVE_LEVEL, [
+                (profile_id, i, int(level["unlocked"]), int(level["completed"]))
+                for i, level in enumerate(state.get("levels", []))])
+        elif kind == "puzzle_collected":
+            self.conn.execute(SQL_SET_TOTAL_PUZZLES, (event["total_puzzles"], profile_id))
+        elif kind in SQL_LEVEL_FLAG:
+            self.conn.execute(SQL_LEVEL_FLAG[kind], (profile_id, event["level"]))
+        elif kind == "setting_changed":
+            self.conn.execute(SQL_SET_SETTING[event["name"]], (event["value"], profile_id))
+        elif kind == "high_score":
+            self.conn.execute(SQL_INSERT_HIGH_SCORE, (
+                profile_id, event["level"], event["score"], event["puzzles"], event["time"]))
+
+    def close(self):
+        """Остановить поток, записать все, что осталось, и закрыть базу"""
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+        if self.thread is not None:
+            self.thread.join()
+        self.flush()
+        with self.write_lock:
+            self.conn.close()
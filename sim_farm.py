@@ -0,0 +1,177 @@
+"""Ферма симуляций для подбора баланса уровней.
+
+Перебирает сетку параметров (скорость змейки, таблица редкости еды,
+пороги puzzles_needed, размер поля), раздает задания по всем ядрам
+через ProcessPoolExecutor и складывает результаты в колоночный файл.
+У каждого задания свой детерминированный seed, поэтому прогон можно
+повторить.
+
+Пример:
+    python sim_farm.py --games 2000 --speeds 5,10,20 \\
+        --thresholds "6,12,18,24,30;5,10,16,22,28" --out results
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import snake_core
+
+# Колонки результатов: имя -> код типа array
+PLAY_COLUMNS = {
+    "job_id": "l",
+    "play": "l",
+    "level": "b",
+    "ticks": "l",
+    "seconds": "d",
+    "score": "l",
+    "puzzles": "b",
+    "won": "b",
+    "total_puzzles": "l",
+    "levels_unlocked": "b",
+}
+
+class ColumnWriter:
+    """Колоночный файл: каталог с файлом на каждую колонку и схемой.
+
+    Значения дописываются в конец файлов колонок в двоичном виде
+    (array.tofile), поэтому результаты пишутся по мере готовности.
+    """
+    def __init__(self, path, columns):
+        self.path = path
+        self.columns = columns
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, "schema.json"), "w") as f:
+            json.dump(columns, f, indent=2)
+        self.files = {name: open(os.path.join(path, name + ".col"), "wb") for name in columns}
+        self.rows = 0
+
+    def append(self, chunk):
+        """Дописывает блок строк: словарь колонка -> список значений"""
+        for name, typecode in self.columns.items():
+            array(typecode, chunk[name]).tofile(self.files[name])
+        self.rows += len(chunk["job_id"])
+
+    def close(self):
+        for f in self.files.values():
+            f.close()
+
+def read_columns(path):
+    """Чтение колоночного файла в словарь колонка -> array"""
+    with open(os.path.join(path, "schema.json")) as f:
+        columns = json.load(f)
+    data = {}
+    for name, typecode in columns.items():
+        values = array(typecode)
+        with open(os.path.join(path, name + ".col"), "rb") as f:
+            values.frombytes(f.read())
+        data[name] = values
+    return data
+
+def make_food_types(rarities):
+    """Таблица еды с теми же очками, что FOOD_TYPES, и другой редкостью (для всех уровней)"""
+    return [dict(food, rarity=rarity) for food, rarity in zip(snake_core.FOOD_TYPES, rarities)]
+
+def build_jobs(speeds, rarity_tables, thresholds, grids, base_seed):
+    """Все сочетания параметров с детерминированным seed на задание"""
+    jobs = []
+    combos = itertools.product(speeds, range(len(rarity_tables)), thresholds, grids)
+    for job_id, (speed, table_index, needed, grid) in enumerate(combos):
+        jobs.append({
+            "job_id": job_id,
+            "seed": base_seed * 1000003 + job_id,
+            "snake_speed": speed,
+            "rarity_table": table_index,
+            "rarities": list(rarity_tables[table_index]),
+            "puzzles_needed": list(needed),
+            "grid": list(grid),
+        })
+    return jobs
+
+def run_job(job, games, max_ticks):
+    """Кампания из games партий: после победы - следующий открытый уровень"""
+    rng = random.Random(job["seed"])
+    levels = snake_core.copy_levels()
+    food_types = make_food_types(job["rarities"])
+    for level, needed in zip(levels, job["puzzles_needed"]):
+        level["puzzles_needed"] = needed
+        level["loot_table"] = food_types
+    progress = snake_core.Progress(levels)
+    grid_width, grid_height = job["grid"]
+
+    chunk = {name: [] for name in PLAY_COLUMNS}
+    level_index = 0
+    for play in range(games):
+        game = snake_core.SnakeGame(level_index, progress, grid_width, grid_height, rng=rng)
+        while not game.finished and game.ticks < max_ticks:
+            game.step(snake_core.greedy_action(game))
+
+        chunk["job_id"].append(job["job_id"])
+        chunk["play"].append(play)
+        chunk["level"].append(level_index)
+        chunk["ticks"].append(game.ticks)
+        chunk["seconds"].append(game.ticks / job["snake_speed"])
+        chunk["score"].append(game.snake.score)
+        chunk["puzzles"].append(len(game.snake.revealed_puzzles))
+        chunk["won"].append(int(game.game_won))
+        chunk["total_puzzles"].append(progress.total_puzzles)
+        chunk["levels_unlocked"].append(sum(level["unlocked"] for level in levels))
+
+        if game.game_won and level_index + 1 < len(levels) and levels[level_index + 1]["unlocked"]:
+            level_index += 1
+    return chunk
+
+def run_farm(jobs, out_path, games, max_ticks, workers=None):
+    """Прогон всех заданий на пуле процессов с потоковой записью"""
+    writer = ColumnWriter(out_path, PLAY_COLUMNS)
+    with open(os.path.join(out_path, "jobs.json"), "w") as f:
+        json.dump(jobs, f, indent=2)
+    ticks = 0
+    start = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(run_job, job, games, max_ticks) for job in jobs]
+            for done, future in enumerate(as_completed(futures), 1):
+                chunk = future.result()
+                writer.append(chunk)
+                ticks += sum(chunk["ticks"])
+                print(f"Задание {done}/{len(jobs)}: {writer.rows} партий, "
+                      f"{ticks / (time.perf_counter() - start):,.0f} тиков/с")
+    finally:
+        writer.close()
+    return writer.rows
+
+def parse_list(text, cast=int):
+    return [cast(value) for value in text.split(",") if value]
+
+def main():
+    parser = argparse.ArgumentParser(description="Ферма симуляций баланса уровней")
+    parser.add_argument("--games", type=int, default=1000, help="партий в одном задании")
+    parser.add_argument("--max-ticks", type=int, default=20000, help="предел тиков на партию")
+    parser.add_argument("--speeds", default="10", help="SNAKE_SPEED через запятую")
+    parser.add_argument("--rarities", default=",".join(str(food["rarity"]) for food in snake_core.FOOD_TYPES),
+                        help="таблицы редкости еды через ';'")
+    parser.add_argument("--thresholds", default=",".join(str(level["puzzles_needed"]) for level in snake_core.LEVELS),
+                        help="наборы puzzles_needed через ';'")
+    parser.add_argument("--grids", default="30x20", help="размеры поля через запятую, например 30x20,60x40")
+    parser.add_argument("--seed", type=int, default=0, help="базовый seed")
+    parser.add_argument("--workers", type=int, default=None, help="число процессов (по умолчанию - все ядра)")
+    parser.add_argument("--out", default="sim_results", help="каталог результатов")
+    args = parser.parse_args()
+
+    jobs = build_jobs(
+        speeds=parse_list(args.speeds),
+        rarity_tables=[parse_list(table) for table in args.rarities.split(";")],
+        thresholds=[parse_list(table) for table in args.thresholds.split(";")],
+        grids=[tuple(parse_list(grid.replace("x", ","))) for grid in args.grids.split(",")],
+        base_seed=args.seed,
+    )
+    rows = run_farm(jobs, args.out, args.games, args.max_ticks, args.workers)
+    print(f"Готово: {len(jobs)} заданий, {rows} партий записано в {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,603 @@
+"""Игровая логика змейки без pygame.
+
+Модуль не открывает окно и не использует звук, поэтому его можно
+импортировать в симуляциях и проверках на машинах без дисплея.
+Отрисовка и звуки остаются в test.py и работают по событиям,
+которые возвращает SnakeGame.step.
+"""
+import random
+from collections import deque
+
+# Количество пазлов на уровне и очков за один пазл
+PUZZLES_PER_LEVEL = 6
+POINTS_PER_PUZZLE = 100
+
+# Система уровней
+LEVELS = [
+    {
+        "name": "Лес",
+        "puzzles_needed": 6,
+        "background_file": "level1_forest.jpg",
+        "unlocked": True,
+        "completed": False,
+        "color": (34, 139, 34),
+        "preview_file": "level1_forest.jpg",  # Используем тот же файл
+        "background_seed": 1,  # seed фона по умолчанию (если картинки нет)
+        "food_count": 1,  # Сколько еды лежит на поле одновременно
+        "loot_table": "default",  # Редкость еды (LOOT_TABLES)
+        "obstacles": 0,  # Неподвижные препятствия
+        "moving_obstacles": 0  # Движущиеся препятствия
+    },
+    {
+        "name": "Горы",
+        "puzzles_needed": 12,
+        "background_file": "level2_mountains.jpg",
+        "unlocked": False,
+        "completed": False,
+        "color": (139, 137, 137),
+        "preview_file": "level2_mountains.jpg",  # Используем тот же файл
+        "background_seed": 2,  # seed фона по умолчанию (если картинки нет)
+        "food_count": 2,  # Сколько еды лежит на поле одновременно
+        "loot_table": "default",  # Редкость еды (LOOT_TABLES)
+        "obstacles": 8,  # Неподвижные препятствия
+        "moving_obstacles": 0  # Движущиеся препятствия
+    },
+    {
+        "name": "Океан",
+        "puzzles_needed": 18,
+        "background_file": "level3_ocean.jpg",
+        "unlocked": False,
+        "completed": False,
+        "color": (30, 144, 255),
+        "preview_file": "level3_ocean.jpg",  # Используем тот же файл
+        "background_seed": 3,  # seed фона по умолчанию (если картинки нет)
+        "food_count": 3,  # Сколько еды лежит на поле одновременно
+        "loot_table": "default",  # Редкость еды (LOOT_TABLES)
+        "obstacles": 12,  # Неподвижные препятствия
+        "moving_obstacles": 2  # Движущиеся препятствия
+    },
+    {
+        "name": "Пустыня",
+        "puzzles_needed": 24,
+        "background_file": "level4_desert.jpg",
+        "unlocked": False,
+        "completed": False,
+        "color": (238, 203, 173),
+        "preview_file": "level4_desert.jpg",  # Используем тот же файл
+        "background_seed": 4,  # seed фона по умолчанию (если картинки нет)
+        "food_count": 4,  # Сколько еды лежит на поле одновременно
+        "loot_table": "default",  # Редкость еды (LOOT_TABLES)
+        "obstacles": 16,  # Неподвижные препятствия
+        "moving_obstacles": 4  # Движущиеся препятствия
+    },
+    {
+        "name": "Космос",
+        "puzzles_needed": 30,
+        "background_file": "level5_space.jpg",
+        "unlocked": False,
+        "completed": False,
+        "color": (25, 25, 112),
+        "preview_file": "level5_space.jpg",  # Используем тот же файл
+        "background_seed": 5,  # seed фона по умолчанию (если картинки нет)
+        "food_count": 5,  # Сколько еды лежит на поле одновременно
+        "loot_table": "default",  # Редкость еды (LOOT_TABLES)
+        "obstacles": 20,  # Неподвижные препятствия
+        "moving_obstacles": 6  # Движущиеся препятствия
+    }
+]
+
+# Виды еды: очки и редкость (цвета задаются в test.py)
+FOOD_TYPES = [
+    {"points": 10, "name": "normal", "rarity": 50},
+    {"points": 20, "name": "good", "rarity": 30},
+    {"points": 30, "name": "great", "rarity": 15},
+    {"points": 40, "name": "excellent", "rarity": 4},
+    {"points": 50, "name": "amazing", "rarity": 1}
+]
+
+# Таблицы еды уровней по имени (LEVELS[...]["loot_table"]). Пока у всех
+# уровней таблица по умолчанию; уровень может задать и свой список еды
+LOOT_TABLES = {
+    "default": FOOD_TYPES,
+}
+
+# Направления движения
+UP = (0, -1)
+DOWN = (0, 1)
+LEFT = (-1, 0)
+RIGHT = (1, 0)
+
+# Движущиеся препятствия делают шаг раз в столько тиков
+MOVING_OBSTACLE_PERIOD = 2
+# Перед головой змейки на старте препятствия не ставятся (клеток)
+OBSTACLE_SAFE_DISTANCE = 5
+
+class FreeCellIndex:
+    """Множество свободных клеток поля с выбором случайной клетки за O(1).
+
+    Клетки пронумерованы построчно (y * width + x) и лежат в виртуальном
+    списке: клетка с номером i стоит на месте i, пока ее не сдвинули.
+    Удаление переставляет последнюю клетку на место удаленной, а в
+    словарях хранятся только сдвинутые клетки. Поэтому создание и память
+    не зависят от размера поля (важно для больших арен), а порядок
+    выбора совпадает с обычным списком всех клеток.
+    """
+    def __init__(self, width, height):
+        self.width = width
+        self.size = width * height
+        self.cell_at = {}    # место -> номер клетки, если они не совпадают
+        self.place_of = {}   # номер клетки -> место, если они не совпадают
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, cell):
+        number = cell[1] * self.width + cell[0]
+        place = self.place_of.get(number, number)
+        return place < self.size and self.cell_at.get(place, place) == number
+
+    def put(self, place, number):
+        if place == number:
+            self.cell_at.pop(place, None)
+            self.place_of.pop(number, None)
+        else:
+            self.cell_at[place] = number
+            self.place_of[number] = place
+
+    def remove(self, cell):
+        number = cell[1] * self.width + cell[0]
+        place = self.place_of.get(number, number)
+        if place >= self.size or self.cell_at.get(place, place) != number:
+            return
+        self.place_of.pop(number, None)
+        self.size -= 1
+        last = self.cell_at.pop(self.size, self.size)
+        if last != number:
+            self.put(place, last)
+
+    def add(self, cell):
+        number = cell[1] * self.width + cell[0]
+        place = self.place_of.get(number, number)
+        if place < self.size and self.cell_at.get(place, place) == number:
+            return
+        self.put(self.size, number)
+        self.size += 1
+
+    def choice(self, rng=random):
+        """Случайная свободная клетка или None, если поле заполнено"""
+        if not self.size:
+            return None
+        place = rng.randrange(self.size)
+        number = self.cell_at.get(place, place)
+        return number % self.width, number // self.width
+
+class SpatialHash:
+    """Сущности поля (еда, препятствия) по клеткам.
+
+    Каждая сущность занимает одну клетку, поэтому хэш - словарь
+    клетка -> сущность: проверка клетки головы и перемещение сущности
+    стоят O(1) при любом числе сущностей. Сущности также разложены по
+    видам (в порядке добавления) - для обхода и отрисовки пакетами.
+    """
+    def __init__(self):
+        self.cells = {}
+        self.kinds = {}  # вид -> {сущность: None}
+
+    def __len__(self):
+        return len(self.cells)
+
+    def at(self, cell):
+        return self.cells.get(cell)
+
+    def of_kind(self, kind):
+        return self.kinds.get(kind, {})
+
+    def add(self, entity):
+        self.cells[entity.position] = entity
+        self.kinds.setdefault(entity.kind, {})[entity] = None
+
+    def remove(self, entity):
+        del self.cells[entity.position]
+        del self.kinds[entity.kind][entity]
+
+    def move(self, entity, cell):
+        del self.cells[entity.position]
+        entity.position = cell
+        self.cells[cell] = entity
+
+class AliasTable:
+    """Выбор элемента с целыми весами за O(1): таблица псевдонимов (Уолкер/Воуз).
+
+    Таблица строится один раз за O(n): у каждого столбца i порог prob[i]
+    и псевдоним alias[i]. Выбор - одно случайное число u из
+    [0, n * total): столбец u // total, и если u % total не меньше
+    порога - его псевдоним. Веса целые, поэтому вероятности точные.
+    """
+    def __init__(self, items, weights):
+        self.items = list(items)
+        self.n = len(self.items)
+        self.total = sum(weights)
+        scaled = [weight * self.n for weight in weights]
+        self.prob = [self.total] * self.n
+        self.alias = list(range(self.n))
+        self.arrays = None
+
+        small = [i for i, weight in enumerate(scaled) if weight < self.total]
+        large = [i for i, weight in enumerate(scaled) if weight >= self.total]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self.prob[less] = scaled[less]
+            self.alias[less] = more
+            scaled[more] -= self.total - scaled[less]
+            (small if scaled[more] < self.total else large).append(more)
+
+    def sample_index(self, rng=random):
+        column, roll = divmod(rng.randrange(self.n * self.total), self.total)
+        return column if roll < self.prob[column] else self.alias[column]
+
+    def sample(self, rng=random):
+        return self.items[self.sample_index(rng)]
+
+    def sample_indices(self, generator, size):
+        """Пакетный выбор для симуляций на NumPy: массив из size индексов.
+
+        generator - numpy.random.Generator; NumPy импортируется только здесь.
+        """
+        import numpy as np
+
+        if self.arrays is None:
+            self.arrays = (np.array(self.prob, dtype=np.int64), np.array(self.alias, dtype=np.int64))
+        prob, alias = self.arrays
+        column, roll = np.divmod(generator.integers(0, self.n * self.total, size=size), self.total)
+        return np.where(roll < prob[column], column, alias[column])
+
+# Общие таблицы псевдонимов: id списка видов еды -> AliasTable
+_LOOT_TABLES_BUILT = {}
+
+def get_loot_table(food_types):
+    """Таблица псевдонимов для списка видов еды или имени из LOOT_TABLES.
+
+    Строится один раз на список и общая для всей еды с этим списком
+    (список не должен меняться после первого выбора).
+    """
+    if isinstance(food_types, str):
+        food_types = LOOT_TABLES[food_types]
+    table = _LOOT_TABLES_BUILT.get(id(food_types))
+    if table is None or table.source is not food_types:
+        table = AliasTable(food_types, [food["rarity"] for food in food_types])
+        table.source = food_types
+        _LOOT_TABLES_BUILT[id(food_types)] = table
+    return table
+
+class Progress:
+    """Общий прогресс игрока: всего собранных пазлов и состояние уровней"""
+    def __init__(self, levels=LEVELS, total_puzzles=0):
+        self.levels = levels
+        self.total_puzzles = total_puzzles
+
+def copy_levels(levels=LEVELS):
+    """Копия состояния уровней для симуляций (не трогает LEVELS игры)"""
+    return [dict(level) for level in levels]
+
+class Snake:
+    def __init__(self, current_level_index, progress, grid_width, grid_height, rng=random):
+        self.grid_width = grid_width
+        self.grid_height = grid_height
+        self.progress = progress
+        self.rng = rng
+
+        # Тело змейки (голова слева) и множество занятых клеток
+        self.positions = deque([(grid_width // 2, grid_height // 2)])
+        self.occupied = set(self.positions)
+        self.free_cells = FreeCellIndex(grid_width, grid_height)
+        for position in self.positions:
+            self.free_cells.remove(position)
+        self.direction = RIGHT
+        self.length = 1
+        self.score = 0
+        self.revealed_puzzles = set()
+        self.available_puzzles = list(range(PUZZLES_PER_LEVEL))
+        rng.shuffle(self.available_puzzles)
+        self.current_level_index = current_level_index
+        self.game_won = False
+        self.new_level_unlocked = False
+        self.unlocked_level_index = None
+
+    def get_head_position(self):
+        return self.positions[0]
+
+    def occupies(self, position):
+        """Проверка, занята ли клетка телом змейки"""
+        return position in self.occupied
+
+    def next_position(self, direction=None):
+        """Клетка, в которую голова попадет на следующем шаге (по direction или текущему направлению)"""
+        head_x, head_y = self.get_head_position()
+        dir_x, dir_y = self.direction if direction is None else direction
+        return (head_x + dir_x) % self.grid_width, (head_y + dir_y) % self.grid_height
+
+    def move(self):
+        """Шаг змейки, возвращает True при столкновении с собой"""
+        if self.game_won:
+            return False
+
+        new_x, new_y = self.next_position()
+
+        # Голова не может сдвинуться на свою же клетку, поэтому
+        # проверка по всему телу совпадает с проверкой без головы
+        if (new_x, new_y) in self.occupied:
+            return True
+
+        self.positions.appendleft((new_x, new_y))
+        self.occupied.add((new_x, new_y))
+        self.free_cells.remove((new_x, new_y))
+        if len(self.positions) > self.length:
+            tail = self.positions.pop()
+            self.occupied.discard(tail)
+            self.free_cells.add(tail)
+        return False
+
+    def grow(self, points):
+        """Рост змейки после еды, возвращает список игровых событий"""
+        events = []
+        self.length += 1
+        self.score += points
+        levels = self.progress.levels
+
+        # Открываем новый пазл каждые 100 очков
+        if not self.game_won and self.score // POINTS_PER_PUZZLE > len(self.revealed_puzzles):
+            if self.available_puzzles:
+                new_puzzle = self.available_puzzles.pop(0)
+                self.revealed_puzzles.add(new_puzzle)
+                self.progress.total_puzzles += 1
+                events.append(("puzzle_open", new_puzzle))
+
+                # Проверяем, собраны ли все пазлы уровня
+                if len(self.revealed_puzzles) == PUZZLES_PER_LEVEL:
+                    self.game_won = True
+
+                    # Отмечаем текущий уровень как пройденный
+                    levels[self.current_level_index]["completed"] = True
+                    events.append(("level_completed", self.current_level_index))
+
+                    # Проверяем и открываем следующий уровень
+                    next_level_index = self.current_level_index + 1
+                    if next_level_index < len(levels):
+                        if self.progress.total_puzzles >= levels[next_level_index]["puzzles_needed"]:
+                            if not levels[next_level_index]["unlocked"]:
+                                self.unlock_level(next_level_index)
+                                events.append(("level_unlock", next_level_index))
+
+                # Проверяем, открылся ли новый уровень по количеству пазлов
+                for i, level in enumerate(levels):
+                    if not level["unlocked"] and self.progress.total_puzzles >= level["puzzles_needed"]:
+                        self.unlock_level(i)
+                        events.append(("level_unlock", i))
+
+        events.append(("eat", points))
+        return events
+
+    def unlock_level(self, level_index):
+        self.progress.levels[level_index]["unlocked"] = True
+        self.new_level_unlocked = True
+        self.unlocked_level_index = level_index
+
+    def change_direction(self, new_direction):
+        if (new_direction[0] * -1, new_direction[1] * -1) != self.direction:
+            self.direction = new_direction
+
+class Food:
+    # Таблица видов еды, если уровень не задал свою (loot_table)
+    food_types = FOOD_TYPES
+    kind = "food"
+    solid = False
+
+    def __init__(self, free_cells, rng=random, loot_table=None):
+        self.position = (0, 0)
+        self.free_cells = free_cells
+        self.rng = rng
+        self.loot_table = loot_table if loot_table is not None else get_loot_table(self.food_types)
+        self.points = 10
+        self.type = "normal"
+        self.randomize_position()
+        self.randomize_type()
+
+    def randomize_position(self):
+        """Новая позиция еды; False, если свободных клеток не осталось.
+
+        Клетка еды перестает быть свободной, поэтому несколько единиц еды
+        и препятствия не попадают в одну клетку.
+        """
+        self.position = self.free_cells.choice(self.rng)
+        if self.position is None:
+            return False
+        self.free_cells.remove(self.position)
+        return True
+
+    def randomize_type(self):
+        food_type = self.loot_table.sample(self.rng)
+        self.points = food_type["points"]
+        self.type = food_type["name"]
+
+class Obstacle:
+    """Неподвижное препятствие: голова в этой клетке - конец игры"""
+    kind = "obstacle"
+    solid = True
+
+    def __init__(self, position):
+        self.position = position
+
+class MovingObstacle(Obstacle):
+    """Препятствие, которое ходит по прямой и разворачивается перед занятой клеткой"""
+    kind = "moving_obstacle"
+
+    def __init__(self, position, direction):
+        super().__init__(position)
+        self.direction = direction
+
+    def next_position(self, grid_width, grid_height):
+        return ((self.position[0] + self.direction[0]) % grid_width,
+                (self.position[1] + self.direction[1]) % grid_height)
+
+class SnakeGame:
+    """Одна партия на уровне: змейка, еда и правила без отрисовки.
+
+    step(action) продвигает игру на один тик и возвращает список
+    событий вида (имя, значение): "eat", "puzzle_open",
+    "level_completed", "level_unlock", "game_over", "board_full".
+    Повороты из queue_direction применяются по одному за тик, поэтому
+    быстрые нажатия между тиками не теряются.
+
+    Еда и препятствия лежат в пространственном хэше entities; их число
+    задается в LEVELS ("food_count", "obstacles", "moving_obstacles"),
+    редкость еды - таблицей уровня "loot_table" (имя из LOOT_TABLES или
+    список видов еды).
+    """
+    def __init__(self, level_index, progress, grid_width, grid_height, rng=None,
+                 snake_cls=Snake, food_cls=Food):
+        self.level_index = level_index
+        self.progress = progress
+        self.rng = rng if rng is not None else random.Random()
+        self.food_cls = food_cls
+        self.snake = snake_cls(level_index, progress, grid_width, grid_height, self.rng)
+        self.entities = SpatialHash()
+        level = progress.levels[level_index]
+        self.loot_table = get_loot_table(level["loot_table"]) if "loot_table" in level else None
+        for _ in range(level.get("food_count", 1)):
+            self.spawn_food()
+        self.place_obstacles(level.get("obstacles", 0), level.get("moving_obstacles", 0))
+        self.game_over = False
+        self.game_won = False
+        self.ticks = 0
+        self.direction_queue = deque(maxlen=3)
+
+    @property
+    def finished(self):
+        return self.game_over or self.game_won
+
+    @property
+    def foods(self):
+        return self.entities.of_kind("food")
+
+    @property
+    def food(self):
+        """Самая старая еда на поле (для стратегий и кода с одной едой)"""
+        return next(iter(self.foods), None)
+
+    def spawn_food(self):
+        """Еда в случайной свободной клетке; None, если класть некуда"""
+        food = self.food_cls(self.snake.free_cells, self.rng, self.loot_table)
+        if food.position is None:
+            return None
+        self.entities.add(food)
+        return food
+
+    def place_obstacles(self, count, moving_count):
+        """Препятствия в случайных свободных клетках, кроме пути перед головой"""
+        if not count and not moving_count:
+            return
+        free_cells = self.snake.free_cells
+        head_x, head_y = self.snake.get_head_position()
+        dir_x, dir_y = self.snake.direction
+        safe_cells = [((head_x + dir_x * i) % self.snake.grid_width, (head_y + dir_y * i) % self.snake.grid_height)
+                      for i in range(1, OBSTACLE_SAFE_DISTANCE + 1)]
+        safe_cells = [cell for cell in safe_cells if cell in free_cells]
+        for cell in safe_cells:
+            free_cells.remove(cell)
+
+        for i in range(count + moving_count):
+            cell = free_cells.choice(self.rng)
+            if cell is None:
+                break
+            free_cells.remove(cell)
+            if i < count:
+                self.entities.add(Obstacle(cell))
+            else:
+                direction = self.rng.choice((UP, DOWN, LEFT, RIGHT))
+                self.entities.add(MovingObstacle(cell, direction))
+
+        for cell in safe_cells:
+            free_cells.add(cell)
+
+    def move_obstacles(self):
+        """Шаг движущихся препятствий (только в свободные клетки)"""
+        if self.ticks % MOVING_OBSTACLE_PERIOD:
+            return
+        free_cells = self.snake.free_cells
+        for obstacle in list(self.entities.of_kind("moving_obstacle")):
+            target = obstacle.next_position(self.snake.grid_width, self.snake.grid_height)
+            if target not in free_cells:
+                obstacle.direction = (-obstacle.direction[0], -obstacle.direction[1])
+                continue
+            free_cells.add(obstacle.position)
+            free_cells.remove(target)
+            self.entities.move(obstacle, target)
+
+    def change_direction(self, new_direction):
+        self.snake.change_direction(new_direction)
+
+    def queue_direction(self, new_direction):
+        """Поворот в очередь (повторы и разворот назад отбрасываются)"""
+        last = self.direction_queue[-1] if self.direction_queue else self.snake.direction
+        if new_direction == last or (-new_direction[0], -new_direction[1]) == last:
+            return
+        self.direction_queue.append(new_direction)
+
+    def step(self, action=None):
+        """Один тик игры; action - новое направление или None (из очереди)"""
+        if self.finished:
+            return []
+        if action is None and self.direction_queue:
+            action = self.direction_queue.popleft()
+        if action is not None:
+            self.snake.change_direction(action)
+
+        self.ticks += 1
+        # Что лежит в клетке перед головой - одна проверка по хэшу
+        entity = self.entities.at(self.snake.next_position())
+        if entity is not None and entity.solid or self.snake.move():
+            self.game_over = True
+            return [("game_over", None)]
+
+        events = []
+        if entity is not None and entity.kind == "food":
+            events = self.snake.grow(entity.points)
+            self.game_won = self.snake.game_won
+            self.entities.remove(entity)
+            if self.spawn_food() is None and not self.foods:
+                # Змейка заняла все поле - еду положить некуда
+                self.game_over = True
+                events.append(("board_full", None))
+        self.move_obstacles()
+        return events
+
+def greedy_action(game):
+    """Простейшая стратегия для симуляций: двигаться к ближайшей еде (сначала по x).
+
+    Ход в клетку с препятствием не выбирается: тогда берется второе
+    направление к еде, затем остальные. Собственное тело стратегия не
+    обходит. Ходы те же, что у batch_sim.BatchSnakeSim.greedy_actions.
+    """
+    snake = game.snake
+    head_x, head_y = snake.get_head_position()
+    food = min(game.foods, default=None,
+               key=lambda food: abs(food.position[0] - head_x) + abs(food.position[1] - head_y))
+    if food is None:
+        return None
+    food_x, food_y = food.position
+
+    preferred = []
+    if food_x > head_x:
+        preferred.append(RIGHT)
+    elif food_x < head_x:
+        preferred.append(LEFT)
+    preferred.append(DOWN if food_y > head_y else UP)
+    preferred.extend(action for action in (UP, DOWN, LEFT, RIGHT) if action not in preferred)
+
+    for action in preferred:
+        # Разворот назад змейка игнорирует и едет прямо
+        reverse = (-action[0], -action[1]) == snake.direction
+        entity = game.entities.at(snake.next_position(None if reverse else action))
+        if entity is None or not entity.solid:
+            return action
+    return preferred[0]
@@ -1,11 +1,18 @@
 import pygame
+import argparse
+import atexit
+import math
 import random
 import os
 import time
-import json
+import queue
+import threading
+from collections import OrderedDict
 
-# Инициализация Pygame
-pygame.init()
+import snake_core
+import texture_pack
+from progress_store import ProfileStore, load_legacy_progress
+from snake_core import LEVELS, PUZZLES_PER_LEVEL
 
 # Цвета
 WHITE = (255, 255, 255)
@@ -32,64 +39,152 @@ GRID_SIZE = 20
 GRID_WIDTH = WIDTH // GRID_SIZE
 GRID_HEIGHT = HEIGHT // GRID_SIZE
 
-# Создание экрана
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("Змейка - Собери мир!")
-
-# Инициализация звуковой системы
-pygame.mixer.init()
-
-# Система уровней
-LEVELS = [
-    {
-        "name": "Лес",
-        "puzzles_needed": 6,
-        "background_file": "level1_forest.jpg",
-        "unlocked": True,
-        "completed": False,
-        "color": (34, 139, 34),
-        "preview_file": "level1_forest.jpg"  # Используем тот же файл
-    },
-    {
-        "name": "Горы",
-        "puzzles_needed": 12,
-        "background_file": "level2_mountains.jpg", 
-        "unlocked": False,
-        "completed": False,
-        "color": (139, 137, 137),
-        "preview_file": "level2_mountains.jpg"  # Используем тот же файл
-    },
-    {
-        "name": "Океан",
-        "puzzles_needed": 18,
-        "background_file": "level3_ocean.jpg",
-        "unlocked": False,
-        "completed": False,
-        "color": (30, 144, 255),
-        "preview_file": "level3_ocean.jpg"  # Используем тот же файл
-    },
-    {
-        "name": "Пустыня",
-        "puzzles_needed": 24,
-        "background_file": "level4_desert.jpg",
-        "unlocked": False,
-        "completed": False,
-        "color": (238, 203, 173),
-        "preview_file": "level4_desert.jpg"  # Используем тот же файл
-    },
-    {
-        "name": "Космос",
-        "puzzles_needed": 30,
-        "background_file": "level5_space.jpg",
-        "unlocked": False,
-        "completed": False,
-        "color": (25, 25, 112),
-        "preview_file": "level5_space.jpg"  # Используем тот же файл
-    }
-]
+# Большая арена: размер поля в клетках (None - поле по размеру окна,
+# запуск: --board 500x500). Поле больше окна показывается камерой
+BOARD_SIZE = None
+# Сторона куска большого поля в клетках и сколько кусков держать готовыми
+CHUNK_CELLS = 16
+CHUNK_CACHE_SIZE = 48
+
+def board_size():
+    return BOARD_SIZE or (GRID_WIDTH, GRID_HEIGHT)
+
+# Частота кадров во время игры (логика идет со скоростью SNAKE_SPEED)
+RENDER_FPS = 60
+# Больше этого времени за один кадр логика не догоняет (секунды)
+MAX_FRAME_TIME = 0.25
+
+# Перерисовка только изменившихся участков экрана во время игры
+# (снижает нагрузку на слабых машинах; включается ключом --dirty-rects)
+DIRTY_RECT_RENDERING = False
+
+# Окно создается в init_game(), звук и шрифты - при первом обращении,
+# поэтому модуль можно импортировать без дисплея (симуляции, утилиты)
+screen = None
+MIXER_AVAILABLE = None
+MUSIC_FILE = "background_music.mp3"
+MUSIC_LOADED = False
+
+# Игра всегда рисует в логическом разрешении WIDTH x HEIGHT, а на экран
+# кадр растягивается целиком, поэтому на мониторах 1080p/4K рисуется
+# столько же пикселей, сколько в окне 600x400 (запуск: --fullscreen)
+FULLSCREEN = False
+# Окно при программном масштабировании (если pygame.SCALED недоступен),
+# иначе None - растягивает SDL на видеокарте
+window = None
+PRESENT_CACHE = {}  # размер области на экране -> масштабированный кадр
+
+def init_game(fullscreen=None):
+    """Создание окна игры (видеоподсистема pygame)"""
+    global screen, window
+    if screen is None:
+        if fullscreen is None:
+            fullscreen = FULLSCREEN
+        pygame.display.init()
+        flags = pygame.FULLSCREEN if fullscreen else 0
+        try:
+            screen = pygame.display.set_mode((WIDTH, HEIGHT), pygame.SCALED | flags)
+        except pygame.error as e:
+            print(f"Масштабирование SCALED недоступно ({e}), кадр растягивается программно")
+            size = (0, 0) if fullscreen else (WIDTH, HEIGHT)
+            window = pygame.display.set_mode(size, flags or pygame.RESIZABLE)
+            screen = pygame.Surface((WIDTH, HEIGHT)).convert()
+        pygame.display.set_caption("Змейка - Собери мир!")
+    return screen
+
+def present_area():
+    """Место кадра в окне: наибольший масштаб с сохранением пропорций"""
+    window_width, window_height = window.get_size()
+    scale = min(window_width / WIDTH, window_height / HEIGHT)
+    area = pygame.Rect(0, 0, round(WIDTH * scale), round(HEIGHT * scale))
+    area.center = (window_width // 2, window_height // 2)
+    return area
+
+def present(rects=None):
+    """Показ кадра: обновляются rects логического экрана или весь экран.
+    
+    С pygame.SCALED это обычный display.update. При программном
+    масштабировании кадр растягивается smoothscale в поверхность,
+    которая переиспользуется, пока не изменится размер окна.
+    """
+    if window is None:
+        if rects is None:
+            pygame.display.update()
+        else:
+            pygame.display.update(rects)
+        return
+    
+    area = present_area()
+    if area.size == screen.get_size():
+        window.blit(screen, area)
+    else:
+        if area.size not in PRESENT_CACHE:
+            PRESENT_CACHE.clear()
+            PRESENT_CACHE[area.size] = pygame.Surface(area.size).convert()
+            window.fill(BLACK)  # Поля по краям при другом соотношении сторон
+        scaled = PRESENT_CACHE[area.size]
+        pygame.transform.smoothscale(screen, area.size, scaled)
+        window.blit(scaled, area)
+    pygame.display.flip()
+
+def to_logical(event):
+    """Событие мыши с координатами логического экрана (SCALED делает это сам)"""
+    if window is None or not hasattr(event, "pos"):
+        return event
+    area = present_area()
+    x = (event.pos[0] - area.x) * WIDTH // max(area.width, 1)
+    y = (event.pos[1] - area.y) * HEIGHT // max(area.height, 1)
+    return pygame.event.Event(event.type, dict(event.dict, pos=(x, y)))
+
+def mouse_position():
+    if window is None:
+        return pygame.mouse.get_pos()
+    return to_logical(pygame.event.Event(pygame.MOUSEMOTION, pos=pygame.mouse.get_pos())).pos
+
+def ensure_mixer():
+    """Запуск звуковой системы при первом обращении; False, если звука нет"""
+    global MIXER_AVAILABLE
+    if MIXER_AVAILABLE is None:
+        try:
+            pygame.mixer.init()
+            MIXER_AVAILABLE = True
+        except pygame.error as e:
+            print(f"Звук недоступен: {e}")
+            MIXER_AVAILABLE = False
+    return MIXER_AVAILABLE
+
+def start_menu_music():
+    """Загрузка и запуск фоновой музыки"""
+    global MUSIC_LOADED
+    if os.path.exists(MUSIC_FILE) and ensure_mixer():
+        try:
+            pygame.mixer.music.load(MUSIC_FILE)
+            pygame.mixer.music.play(-1)
+            pygame.mixer.music.set_volume(MUSIC_VOLUME)
+            MUSIC_LOADED = True
+        except pygame.error:
+            print("Не удалось загрузить фоновую музыку")
+
+def restart_music():
+    """Фоновая музыка с начала (если она загружена)"""
+    if MUSIC_LOADED:
+        pygame.mixer.music.play(-1)
+        pygame.mixer.music.set_volume(MUSIC_VOLUME)
 
-# Глобальные переменные для сохранения прогресса
+def stop_music():
+    if MUSIC_LOADED:
+        pygame.mixer.music.stop()
 
+def toggle_music_pause():
+    if MUSIC_LOADED:
+        if pygame.mixer.music.get_busy():
+            pygame.mixer.music.pause()
+        else:
+            pygame.mixer.music.unpause()
+
+def set_music_volume(volume):
+    if MUSIC_LOADED:
+        pygame.mixer.music.set_volume(volume)
 
 # Доступные цвета для змейки
 SNAKE_COLORS = [
@@ -101,21 +196,66 @@ SNAKE_COLORS = [
     {"name": "Золотой", "color": (255, 215, 0)}
 ]
 
+# Глобальные переменные для сохранения прогресса (значения по умолчанию,
+# если файла прогресса еще нет)
+TOTAL_PUZZLES_COLLECTED = 0
+SNAKE_SPEED = 10
+SNAKE_COLOR = SNAKE_COLORS[0]["color"]
+MUSIC_VOLUME = 0.5
+SOUND_VOLUME = 1.0
+
+# Прогресс всех профилей хранится в базе SQLite, запись идет в фоне
+PROGRESS_DB_FILE = "game_progress.db"
+PROGRESS_STORE = None
+
+# Файлы прогресса прежних версий (переносятся в первый профиль)
+PROGRESS_FILE = "game_progress.json"
+PROGRESS_JOURNAL_FILE = "game_progress.journal"
+LEGACY_PROGRESS_FILE = "game_progress.txt"
+
+DEFAULT_PROFILE_NAME = "Игрок 1"
+ACTIVE_PROFILE_ID = None
+ACTIVE_PROFILE_NAME = DEFAULT_PROFILE_NAME
+
+def get_progress_store():
+    """База профилей (открывается при первом обращении)"""
+    global PROGRESS_STORE
+    if PROGRESS_STORE is None:
+        PROGRESS_STORE = ProfileStore(PROGRESS_DB_FILE)
+        atexit.register(PROGRESS_STORE.close)
+    return PROGRESS_STORE
+
+def get_snake_color_index():
+    """Индекс текущего цвета змейки в SNAKE_COLORS"""
+    for i, color_data in enumerate(SNAKE_COLORS):
+        if color_data["color"] == SNAKE_COLOR:
+            return i
+    return 0
+
+def active_profile_id():
+    """id текущего профиля (если прогресс еще не загружали - последнего игравшего)"""
+    if ACTIVE_PROFILE_ID is None:
+        open_active_profile()
+    return ACTIVE_PROFILE_ID
+
+def record_progress_event(kind, **data):
+    """Запись события прогресса текущего профиля (в фоновом потоке)"""
+    get_progress_store().record(kind, profile=active_profile_id(), **data)
+
+def record_high_score(level_index, score, puzzles):
+    """Запись результата партии, возвращает рекорд профиля на уровне"""
+    best = get_progress_store().high_scores(active_profile_id(), level_index, 1)
+    record_progress_event("high_score", level=level_index, score=score, puzzles=puzzles)
+    return max(score, best[0][0]) if best else score
+
 def save_progress():
-    """Сохранение прогресса в файл"""
+    """Сохранение полного прогресса текущего профиля"""
     global TOTAL_PUZZLES_COLLECTED, SNAKE_SPEED, SNAKE_COLOR, MUSIC_VOLUME, SOUND_VOLUME
     try:
-        # Находим индекс текущего цвета змейки
-        color_index = 0
-        for i, color_data in enumerate(SNAKE_COLORS):
-            if color_data["color"] == SNAKE_COLOR:
-                color_index = i
-                break
-        
         progress_data = {
             "total_puzzles": TOTAL_PUZZLES_COLLECTED,
             "snake_speed": SNAKE_SPEED,
-            "snake_color_index": color_index,
+            "snake_color_index": get_snake_color_index(),
             "music_volume": MUSIC_VOLUME,
             "sound_volume": SOUND_VOLUME,
             "levels": []
@@ -127,21 +267,38 @@ def save_progress():
                 "completed": level["completed"]
             })
         
-        with open("game_progress.json", "w") as f:
-            json.dump(progress_data, f, indent=2)
+        record_progress_event("snapshot", state=progress_data)
             
     except Exception as e:
         print(f"Ошибка сохранения прогресса: {e}")
 
-def load_progress():
-    """Загрузка прогресса из файла"""
+def open_active_profile(name=None):
+    """Открытие профиля: по имени, иначе последнего игравшего.
+
+    При первом запуске создается профиль по умолчанию, и в него
+    переносится прогресс из файлов прежних версий.
+    """
+    global ACTIVE_PROFILE_ID, ACTIVE_PROFILE_NAME
+    if name is None:
+        recent = get_progress_store().recent_profiles(1)
+        name = recent[0][1] if recent else DEFAULT_PROFILE_NAME
+    first_run = get_progress_store().profile_count() == 0
+    ACTIVE_PROFILE_ID = get_progress_store().open_profile(name)
+    ACTIVE_PROFILE_NAME = name
+    if first_run:
+        legacy_state = load_legacy_progress(PROGRESS_FILE, PROGRESS_JOURNAL_FILE, LEGACY_PROGRESS_FILE)
+        if legacy_state is not None:
+            get_progress_store().import_state(ACTIVE_PROFILE_ID, legacy_state)
+            print(f"Прогресс перенесен в профиль {name}")
+
+def load_progress(profile_name=None):
+    """Загрузка прогресса профиля из базы"""
     global TOTAL_PUZZLES_COLLECTED, SNAKE_SPEED, SNAKE_COLOR, MUSIC_VOLUME, SOUND_VOLUME
     
     try:
-        if os.path.exists("game_progress.json"):
-            with open("game_progress.json", "r") as f:
-                progress_data = json.load(f)
-                
+        open_active_profile(profile_name)
+        progress_data = get_progress_store().load(ACTIVE_PROFILE_ID)
+        if progress_data is not None:
             TOTAL_PUZZLES_COLLECTED = progress_data.get("total_puzzles", 0)
             SNAKE_SPEED = progress_data.get("snake_speed", 10)
             
@@ -152,19 +309,36 @@ def load_progress():
             MUSIC_VOLUME = progress_data.get("music_volume", 0.5)
             SOUND_VOLUME = progress_data.get("sound_volume", 1.0)
             
+            # Уровни, которых нет в базе, - в начальном состоянии
             levels_data = progress_data.get("levels", [])
-            for i, level_data in enumerate(levels_data):
-                if i < len(LEVELS):
-                    LEVELS[i]["unlocked"] = level_data.get("unlocked", False)
-                    LEVELS[i]["completed"] = level_data.get("completed", False)
+            for i, level in enumerate(LEVELS):
+                if i < len(levels_data):
+                    level["unlocked"] = levels_data[i].get("unlocked", False)
+                    level["completed"] = levels_data[i].get("completed", False)
+                else:
+                    level["unlocked"] = (i == 0)
+                    level["completed"] = False
             
-            print(f"Прогресс загружен: {TOTAL_PUZZLES_COLLECTED} пазлов")
+            print(f"Прогресс загружен ({ACTIVE_PROFILE_NAME}): {TOTAL_PUZZLES_COLLECTED} пазлов")
             return True
     except Exception as e:
         print(f"Ошибка загрузки прогресса: {e}")
     
     return False
 
+def switch_profile(name):
+    """Переключение на другой профиль (текущий сохраняется)"""
+    save_progress()
+    load_progress(name)
+    set_music_volume(MUSIC_VOLUME)
+
+def new_profile_name():
+    """Свободное имя для нового профиля"""
+    number = get_progress_store().profile_count() + 1
+    while get_progress_store().has_profile(f"Игрок {number}"):
+        number += 1
+    return f"Игрок {number}"
+
 def reset_progress():
     """Сброс прогресса игры"""
     global TOTAL_PUZZLES_COLLECTED, SNAKE_SPEED, SNAKE_COLOR, MUSIC_VOLUME, SOUND_VOLUME
@@ -182,15 +356,146 @@ def reset_progress():
     save_progress()
     print("Прогресс сброшен!")
 
-class Button:
+class TextCache:
+    """Общий кэш шрифтов и отрендеренных строк для всех экранов"""
+    def __init__(self, max_surfaces=512):
+        self.max_surfaces = max_surfaces
+        self.fonts = OrderedDict()      # (face, size) -> pygame.font.Font
+        self.surfaces = OrderedDict()   # (text, color, size, face) -> Surface
+
+    def get_font(self, size, face='arial'):
+        key = (face, size)
+        font = self.fonts.get(key)
+        if font is None:
+            if not pygame.font.get_init():
+                pygame.font.init()
+            font = pygame.font.SysFont(face, size)
+            self.fonts[key] = font
+        else:
+            self.fonts.move_to_end(key)
+        return font
+
+    def render(self, text, size, color, face='arial'):
+        key = (text, tuple(color), size, face)
+        text_surface = self.surfaces.get(key)
+        if text_surface is None:
+            text_surface = self.get_font(size, face).render(text, True, color)
+            self.surfaces[key] = text_surface
+            # Вытесняем давно не использованные строки
+            if len(self.surfaces) > self.max_surfaces:
+                self.surfaces.popitem(last=False)
+        else:
+            self.surfaces.move_to_end(key)
+        return text_surface
+
+    def clear(self):
+        self.fonts.clear()
+        self.surfaces.clear()
+
+TEXT_CACHE = TextCache()
+
+def get_font(size, face='arial'):
+    """Шрифт из общего кэша"""
+    return TEXT_CACHE.get_font(size, face)
+
+def render_text(text, size, color, face='arial'):
+    """Отрендеренная строка из общего кэша (поверхность нельзя изменять)"""
+    return TEXT_CACHE.render(text, size, color, face)
+
+# Меню спят до следующего события; пока идет фоновая подгрузка, не
+# дольше этого времени (мс), чтобы забирать готовые файлы
+MENU_EVENT_TIMEOUT = 250
+
+# После этих событий окно перерисовывается целиком
+REDRAW_EVENTS = (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED, pygame.VIDEORESIZE)
+
+def wait_menu_events():
+    """События для меню: ожидание первого события, затем все накопившиеся.
+
+    Заодно забирает готовые файлы фоновой подгрузки - на любом экране
+    меню, иначе ожидание просыпалось бы по таймауту впустую.
+    """
+    ASSETS.poll_prefetched()
+    event = pygame.event.wait(MENU_EVENT_TIMEOUT if ASSETS.pending else 0)
+    if event.type == pygame.NOEVENT:
+        return []
+    return [to_logical(event) for event in [event] + pygame.event.get()]
+
+class Widget:
+    """Элемент интерфейса с кэшированной поверхностью.
+
+    Вид элемента полностью задается кортежем state(): поверхность
+    перерисовывается (render) только когда он меняется, а в остальное
+    время draw только копирует готовую картинку.
+    """
+    def __init__(self, rect, action=None):
+        self.rect = pygame.Rect(rect)
+        self.action = action
+        self.surface = None
+        self.surface_state = None
+    
+    def bounds(self):
+        """Область экрана, которую занимает элемент"""
+        return self.rect
+    
+    def state(self):
+        return ()
+    
+    def render(self):
+        raise NotImplementedError
+    
+    def get_surface(self):
+        state = self.state()
+        if self.surface is None or state != self.surface_state:
+            self.surface = self.render()
+            self.surface_state = state
+        return self.surface
+    
+    def draw(self, surface):
+        surface.blit(self.get_surface(), self.bounds())
+    
+    def handle_event(self, event, container):
+        """Реакция на событие; возвращает действие элемента или None"""
+        return None
+
+class Label(Widget):
+    """Строка текста; pos - середина верхнего края (center=True) или левый верхний угол"""
+    def __init__(self, pos, text, size, color, center=True):
+        super().__init__((pos, (0, 0)))
+        self.pos = pos
+        self.text = text
+        self.size = size
+        self.color = color
+        self.center = center
+    
+    def bounds(self):
+        rect = self.get_surface().get_rect()
+        if self.center:
+            rect.midtop = self.pos
+        else:
+            rect.topleft = self.pos
+        return rect
+    
+    def state(self):
+        return (self.text, tuple(self.color), self.size)
+    
+    def render(self):
+        return render_text(self.text, self.size, self.color)
+
+class Button(Widget):
     def __init__(self, x, y, width, height, text, action=None):
-        self.rect = pygame.Rect(x, y, width, height)
+        super().__init__((x, y, width, height), action)
         self.text = text
-        self.action = action
         self.hovered = False
         self.clicked = False
+    
+    def state(self):
+        return (self.text, self.hovered, self.clicked)
+        
+    def render(self):
+        surface = pygame.Surface(self.rect.size, pygame.SRCALPHA)
+        rect = surface.get_rect()
         
-    def draw(self, surface):
         # Определяем цвет кнопки
         if self.clicked:
             color = BUTTON_CLICK
@@ -200,14 +505,14 @@ class Button:
             color = BUTTON_COLOR
         
         # Рисуем кнопку
-        pygame.draw.rect(surface, color, self.rect, border_radius=10)
-        pygame.draw.rect(surface, WHITE, self.rect, 2, border_radius=10)
+        pygame.draw.rect(surface, color, rect, border_radius=10)
+        pygame.draw.rect(surface, WHITE, rect, 2, border_radius=10)
         
         # Рисуем текст
-        font = pygame.font.SysFont('arial', 24)
-        text_surface = font.render(self.text, True, WHITE)
-        text_rect = text_surface.get_rect(center=self.rect.center)
+        text_surface = render_text(self.text, 24, WHITE)
+        text_rect = text_surface.get_rect(center=rect.center)
         surface.blit(text_surface, text_rect)
+        return surface
         
     def check_hover(self, pos):
         self.hovered = self.rect.collidepoint(pos)
@@ -221,122 +526,233 @@ class Button:
         
     def reset_click(self):
         self.clicked = False
+    
+    def handle_event(self, event, container):
+        if event.type == pygame.MOUSEMOTION:
+            self.check_hover(event.pos)
+        elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+            if self.check_click(event.pos):
+                return self.action
+        elif event.type == pygame.MOUSEBUTTONUP and event.button == 1:
+            self.reset_click()
+        return None
 
-class Slider:
+class Slider(Widget):
     def __init__(self, x, y, width, height, min_val, max_val, current_val, label):
-        self.rect = pygame.Rect(x, y, width, height)
+        super().__init__((x, y, width, height))
         self.min_val = min_val
         self.max_val = max_val
         self.current_val = current_val
         self.label = label
         self.dragging = False
-        
-        # Вычисляем положение ползунка
         self.slider_width = 20
-        self.slider_pos = x + (current_val - min_val) / (max_val - min_val) * width
+    
+    def bounds(self):
+        # Подпись над полосой и ползунок, выступающий за ее края
+        return pygame.Rect(self.rect.x - self.slider_width // 2, self.rect.y - 25,
+                           self.rect.width + self.slider_width, self.rect.height + 30)
+    
+    def state(self):
+        return (self.label, self.current_val)
+        
+    def render(self):
+        bounds = self.bounds()
+        surface = pygame.Surface(bounds.size, pygame.SRCALPHA)
+        bar = self.rect.move(-bounds.x, -bounds.y)
         
-    def draw(self, surface):
         # Рисуем фон слайдера
-        pygame.draw.rect(surface, DARK_GRAY, self.rect, border_radius=5)
+        pygame.draw.rect(surface, DARK_GRAY, bar, border_radius=5)
         
         # Рисуем заполненную часть
-        fill_width = (self.current_val - self.min_val) / (self.max_val - self.min_val) * self.rect.width
-        fill_rect = pygame.Rect(self.rect.x, self.rect.y, fill_width, self.rect.height)
+        fill_width = (self.current_val - self.min_val) / (self.max_val - self.min_val) * bar.width
+        fill_rect = pygame.Rect(bar.x, bar.y, fill_width, bar.height)
         pygame.draw.rect(surface, BLUE, fill_rect, border_radius=5)
         
         # Рисуем ползунок
-        slider_rect = pygame.Rect(self.slider_pos - self.slider_width//2, 
-                                 self.rect.y - 5, 
+        slider_rect = pygame.Rect(bar.x + fill_width - self.slider_width//2, 
+                                 bar.y - 5, 
                                  self.slider_width, 
-                                 self.rect.height + 10)
+                                 bar.height + 10)
         pygame.draw.rect(surface, WHITE, slider_rect, border_radius=5)
         pygame.draw.rect(surface, BLACK, slider_rect, 2, border_radius=5)
         
         # Рисуем текст
-        font = pygame.font.SysFont('arial', 18)
-        label_text = font.render(f"{self.label}: {self.current_val}", True, WHITE)
-        surface.blit(label_text, (self.rect.x, self.rect.y - 25))
+        label_text = render_text(f"{self.label}: {self.current_val}", 18, WHITE)
+        surface.blit(label_text, (bar.x, 0))
+        return surface
         
     def update(self, pos, dragging):
         if dragging and self.rect.collidepoint(pos):
             self.dragging = True
             
         if self.dragging:
-            # Обновляем позицию ползунка
-            self.slider_pos = max(self.rect.x, min(pos[0], self.rect.x + self.rect.width))
-            
-            # Вычисляем значение
-            self.current_val = self.min_val + (self.slider_pos - self.rect.x) / self.rect.width * (self.max_val - self.min_val)
+            # Вычисляем значение по положению ползунка
+            slider_pos = max(self.rect.x, min(pos[0], self.rect.x + self.rect.width))
+            self.current_val = self.min_val + (slider_pos - self.rect.x) / self.rect.width * (self.max_val - self.min_val)
             self.current_val = round(self.current_val)
             
         return self.dragging
         
     def stop_dragging(self):
         self.dragging = False
+    
+    def handle_event(self, event, container):
+        if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+            if self.update(event.pos, True):
+                container.dragging = self
+        return None
 
-def show_main_menu():
-    """Показ главного меню"""
-    buttons = [
+class Swatch(Widget):
+    """Цветной квадрат с рамкой"""
+    def __init__(self, rect, color):
+        super().__init__(rect)
+        self.color = color
+    
+    def state(self):
+        return (tuple(self.color),)
+    
+    def render(self):
+        surface = pygame.Surface(self.rect.size)
+        surface.fill(self.color)
+        pygame.draw.rect(surface, WHITE, surface.get_rect(), 2)
+        return surface
+
+class UIContainer:
+    """Элементы одного экрана: общая обработка событий и отрисовка.
+
+    Неподвижная часть экрана (фон, заголовки) рисуется один раз в
+    background. render() сравнивает состояние каждого элемента с
+    последним нарисованным и обновляет на экране только изменившиеся:
+    под элементом восстанавливается фон, поверх копируется его
+    поверхность вместе с задетыми соседями.
+    """
+    def __init__(self, widgets=()):
+        self.widgets = []
+        self.drawn = []
+        self.background = None
+        self.full_redraw = True
+        self.dragging = None
+        for widget in widgets:
+            self.add(widget)
+    
+    def add(self, widget):
+        self.widgets.append(widget)
+        self.drawn.append(None)
+        self.full_redraw = True
+        if isinstance(widget, Button):
+            widget.check_hover(mouse_position())
+        return widget
+    
+    def set_background(self, background):
+        """Новый неподвижный слой экрана (кадр будет нарисован целиком)"""
+        self.background = background
+        self.full_redraw = True
+    
+    def invalidate(self):
+        self.full_redraw = True
+    
+    def handle_event(self, event):
+        """Передает событие элементам; возвращает действие нажатого элемента"""
+        if event.type in REDRAW_EVENTS:
+            self.full_redraw = True
+            return None
+        
+        # Перетаскиваемый слайдер получает движение мыши, где бы она ни была
+        if self.dragging is not None:
+            if event.type == pygame.MOUSEMOTION:
+                self.dragging.update(event.pos, True)
+            elif event.type == pygame.MOUSEBUTTONUP and event.button == 1:
+                self.dragging.stop_dragging()
+                self.dragging = None
+        
+        action = None
+        for widget in self.widgets:
+            result = widget.handle_event(event, self)
+            if result is not None and action is None:
+                action = result
+        return action
+    
+    def render(self, surface):
+        """Отрисовка изменившихся элементов; True, если экран обновлен"""
+        if self.full_redraw:
+            surface.blit(self.background, (0, 0))
+            for i, widget in enumerate(self.widgets):
+                widget.draw(surface)
+                self.drawn[i] = (widget.state(), widget.bounds())
+            self.full_redraw = False
+            present()
+            return True
+        
+        dirty_rects = []
+        for i, widget in enumerate(self.widgets):
+            state = widget.state()
+            if self.drawn[i] is not None and self.drawn[i][0] == state:
+                continue
+            bounds = widget.bounds()
+            old_bounds = self.drawn[i][1] if self.drawn[i] is not None else bounds
+            dirty_rects.append(old_bounds.union(bounds))
+            self.drawn[i] = (state, bounds)
+        
+        # Под изменившимся элементом восстанавливаем фон и заново рисуем
+        # все элементы, которые задевают эту область
+        for area in dirty_rects:
+            surface.blit(self.background, area, area)
+            surface.set_clip(area)
+            for widget in self.widgets:
+                if widget.bounds().colliderect(area):
+                    widget.draw(surface)
+            surface.set_clip(None)
+        
+        if dirty_rects:
+            present(dirty_rects)
+        return bool(dirty_rects)
+
+def build_menu_background(title, title_size=50, title_y=20, color=MENU_BG):
+    """Неподвижный слой экрана меню: заливка и заголовок"""
+    background = pygame.Surface((WIDTH, HEIGHT))
+    background.fill(color)
+    title_text = render_text(title, title_size, GOLD)
+    background.blit(title_text, (WIDTH//2 - title_text.get_width()//2, title_y))
+    return background
+
+def open_main_menu():
+    """Экран главного меню; запуск музыки и фоновой подгрузки"""
+    ui = UIContainer([
+        # Статистика (рисуется под кнопками)
+        Label((WIDTH//2, HEIGHT - 150), f"{ACTIVE_PROFILE_NAME} - собрано пазлов: {TOTAL_PUZZLES_COLLECTED}", 20, WHITE),
         Button(WIDTH//2 - 100, HEIGHT//2 - 80, 200, 50, "Играть", "play"),
         Button(WIDTH//2 - 100, HEIGHT//2 - 20, 200, 50, "Настройки", "settings"),
         Button(WIDTH//2 - 100, HEIGHT//2 + 40, 200, 50, "Галерея", "gallery"),
         Button(WIDTH//2 - 100, HEIGHT//2 + 100, 200, 50, "Выйти", "quit")
-    ]
+    ])
+    
+    # Заголовок игры
+    background = build_menu_background("ЗМЕЙКА", 60, 50)
+    subtitle_text = render_text("Собери мир!", 30, YELLOW)
+    background.blit(subtitle_text, (WIDTH//2 - subtitle_text.get_width()//2, 120))
+    ui.set_background(background)
     
     # Загружаем и устанавливаем фоновую музыку
-    if os.path.exists("background_music.mp3"):
-        try:
-            pygame.mixer.music.load("background_music.mp3")
-            pygame.mixer.music.play(-1)
-            pygame.mixer.music.set_volume(MUSIC_VOLUME)
-        except:
-            print("Не удалось загрузить фоновую музыку")
+    start_menu_music()
+    
+    # Пока игрок в меню, подгружаем ресурсы уровней в фоне
+    prefetch_level_assets()
+    return ui
+
+def show_main_menu():
+    """Показ главного меню"""
+    ui = open_main_menu()
     
     while True:
-        mouse_pos = pygame.mouse.get_pos()
+        ui.render(screen)
         
         # Обработка событий
-        for event in pygame.event.get():
+        for event in wait_menu_events():
             if event.type == pygame.QUIT:
                 return "quit"
-                
-            if event.type == pygame.MOUSEBUTTONDOWN:
-                if event.button == 1:  # Левая кнопка мыши
-                    for button in buttons:
-                        if button.check_click(mouse_pos):
-                            if button.action == "quit":
-                                return "quit"
-                            else:
-                                return button.action
-                                
-            if event.type == pygame.MOUSEBUTTONUP:
-                if event.button == 1:
-                    for button in buttons:
-                        button.reset_click()
-        
-        # Отрисовка
-        screen.fill(MENU_BG)
-        
-        # Заголовок игры
-        title_font = pygame.font.SysFont('arial', 60)
-        title_text = title_font.render("ЗМЕЙКА", True, GOLD)
-        subtitle_font = pygame.font.SysFont('arial', 30)
-        subtitle_text = subtitle_font.render("Собери мир!", True, YELLOW)
-        
-        screen.blit(title_text, (WIDTH//2 - title_text.get_width()//2, 50))
-        screen.blit(subtitle_text, (WIDTH//2 - subtitle_text.get_width()//2, 120))
-        
-        # Статистика
-        stats_font = pygame.font.SysFont('arial', 20)
-        stats_text = stats_font.render(f"Собрано пазлов: {TOTAL_PUZZLES_COLLECTED}", True, WHITE)
-        screen.blit(stats_text, (WIDTH//2 - stats_text.get_width()//2, HEIGHT - 150))
-        
-        # Кнопки
-        for button in buttons:
-            button.check_hover(mouse_pos)
-            button.draw(screen)
-        
-        pygame.display.update()
+            action = ui.handle_event(event)
+            if action is not None:
+                return action
 
 def show_settings(): 
     """Показ меню настроек"""
@@ -347,105 +763,76 @@ def show_settings():
     music_slider = Slider(WIDTH//2 - 150, 160, 300, 20, 0, 100, int(MUSIC_VOLUME * 100), "Громкость музыки")
     sound_slider = Slider(WIDTH//2 - 150, 220, 300, 20, 0, 100, int(SOUND_VOLUME * 100), "Громкость звуков")
     
-    # Кнопки
-    buttons = [
+    # Текущий цвет змейки
+    color_name = Label((WIDTH//2 - 50, 290), "", 18, SNAKE_COLOR, center=False)
+    color_swatch = Swatch((WIDTH//2 + 120, 280, 40, 40), SNAKE_COLOR)
+    
+    def show_current_color():
+        color_name.text = next((c["name"] for c in SNAKE_COLORS if c["color"] == SNAKE_COLOR), "Зеленый")
+        color_name.color = SNAKE_COLOR
+        color_swatch.color = SNAKE_COLOR
+    
+    def show_current_settings():
+        speed_slider.current_val = SNAKE_SPEED
+        music_slider.current_val = int(MUSIC_VOLUME * 100)
+        sound_slider.current_val = int(SOUND_VOLUME * 100)
+        show_current_color()
+    
+    show_current_settings()
+    
+    ui = UIContainer([
+        speed_slider, music_slider, sound_slider, color_name, color_swatch,
         Button(WIDTH//2 - 100, 280, 200, 40, "Сменить цвет змейки", "change_color"),
         Button(WIDTH//2 - 100, 330, 200, 40, "Сбросить прогресс", "reset_progress"),
+        Button(10, HEIGHT - 60, 180, 40, "Сменить профиль", "profiles"),
         Button(WIDTH//2 - 100, HEIGHT - 60, 200, 40, "Назад", "back")
-    ]
+    ])
     
-    # Текущий цвет змейки
-    current_color_rect = pygame.Rect(WIDTH//2 + 120, 280, 40, 40)
-    
-    dragging_slider = None
+    background = build_menu_background("НАСТРОЙКИ")
+    color_text = render_text("Цвет змейки:", 18, WHITE)
+    background.blit(color_text, (WIDTH//2 - 150, 290))
+    ui.set_background(background)
     
     while True:
-        mouse_pos = pygame.mouse.get_pos()
+        ui.render(screen)
         
         # Обработка событий
-        for event in pygame.event.get():
+        for event in wait_menu_events():
             if event.type == pygame.QUIT:
                 return "quit"
-                
-            if event.type == pygame.MOUSEBUTTONDOWN:
-                if event.button == 1:
-                    # Проверяем слайдеры
-                    for slider in [speed_slider, music_slider, sound_slider]:
-                        if slider.update(mouse_pos, True):
-                            dragging_slider = slider
-                    
-                    # Проверяем кнопки
-                    for button in buttons:
-                        if button.check_click(mouse_pos):
-                            if button.action == "back":
-                                # Сохраняем настройки перед выходом
-                                SNAKE_SPEED, MUSIC_VOLUME, SOUND_VOLUME
-                                SNAKE_SPEED = speed_slider.current_val
-                                MUSIC_VOLUME = music_slider.current_val / 100
-                                SOUND_VOLUME = sound_slider.current_val / 100
-                                pygame.mixer.music.set_volume(MUSIC_VOLUME)
-                                save_progress()
-                                return "menu"
-                            elif button.action == "change_color":
-                                # Смена цвета змейки
-                                global SNAKE_COLOR
-                                current_index = next((i for i, c in enumerate(SNAKE_COLORS) if c["color"] == SNAKE_COLOR), 0)
-                                next_index = (current_index + 1) % len(SNAKE_COLORS)
-                                SNAKE_COLOR = SNAKE_COLORS[next_index]["color"]
-                                save_progress()
-                            elif button.action == "reset_progress":
-                                # Подтверждение сброса прогресса
-                                if show_confirmation_dialog("Вы уверены, что хотите сбросить весь прогресс?"):
-                                    reset_progress()
-                                    # Обновляем значения слайдеров
-                                    speed_slider.current_val = SNAKE_SPEED
-                                    music_slider.current_val = int(MUSIC_VOLUME * 100)
-                                    sound_slider.current_val = int(SOUND_VOLUME * 100)
-                
-            if event.type == pygame.MOUSEBUTTONUP:
-                if event.button == 1:
-                    if dragging_slider:
-                        dragging_slider.stop_dragging()
-                        dragging_slider = None
-                    
-                    for button in buttons:
-                        button.reset_click()
-                        
-            if event.type == pygame.MOUSEMOTION:
-                if dragging_slider:
-                    dragging_slider.update(mouse_pos, True)
-        
-        # Отрисовка
-        screen.fill(MENU_BG)
-        
-        # Заголовок
-        title_font = pygame.font.SysFont('arial', 50)
-        title_text = title_font.render("НАСТРОЙКИ", True, GOLD)
-        screen.blit(title_text, (WIDTH//2 - title_text.get_width()//2, 20))
-        
-        # Слайдеры
-        speed_slider.draw(screen)
-        music_slider.draw(screen)
-        sound_slider.draw(screen)
-        
-        # Текущий цвет змейки
-        color_font = pygame.font.SysFont('arial', 18)
-        color_text = color_font.render("Цвет змейки:", True, WHITE)
-        screen.blit(color_text, (WIDTH//2 - 150, 290))
-        
-        current_color_name = next((c["name"] for c in SNAKE_COLORS if c["color"] == SNAKE_COLOR), "Зеленый")
-        color_name_text = color_font.render(current_color_name, True, SNAKE_COLOR)
-        screen.blit(color_name_text, (WIDTH//2 - 50, 290))
-        
-        pygame.draw.rect(screen, SNAKE_COLOR, current_color_rect)
-        pygame.draw.rect(screen, WHITE, current_color_rect, 2)
-        
-        # Кнопки
-        for button in buttons:
-            button.check_hover(mouse_pos)
-            button.draw(screen)
-        
-        pygame.display.update()
+            
+            action = ui.handle_event(event)
+            if action == "back":
+                # Сохраняем настройки перед выходом
+                SNAKE_SPEED = speed_slider.current_val
+                MUSIC_VOLUME = music_slider.current_val / 100
+                SOUND_VOLUME = sound_slider.current_val / 100
+                set_music_volume(MUSIC_VOLUME)
+                record_progress_event("setting_changed", name="snake_speed", value=SNAKE_SPEED)
+                record_progress_event("setting_changed", name="music_volume", value=MUSIC_VOLUME)
+                record_progress_event("setting_changed", name="sound_volume", value=SOUND_VOLUME)
+                return "menu"
+            elif action == "change_color":
+                # Смена цвета змейки
+                current_index = next((i for i, c in enumerate(SNAKE_COLORS) if c["color"] == SNAKE_COLOR), 0)
+                next_index = (current_index + 1) % len(SNAKE_COLORS)
+                SNAKE_COLOR = SNAKE_COLORS[next_index]["color"]
+                record_progress_event("setting_changed", name="snake_color_index", value=next_index)
+                show_current_color()
+            elif action == "profiles":
+                result = show_profile_selection()
+                if result == "quit":
+                    return "quit"
+                # Настройки другого профиля
+                show_current_settings()
+                ui.invalidate()
+            elif action == "reset_progress":
+                # Подтверждение сброса прогресса
+                if show_confirmation_dialog("Вы уверены, что хотите сбросить весь прогресс?"):
+                    reset_progress()
+                    # Обновляем значения слайдеров
+                    show_current_settings()
+                ui.invalidate()
 
 def show_confirmation_dialog(message):
     """Показ диалога подтверждения"""
@@ -454,208 +841,330 @@ def show_confirmation_dialog(message):
     dialog_x = WIDTH//2 - dialog_width//2
     dialog_y = HEIGHT//2 - dialog_height//2
     
-    buttons = [
+    ui = UIContainer([
         Button(dialog_x + 50, dialog_y + 90, 120, 40, "Да", True),
         Button(dialog_x + 230, dialog_y + 90, 120, 40, "Нет", False)
-    ]
+    ])
+    
+    # Диалог рисуется поверх текущего экрана
+    background = screen.copy()
+    overlay = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
+    overlay.fill((0, 0, 0, 180))
+    background.blit(overlay, (0, 0))
+    
+    dialog_bg = pygame.Rect(dialog_x, dialog_y, dialog_width, dialog_height)
+    pygame.draw.rect(background, MENU_BG, dialog_bg, border_radius=10)
+    pygame.draw.rect(background, WHITE, dialog_bg, 2, border_radius=10)
+    
+    # Текст сообщения
+    lines = message.split('\n')
+    y_offset = dialog_y + 30
+    for line in lines:
+        text = render_text(line, 22, WHITE)
+        background.blit(text, (WIDTH//2 - text.get_width()//2, y_offset))
+        y_offset += 30
+    ui.set_background(background)
     
     while True:
-        mouse_pos = pygame.mouse.get_pos()
+        ui.render(screen)
         
-        for event in pygame.event.get():
+        for event in wait_menu_events():
             if event.type == pygame.QUIT:
                 return False
-                
-            if event.type == pygame.MOUSEBUTTONDOWN:
-                if event.button == 1:
-                    for button in buttons:
-                        if button.check_click(mouse_pos):
-                            return button.action
-                            
-            if event.type == pygame.MOUSEBUTTONUP:
-                if event.button == 1:
-                    for button in buttons:
-                        button.reset_click()
-        
-        # Отрисовка диалога
-        overlay = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
-        overlay.fill((0, 0, 0, 180))
-        screen.blit(overlay, (0, 0))
-        
-        dialog_bg = pygame.Rect(dialog_x, dialog_y, dialog_width, dialog_height)
-        pygame.draw.rect(screen, MENU_BG, dialog_bg, border_radius=10)
-        pygame.draw.rect(screen, WHITE, dialog_bg, 2, border_radius=10)
-        
-        # Текст сообщения
-        font = pygame.font.SysFont('arial', 22)
-        lines = message.split('\n')
-        y_offset = dialog_y + 30
-        for line in lines:
-            text = font.render(line, True, WHITE)
-            screen.blit(text, (WIDTH//2 - text.get_width()//2, y_offset))
-            y_offset += 30
-        
-        # Кнопки
-        for button in buttons:
-            button.check_hover(mouse_pos)
-            button.draw(screen)
+            action = ui.handle_event(event)
+            if action is not None:
+                return action
+
+# Профилей на одной странице экрана выбора и длина строки поиска
+PROFILES_PER_PAGE = 4
+PROFILE_SEARCH_MAX = 20
+
+def build_profile_page(query, page):
+    """Экран выбора профиля для строки поиска и страницы.
+
+    Пустой запрос - профили по времени последней игры, иначе - по
+    алфавиту те, чье имя начинается с query. База отдает только одну
+    страницу, поэтому экран не зависит от числа профилей.
+    Возвращает (ui, профили страницы, число страниц).
+    """
+    store = get_progress_store()
+    offset = page * PROFILES_PER_PAGE
+    if query:
+        profiles = store.find_profiles(query, PROFILES_PER_PAGE, offset)
+    else:
+        profiles = store.recent_profiles(PROFILES_PER_PAGE, offset)
+    pages = max(1, (store.profile_count(query) + PROFILES_PER_PAGE - 1) // PROFILES_PER_PAGE)
+    
+    ui = UIContainer()
+    background = build_menu_background("ПРОФИЛИ")
+    search_text = render_text(f"Поиск: {query}_" if query else "Поиск: введите начало имени", 20, WHITE)
+    background.blit(search_text, (WIDTH//2 - 150, 75))
+    for i, (profile_id, name) in enumerate(profiles):
+        button = ui.add(Button(WIDTH//2 - 150, 105 + i * 40, 300, 35, name, ("profile", name)))
+        if name == ACTIVE_PROFILE_NAME:
+            pygame.draw.rect(background, GOLD, button.rect.inflate(6, 6), 2, border_radius=10)
+    if not profiles:
+        empty_text = render_text("Профили не найдены", 20, GRAY)
+        background.blit(empty_text, (WIDTH//2 - empty_text.get_width()//2, 115))
+    
+    # Листание страниц
+    page_text = render_text(f"Страница {page + 1}/{pages}", 18, WHITE)
+    background.blit(page_text, (WIDTH//2 - page_text.get_width()//2, 275))
+    ui.add(Button(WIDTH//2 - 150, 265, 50, 35, "<", "prev_page"))
+    ui.add(Button(WIDTH//2 + 100, 265, 50, 35, ">", "next_page"))
+    
+    ui.add(Button(WIDTH//2 - 210, HEIGHT - 60, 200, 40, "Новый профиль", "new_profile"))
+    ui.add(Button(WIDTH//2 + 10, HEIGHT - 60, 200, 40, "Назад", "back"))
+    ui.set_background(background)
+    return ui, profiles, pages
+
+def show_profile_selection():
+    """Выбор профиля игрока: последние игравшие, поиск по имени и новый профиль"""
+    query = ""
+    page = 0
+    ui, profiles, pages = build_profile_page(query, page)
+    
+    while True:
+        ui.render(screen)
         
-        pygame.display.update()
+        for event in wait_menu_events():
+            if event.type == pygame.QUIT:
+                return "quit"
+            
+            # Набор строки поиска; Enter выбирает первый найденный профиль
+            if event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_ESCAPE:
+                    return "menu"
+                elif event.key == pygame.K_RETURN:
+                    if profiles:
+                        switch_profile(profiles[0][1])
+                        return "menu"
+                    continue
+                elif event.key == pygame.K_BACKSPACE and query:
+                    query = query[:-1]
+                elif event.unicode and event.unicode.isprintable() and len(query) < PROFILE_SEARCH_MAX:
+                    query += event.unicode
+                else:
+                    continue
+                page = 0
+                ui, profiles, pages = build_profile_page(query, page)
+                continue
+            
+            action = ui.handle_event(event)
+            if action == "back":
+                return "menu"
+            elif action == "new_profile":
+                switch_profile(new_profile_name())
+                return "menu"
+            elif action == "prev_page" and page > 0:
+                page -= 1
+                ui, profiles, pages = build_profile_page(query, page)
+            elif action == "next_page" and page + 1 < pages:
+                page += 1
+                ui, profiles, pages = build_profile_page(query, page)
+            elif isinstance(action, tuple):
+                switch_profile(action[1])
+                return "menu"
+
+def create_gallery_tile(level, size, locked):
+    """Превью уровня без картинки: цветной прямоугольник с названием"""
+    preview = pygame.Surface(size)
+    preview.fill(level["color"])
+    
+    # Добавляем текст с названием уровня
+    text = render_text(level["name"], 16, WHITE)
+    text_rect = text.get_rect(center=(size[0]//2, size[1]//2))
+    preview.blit(text, text_rect)
+    return make_locked_preview(preview) if locked else preview
+
+def build_gallery_page(current_page, items_per_page):
+    """Неподвижный слой галереи: заголовок, превью уровней и номер страницы"""
+    background = build_menu_background("ГАЛЕРЕЯ")
+    
+    # Статистика
+    unlocked_count = sum(1 for level in LEVELS if level["completed"])
+    stats_text = render_text(f"Открыто: {unlocked_count}/{len(LEVELS)}", 20, WHITE)
+    background.blit(stats_text, (WIDTH//2 - stats_text.get_width()//2, 80))
+    
+    # Отображение изображений
+    start_idx = current_page * items_per_page
+    end_idx = min(start_idx + items_per_page, len(LEVELS))
+    
+    for i, level_index in enumerate(range(start_idx, end_idx)):
+        level = LEVELS[level_index]
+        
+        # Вычисляем позицию для изображения (2x3 сетка)
+        row = i // 3
+        col = i % 3
+        
+        img_width = 150
+        img_height = 100
+        margin_x = 50
+        margin_y = 120
+        spacing_x = (WIDTH - 2 * margin_x - 3 * img_width) // 2
+        spacing_y = 20
+        
+        x = margin_x + col * (img_width + spacing_x)
+        y = margin_y + row * (img_height + spacing_y)
+        
+        # Превью из кэша (закрытый вариант - затемненный, с замком)
+        locked = not level["completed"]
+        preview = THUMBNAILS.get(level["preview_file"], (img_width, img_height), locked)
+        
+        # Если превью не загружено, создаем цветной прямоугольник
+        if preview is None:
+            preview = ASSETS.generate(("gallery_tile", level_index, img_width, img_height, locked),
+                                      lambda: create_gallery_tile(level, (img_width, img_height), locked))
+        
+        # Отображаем изображение
+        background.blit(preview, (x, y))
+        
+        # Добавляем рамку
+        border_color = GOLD if level["completed"] else GRAY
+        pygame.draw.rect(background, border_color, (x-2, y-2, img_width+4, img_height+4), 2)
+        
+        # Добавляем номер уровня
+        level_text = render_text(f"Уровень {level_index + 1}", 14, WHITE)
+        background.blit(level_text, (x + 5, y + 5))
+    
+    # Индикатор страницы
+    page_text = render_text(f"Страница {current_page + 1}/{((len(LEVELS) - 1) // items_per_page) + 1}", 18, WHITE)
+    background.blit(page_text, (WIDTH//2 - page_text.get_width()//2, HEIGHT - 100))
+    return background
 
 def show_gallery():
     """Показ галереи собранных изображений"""
     current_page = 0
     items_per_page = 6
     
-    # Кнопки
-    buttons = [
+    # Кнопки навигации и возврата в меню
+    ui = UIContainer([
         Button(50, HEIGHT - 60, 120, 40, "Назад", "back"),
-        Button(WIDTH - 170, HEIGHT - 60, 120, 40, "Далее", "next")
-    ]
+        Button(WIDTH - 170, HEIGHT - 60, 120, 40, "Далее", "next"),
+        Button(WIDTH//2 - 100, HEIGHT - 150, 200, 40, "В главное меню", "menu")
+    ])
+    ui.set_background(build_gallery_page(current_page, items_per_page))
     
     while True:
-        mouse_pos = pygame.mouse.get_pos()
+        ui.render(screen)
         
         # Обработка событий
-        for event in pygame.event.get():
+        for event in wait_menu_events():
             if event.type == pygame.QUIT:
                 return "quit"
-                
-            if event.type == pygame.MOUSEBUTTONDOWN:
-                if event.button == 1:
-                    for button in buttons:
-                        if button.check_click(mouse_pos):
-                            if button.action == "back":
-                                if current_page > 0:
-                                    current_page -= 1
-                            elif button.action == "next":
-                                if (current_page + 1) * items_per_page < len(LEVELS):
-                                    current_page += 1
-                
-            if event.type == pygame.MOUSEBUTTONUP:
-                if event.button == 1:
-                    for button in buttons:
-                        button.reset_click()
-        
-        # Отрисовка
-        screen.fill(MENU_BG)
-        
-        # Заголовок
-        title_font = pygame.font.SysFont('arial', 50)
-        title_text = title_font.render("ГАЛЕРЕЯ", True, GOLD)
-        screen.blit(title_text, (WIDTH//2 - title_text.get_width()//2, 20))
-        
-        # Статистика
-        stats_font = pygame.font.SysFont('arial', 20)
-        unlocked_count = sum(1 for level in LEVELS if level["completed"])
-        stats_text = stats_font.render(f"Открыто: {unlocked_count}/{len(LEVELS)}", True, WHITE)
-        screen.blit(stats_text, (WIDTH//2 - stats_text.get_width()//2, 80))
-        
-        # Отображение изображений
-        start_idx = current_page * items_per_page
-        end_idx = min(start_idx + items_per_page, len(LEVELS))
-        
-        for i, level_index in enumerate(range(start_idx, end_idx)):
-            level = LEVELS[level_index]
-            
-            # Вычисляем позицию для изображения (2x3 сетка)
-            row = i // 3
-            col = i % 3
-            
-            img_width = 150
-            img_height = 100
-            margin_x = 50
-            margin_y = 120
-            spacing_x = (WIDTH - 2 * margin_x - 3 * img_width) // 2
-            spacing_y = 20
             
-            x = margin_x + col * (img_width + spacing_x)
-            y = margin_y + row * (img_height + spacing_y)
-            
-            # Загружаем превью
-            preview = None
-            if os.path.exists(level["preview_file"]):
-                try:
-                    preview = pygame.image.load(level["preview_file"])
-                    preview = pygame.transform.scale(preview, (img_width, img_height))
-                except:
-                    preview = None
-            
-            # Если превью не загружено, создаем цветной прямоугольник
-            if preview is None:
-                preview = pygame.Surface((img_width, img_height))
-                preview.fill(level["color"])
-                
-                # Добавляем текст с названием уровня
-                font = pygame.font.SysFont('arial', 16)
-                text = font.render(level["name"], True, WHITE)
-                text_rect = text.get_rect(center=(img_width//2, img_height//2))
-                preview.blit(text, text_rect)
-            
-            # Если уровень не открыт, затемняем изображение
-            if not level["completed"]:
-                # Создаем затемненную копию
-                darkened = pygame.Surface((img_width, img_height))
-                darkened.fill((0, 0, 0))
-                darkened.set_alpha(180)  # Полупрозрачный черный
-                preview.blit(darkened, (0, 0))
-                
-                # Добавляем значок замка
-                lock_font = pygame.font.SysFont('arial', 40)
-                lock_text = lock_font.render("🔒", True, WHITE)
-                lock_rect = lock_text.get_rect(center=(img_width//2, img_height//2))
-                preview.blit(lock_text, lock_rect)
-            
-            # Отображаем изображение
-            screen.blit(preview, (x, y))
-            
-            # Добавляем рамку
-            border_color = GOLD if level["completed"] else GRAY
-            pygame.draw.rect(screen, border_color, (x-2, y-2, img_width+4, img_height+4), 2)
-            
-            # Добавляем номер уровня
-            level_font = pygame.font.SysFont('arial', 14)
-            level_text = level_font.render(f"Уровень {level_index + 1}", True, WHITE)
-            screen.blit(level_text, (x + 5, y + 5))
-        
-        # Кнопки навигации
-        for button in buttons:
-            button.check_hover(mouse_pos)
-            button.draw(screen)
-        
-        # Индикатор страницы
-        page_font = pygame.font.SysFont('arial', 18)
-        page_text = page_font.render(f"Страница {current_page + 1}/{((len(LEVELS) - 1) // items_per_page) + 1}", True, WHITE)
-        screen.blit(page_text, (WIDTH//2 - page_text.get_width()//2, HEIGHT - 100))
-        
-        # Кнопка возврата в меню
-        back_button = Button(WIDTH//2 - 100, HEIGHT - 150, 200, 40, "В главное меню", "menu")
-        back_button.check_hover(mouse_pos)
-        back_button.draw(screen)
-        
-        # Проверка клика на кнопку возврата
-        if pygame.mouse.get_pressed()[0]:
-            if back_button.rect.collidepoint(mouse_pos):
+            action = ui.handle_event(event)
+            if action == "menu":
                 return "menu"
-        
-        pygame.display.update()
+            elif action == "back" and current_page > 0:
+                current_page -= 1
+                ui.set_background(build_gallery_page(current_page, items_per_page))
+            elif action == "next" and (current_page + 1) * items_per_page < len(LEVELS):
+                current_page += 1
+                ui.set_background(build_gallery_page(current_page, items_per_page))
+
+class LevelCard(Widget):
+    """Карточка уровня на экране выбора; действие - номер уровня"""
+    def __init__(self, level_index):
+        x = WIDTH//2 - 200 + (level_index % 3) * 140
+        y = 150 + (level_index // 3) * 120
+        # Подпись с требованием выступает под карточку
+        super().__init__((x, y, 120, 105), level_index)
+        self.level_index = level_index
+        self.selected = False
+    
+    def state(self):
+        level = LEVELS[self.level_index]
+        return (self.selected, level["unlocked"], level["completed"])
+    
+    def render(self):
+        i = self.level_index
+        level = LEVELS[i]
+        surface = pygame.Surface(self.rect.size, pygame.SRCALPHA)
+        
+        # Фон для уровня
+        level_bg = pygame.Surface((120, 100), pygame.SRCALPHA)
+        
+        if level["unlocked"]:
+            if self.selected:
+                level_bg.fill((*level["color"], 200))
+                border_color = GOLD
+            else:
+                level_bg.fill((*level["color"], 150))
+                border_color = WHITE
+            
+            # Иконка для открытого уровня
+            lock_text = "✓" if level["completed"] else str(i + 1)
+            lock_color = GOLD if level["completed"] else WHITE
+        else:
+            level_bg.fill((50, 50, 50, 200))
+            border_color = GRAY
+            lock_text = "🔒"
+            lock_color = GRAY
+        
+        pygame.draw.rect(level_bg, border_color, level_bg.get_rect(), 3)
+        surface.blit(level_bg, (0, 0))
+        
+        # Название уровня
+        name_text = render_text(level["name"], 18, WHITE if level["unlocked"] else GRAY)
+        surface.blit(name_text, (60 - name_text.get_width()//2, 70))
+        
+        # Номер/значок уровня
+        lock_render = render_text(lock_text, 40, lock_color)
+        surface.blit(lock_render, (60 - lock_render.get_width()//2, 20))
+        
+        # Требования для закрытых уровней
+        if not level["unlocked"]:
+            req_text = render_text(f"Нужно {level['puzzles_needed']} пазлов", 14, YELLOW)
+            surface.blit(req_text, (60 - req_text.get_width()//2, 85))
+        return surface
+    
+    def handle_event(self, event, container):
+        if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+            if self.rect.collidepoint(event.pos) and LEVELS[self.level_index]["unlocked"]:
+                return self.level_index
+        return None
 
 def show_level_selection():
     """Показ экрана выбора уровня"""
     selected_level = 0
     
+    prefetch_level_assets()
+    
+    cards = [LevelCard(i) for i in range(len(LEVELS))]
+    cards[selected_level].selected = True
+    ui = UIContainer(cards + [Button(20, 20, 100, 40, "Назад", "menu")])
+    
+    background = build_menu_background('ВЫБЕРИ УРОВЕНЬ', 60, 30, (20, 20, 40))
+    
+    # Статистика
+    total_puzzles_text = render_text(f'Всего собрано пазлов: {TOTAL_PUZZLES_COLLECTED}', 20, WHITE)
+    background.blit(total_puzzles_text, (WIDTH//2 - total_puzzles_text.get_width()//2, 100))
+    
+    # Инструкции
+    instructions = [
+        "Используйте стрелки для выбора уровня",
+        "ENTER для старта, ESC для выхода в меню"
+    ]
+    
+    for j, instruction in enumerate(instructions):
+        instr_text = render_text(instruction, 16, WHITE)
+        background.blit(instr_text, (WIDTH//2 - instr_text.get_width()//2, HEIGHT - 60 + j * 25))
+    ui.set_background(background)
+    
     while True:
-        mouse_pos = pygame.mouse.get_pos()
+        ui.render(screen)
         
         # Обработка событий
-        for event in pygame.event.get():
+        for event in wait_menu_events():
             if event.type == pygame.QUIT:
                 return "quit"
                 
             if event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_ESCAPE:
                     return "menu"
-                    
+                
+                cards[selected_level].selected = False
                 if event.key == pygame.K_UP and selected_level >= 3:
                     selected_level -= 3
                 elif event.key == pygame.K_DOWN and selected_level + 3 < len(LEVELS):
@@ -667,279 +1176,538 @@ def show_level_selection():
                 elif event.key == pygame.K_RETURN or event.key == pygame.K_SPACE:
                     if LEVELS[selected_level]["unlocked"]:
                         return selected_level
-                        
-            if event.type == pygame.MOUSEBUTTONDOWN:
-                if event.button == 1:
-                    # Проверяем клик по уровню
-                    for i, level in enumerate(LEVELS):
-                        x = WIDTH//2 - 200 + (i % 3) * 140
-                        y = 150 + (i // 3) * 120
-                        
-                        level_rect = pygame.Rect(x, y, 120, 100)
-                        if level_rect.collidepoint(mouse_pos) and level["unlocked"]:
-                            return i
-                    
-                    # Проверяем кнопку возврата
-                    back_button = pygame.Rect(20, 20, 100, 40)
-                    if back_button.collidepoint(mouse_pos):
-                        return "menu"
-        
-        # Отрисовка
-        screen.fill((20, 20, 40))
-        
-        # Заголовок
-        title_font = pygame.font.SysFont('arial', 60)
-        title_text = title_font.render('ВЫБЕРИ УРОВЕНЬ', True, GOLD)
-        screen.blit(title_text, (WIDTH//2 - title_text.get_width()//2, 30))
-        
-        # Статистика
-        stats_font = pygame.font.SysFont('arial', 20)
-        total_puzzles_text = stats_font.render(f'Всего собрано пазлов: {TOTAL_PUZZLES_COLLECTED}', True, WHITE)
-        screen.blit(total_puzzles_text, (WIDTH//2 - total_puzzles_text.get_width()//2, 100))
-        
-        # Отображение уровней
-        for i, level in enumerate(LEVELS):
-            x = WIDTH//2 - 200 + (i % 3) * 140
-            y = 150 + (i // 3) * 120
+                cards[selected_level].selected = True
             
-            # Фон для уровня
-            level_bg = pygame.Surface((120, 100), pygame.SRCALPHA)
-            
-            if level["unlocked"]:
-                if i == selected_level:
-                    level_bg.fill((*level["color"], 200))
-                    border_color = GOLD
-                else:
-                    level_bg.fill((*level["color"], 150))
-                    border_color = WHITE
-                
-                # Иконка для открытого уровня
-                lock_text = "✓" if level["completed"] else str(i + 1)
-                lock_color = GOLD if level["completed"] else WHITE
-            else:
-                level_bg.fill((50, 50, 50, 200))
-                border_color = GRAY
-                lock_text = "🔒"
-                lock_color = GRAY
-            
-            pygame.draw.rect(level_bg, border_color, level_bg.get_rect(), 3)
-            screen.blit(level_bg, (x, y))
-            
-            # Название уровня
-            name_font = pygame.font.SysFont('arial', 18)
-            name_text = name_font.render(level["name"], True, WHITE if level["unlocked"] else GRAY)
-            screen.blit(name_text, (x + 60 - name_text.get_width()//2, y + 70))
-            
-            # Номер/значок уровня
-            lock_font = pygame.font.SysFont('arial', 40)
-            lock_render = lock_font.render(lock_text, True, lock_color)
-            screen.blit(lock_render, (x + 60 - lock_render.get_width()//2, y + 20))
-            
-            # Требования для закрытых уровней
-            if not level["unlocked"]:
-                req_font = pygame.font.SysFont('arial', 14)
-                req_text = req_font.render(f"Нужно {level['puzzles_needed']} пазлов", True, YELLOW)
-                screen.blit(req_text, (x + 60 - req_text.get_width()//2, y + 85))
-        
-        # Кнопка возврата
-        back_button = pygame.Rect(20, 20, 100, 40)
-        pygame.draw.rect(screen, BUTTON_COLOR, back_button, border_radius=5)
-        pygame.draw.rect(screen, WHITE, back_button, 2, border_radius=5)
-        
-        back_font = pygame.font.SysFont('arial', 18)
-        back_text = back_font.render("Назад", True, WHITE)
-        screen.blit(back_text, (back_button.x + 20, back_button.y + 10))
-        
-        # Инструкции
-        instructions_font = pygame.font.SysFont('arial', 16)
-        instructions = [
-            "Используйте стрелки для выбора уровня",
-            "ENTER для старта, ESC для выхода в меню"
-        ]
-        
-        for j, instruction in enumerate(instructions):
-            instr_text = instructions_font.render(instruction, True, WHITE)
-            screen.blit(instr_text, (WIDTH//2 - instr_text.get_width()//2, HEIGHT - 60 + j * 25))
-        
-        pygame.display.update()
+            # Клик по открытому уровню или кнопке возврата
+            action = ui.handle_event(event)
+            if action is not None:
+                return action
+
+class AssetManager:
+    """Общий кэш картинок и звуков.
+
+    Каждый файл читается и декодируется один раз и переводится в формат
+    экрана (convert/convert_alpha). Масштабированные копии хранятся по
+    целевому размеру. Неудачные загрузки тоже запоминаются (как None),
+    чтобы не обращаться к диску каждый кадр.
+    
+    Если рядом лежит пакет текстур (texture_pack.py), непрозрачные
+    картинки и фоны по умолчанию берутся из него без декодирования.
+    """
+    def __init__(self, pack_path=None):
+        self.pack_path = pack_path
+        self.pack = None
+        self.pack_opened = False
+        self.images = {}      # (путь, alpha) -> Surface или None
+        self.scaled = {}      # (путь, размер, alpha) -> Surface или None
+        self.sounds = {}      # путь -> Sound или None
+        self.generated = {}   # ключ -> Surface, созданная в коде
+        
+        # Фоновая подгрузка: задания для потока и готовые результаты
+        self.prefetch_queue = queue.Queue()
+        self.prefetch_results = queue.Queue()
+        self.pending = set()
+        self.prefetch_thread = None
+    
+    def image(self, path, alpha=False):
+        """Картинка из файла или None, если загрузить не удалось"""
+        key = (path, alpha)
+        self.wait_prefetched(key)
+        if key not in self.images:
+            image = None if alpha else self.packed(texture_pack.entry_name(path), path)
+            if image is None:
+                image = self.to_display_format(self.decode_image(path), alpha)
+            self.images[key] = image
+        return self.images[key]
+    
+    def decode_image(self, path):
+        if not os.path.exists(path):
+            print(f"Файл {path} не найден")
+            return None
+        try:
+            return pygame.image.load(path)
+        except pygame.error as e:
+            print(f"Ошибка загрузки {path}: {e}")
+            return None
+    
+    def packed(self, name, source=None):
+        """Картинка из пакета текстур или None (пакета нет, нет записи, файл изменился)"""
+        if not self.pack_opened:
+            self.pack_opened = True
+            if self.pack_path is not None:
+                self.pack = texture_pack.TexturePack.open(self.pack_path)
+        if self.pack is None:
+            return None
+        return self.match_display(self.pack.surface(name, source))
+    
+    def match_display(self, image):
+        """Картинка из пакета в формате экрана (копия - только если форматы разные)"""
+        display = pygame.display.get_surface()
+        if image is not None and display is not None and \
+                display.get_masks()[:3] != image.get_masks()[:3]:
+            # Экран в другом формате - одна копия вместо конвертации при каждом блите
+            image = image.convert()
+        return image
+    
+    def to_display_format(self, image, alpha=False):
+        # convert() возможен только после создания окна
+        if image is None or pygame.display.get_surface() is None:
+            return image
+        return image.convert_alpha() if alpha else image.convert()
+    
+    def scaled_image(self, path, size, alpha=False):
+        """Картинка, масштабированная до size (кэшируется по размеру)"""
+        key = (path, tuple(size), alpha)
+        self.wait_prefetched(key)
+        if key not in self.scaled:
+            scaled = None if alpha else self.packed(texture_pack.entry_name(path, size), path)
+            if scaled is None:
+                image = self.image(path, alpha)
+                scaled = None if image is None else pygame.transform.scale(image, size)
+            self.scaled[key] = scaled
+        return self.scaled[key]
+    
+    def sound(self, path):
+        """Звук из файла или None"""
+        self.wait_prefetched(path)
+        if path not in self.sounds:
+            self.sounds[path] = self.decode_sound(path)
+        return self.sounds[path]
+    
+    def decode_sound(self, path):
+        if not pygame.mixer.get_init():
+            return None
+        if not os.path.exists(path):
+            print(f"Файл {path} не найден")
+            return None
+        try:
+            return pygame.mixer.Sound(path)
+        except pygame.error as e:
+            print(f"Ошибка загрузки звука {path}: {e}")
+            return None
+    
+    def prefetch(self, requests):
+        """Фоновая загрузка файлов, пока игрок в меню.
+        
+        requests - список ("image", путь, размер или None) и ("sound", путь).
+        Поток только декодирует и масштабирует; перевод в формат экрана
+        и запись в кэш делает основной цикл в poll_prefetched.
+        """
+        for request in requests:
+            key = self.prefetch_key(request)
+            if key in self.pending or self.is_cached(key) or self.prefetch_packed(request):
+                continue
+            self.pending.add(key)
+            self.prefetch_queue.put(request)
+        
+        if self.pending and self.prefetch_thread is None:
+            self.prefetch_thread = threading.Thread(target=self.prefetch_worker, daemon=True)
+            self.prefetch_thread.start()
+    
+    def prefetch_key(self, request):
+        if request[0] == "sound":
+            return request[1]
+        _, path, size = request
+        return (path, False) if size is None else (path, tuple(size), False)
+    
+    def prefetch_packed(self, request):
+        """Картинка есть в пакете - сразу в кэш, фоновое декодирование не нужно"""
+        if request[0] != "image":
+            return False
+        _, path, size = request
+        image = self.packed(texture_pack.entry_name(path, size), path)
+        if image is None:
+            return False
+        if size is None:
+            self.images[(path, False)] = image
+        else:
+            self.scaled[(path, tuple(size), False)] = image
+        return True
+    
+    def is_cached(self, key):
+        return key in self.sounds or key in self.images or key in self.scaled
+    
+    def prefetch_worker(self):
+        while True:
+            request = self.prefetch_queue.get()
+            try:
+                image, result = self.prefetch_job(request)
+            except Exception as e:
+                # Результат отправляется всегда, иначе wait_prefetched ждал бы его вечно
+                print(f"Ошибка фоновой загрузки {request[1]}: {e}")
+                image, result = None, None
+            self.prefetch_results.put((request, image, result))
+    
+    def prefetch_job(self, request):
+        """Декодирование в фоновом потоке: (картинка, масштабированная картинка или звук)"""
+        if request[0] == "sound":
+            return None, self.decode_sound(request[1])
+        
+        _, path, size = request
+        image = self.decode_image(path)
+        scaled = None
+        if image is not None and size is not None:
+            scaled = pygame.transform.scale(image, size)
+        return image, scaled
+    
+    def poll_prefetched(self):
+        """Забрать готовые результаты фоновой загрузки без ожидания"""
+        while True:
+            try:
+                result = self.prefetch_results.get_nowait()
+            except queue.Empty:
+                return
+            self.store_prefetched(*result)
+    
+    def wait_prefetched(self, key):
+        """Если файл уже грузится в фоне, дождаться его вместо повторной загрузки"""
+        self.poll_prefetched()
+        while key in self.pending:
+            self.store_prefetched(*self.prefetch_results.get())
+    
+    def store_prefetched(self, request, image, result):
+        key = self.prefetch_key(request)
+        self.pending.discard(key)
+        if request[0] == "sound":
+            self.sounds.setdefault(request[1], result)
+            return
+        
+        path, size = request[1], request[2]
+        if (path, False) not in self.images:
+            self.images[(path, False)] = self.to_display_format(image)
+        if size is not None and key not in self.scaled:
+            self.scaled[key] = self.to_display_format(result)
+    
+    def generate(self, key, factory, pack_name=None):
+        """Поверхность, созданная factory() один раз на ключ (или запись pack_name пакета)"""
+        if key not in self.generated:
+            image = None if pack_name is None else self.packed(pack_name)
+            self.generated[key] = image if image is not None else factory()
+        return self.generated[key]
+
+# Пакет текстур собирается командой python texture_pack.py
+TEXTURE_PACK_FILE = "level_assets.pack"
+
+ASSETS = AssetManager(TEXTURE_PACK_FILE)
+
+# Звуковые эффекты игры
+SOUND_FILES = {
+    "eat": "eat_sound.wav",
+    "game_over": "game_over.wav",
+    "puzzle_open": "puzzle_open.wav",
+    "win": "win_sound.wav",
+    "level_unlock": "level_unlock.wav"
+}
+
+def make_locked_preview(preview):
+    """Затемненная копия превью со значком замка"""
+    preview = preview.copy()
+    darkened = pygame.Surface(preview.get_size())
+    darkened.fill((0, 0, 0))
+    darkened.set_alpha(180)  # Полупрозрачный черный
+    preview.blit(darkened, (0, 0))
+    
+    # Добавляем значок замка
+    lock_text = render_text("🔒", 40, WHITE)
+    lock_rect = lock_text.get_rect(center=preview.get_rect().center)
+    preview.blit(lock_text, lock_rect)
+    return preview
+
+THUMBNAIL_DIR = "thumbnail_cache"
+
+class ThumbnailCache:
+    """Превью уровней для галереи: в памяти и в файлах на диске.
+    
+    Превью (обычное и закрытое) строится из картинки уровня один раз и
+    сохраняется маленьким PNG. В имени файла записаны время изменения и
+    размер исходной картинки: если ее заменят, имя не совпадет и превью
+    построится заново, а устаревшие файлы удаляются. При следующих
+    запусках большие JPEG не декодируются вовсе.
+    """
+    def __init__(self, directory=THUMBNAIL_DIR):
+        self.directory = directory
+        self.thumbnails = {}  # (путь, размер, закрытое) -> Surface или None
+    
+    def get(self, path, size, locked=False):
+        """Превью картинки path размера size или None, если картинки нет"""
+        key = (path, tuple(size), locked)
+        if key not in self.thumbnails:
+            self.thumbnails[key] = self.load_or_build(path, tuple(size), locked)
+        return self.thumbnails[key]
+    
+    def cache_prefix(self, path, size, locked):
+        stem = os.path.splitext(os.path.basename(path))[0]
+        variant = "locked" if locked else "plain"
+        return f"{stem}_{size[0]}x{size[1]}_{variant}_"
+    
+    def load_or_build(self, path, size, locked):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        prefix = self.cache_prefix(path, size, locked)
+        cache_file = os.path.join(self.directory, f"{prefix}{stat.st_mtime_ns}_{stat.st_size}.png")
+        
+        if os.path.exists(cache_file):
+            try:
+                return ASSETS.to_display_format(pygame.image.load(cache_file))
+            except pygame.error:
+                pass  # Поврежденный файл кэша - строим превью заново
+        
+        thumbnail = self.build(path, size, locked)
+        if thumbnail is not None:
+            self.save(thumbnail, cache_file, prefix)
+        return ASSETS.to_display_format(thumbnail)
+    
+    def build(self, path, size, locked):
+        if locked:
+            plain = self.get(path, size)
+            return None if plain is None else make_locked_preview(plain)
+        image = ASSETS.decode_image(path)
+        if image is None:
+            return None
+        return pygame.transform.smoothscale(image.convert(24) if image.get_bitsize() < 24 else image, size)
+    
+    def save(self, thumbnail, cache_file, prefix):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            # Устаревшие превью этой же картинки
+            for name in os.listdir(self.directory):
+                if name.startswith(prefix) and name != os.path.basename(cache_file):
+                    os.remove(os.path.join(self.directory, name))
+            tmp_file = cache_file[:-len(".png")] + ".tmp.png"
+            pygame.image.save(thumbnail, tmp_file)
+            os.replace(tmp_file, cache_file)
+        except (OSError, pygame.error) as e:
+            print(f"Не удалось сохранить превью {cache_file}: {e}")
+
+THUMBNAILS = ThumbnailCache()
+
+def prefetch_level_assets():
+    """Фоновая подгрузка звуков и фонов открытых уровней"""
+    requests = []
+    # Звуковая система запускается здесь, а не при старте уровня: иначе
+    # без музыки меню звуки декодировались бы синхронно в play_game
+    if ensure_mixer():
+        requests.extend(("sound", path) for path in SOUND_FILES.values())
+    requests.append(("image", "puzzle_cover.jpg", None))
+    for level in LEVELS:
+        if level["unlocked"]:
+            requests.append(("image", level["background_file"], (WIDTH, HEIGHT)))
+    ASSETS.prefetch(requests)
 
 def load_sounds():
-    """Загрузка звуковых эффектов"""
+    """Загрузка звуковых эффектов (из общего кэша)"""
     sounds = {}
-    
-    try:
-        # Звук поедания еды
-        if os.path.exists("eat_sound.wav"):
-            sounds["eat"] = pygame.mixer.Sound("eat_sound.wav")
-            sounds["eat"].set_volume(SOUND_VOLUME)
-        else:
-            print("Файл eat_sound.wav не найден")
-            sounds["eat"] = None
-            
-        # Звук game over
-        if os.path.exists("game_over.wav"):
-            sounds["game_over"] = pygame.mixer.Sound("game_over.wav")
-            sounds["game_over"].set_volume(SOUND_VOLUME)
-        else:
-            print("Файл game_over.wav не найден")
-            sounds["game_over"] = None
-            
-        # Звук открытия пазла
-        if os.path.exists("puzzle_open.wav"):
-            sounds["puzzle_open"] = pygame.mixer.Sound("puzzle_open.wav")
-            sounds["puzzle_open"].set_volume(SOUND_VOLUME)
-        else:
-            print("Файл puzzle_open.wav не найден")
-            sounds["puzzle_open"] = None
-            
-        # Звук победы
-        if os.path.exists("win_sound.wav"):
-            sounds["win"] = pygame.mixer.Sound("win_sound.wav")
-            sounds["win"].set_volume(SOUND_VOLUME)
-        else:
-            print("Файл win_sound.wav не найден")
-            sounds["win"] = None
-            
-        # Звук открытия уровня
-        if os.path.exists("level_unlock.wav"):
-            sounds["level_unlock"] = pygame.mixer.Sound("level_unlock.wav")
-            sounds["level_unlock"].set_volume(SOUND_VOLUME)
-        else:
-            print("Файл level_unlock.wav не найден")
-            sounds["level_unlock"] = None
-            
-    except pygame.error as e:
-        print(f"Ошибка загрузки звуков: {e}")
-        sounds = {"eat": None, "game_over": None, "puzzle_open": None, "win": None, "level_unlock": None}
-    
+    if not ensure_mixer():
+        return {name: None for name in SOUND_FILES}
+    for name, path in SOUND_FILES.items():
+        sound = ASSETS.sound(path)
+        if sound is not None:
+            sound.set_volume(SOUND_VOLUME)
+        sounds[name] = sound
     return sounds
 
 def load_background_for_level(level_index):
     """Загрузка фонового изображения для уровня"""
     level = LEVELS[level_index]
     
-    # Если файл не найден, создаем фон по умолчанию для уровня
-    if not os.path.exists(level["background_file"]):
-        print(f"Файл {level['background_file']} не найден, создаем фон по умолчанию")
-        return create_level_background(level_index)
-    
-    try:
-        background = pygame.image.load(level["background_file"])
-        background = pygame.transform.scale(background, (WIDTH, HEIGHT))
+    background = ASSETS.scaled_image(level["background_file"], (WIDTH, HEIGHT))
+    if background is None:
+        # Если файл не найден или не читается, создаем фон по умолчанию для уровня
+        print(f"Для уровня {level_index} используется фон по умолчанию")
+        background = BACKGROUNDS.get(level_index, level["background_seed"], (WIDTH, HEIGHT))
+    return background
+
+# Фоны по умолчанию: цвет сверху и снизу, сила шума и число клеток шума
+# по ширине и высоте (шум растягивается вместе с размером фона)
+BACKGROUND_STYLES = [
+    {"top": (50, 200, 50), "bottom": (50, 100, 50), "noise": 24, "cells": (12, 8)},      # Лес
+    {"top": (200, 200, 200), "bottom": (100, 100, 100), "noise": 14, "cells": (6, 4)},  # Горы
+    {"top": (0, 100, 255), "bottom": (0, 100, 100), "noise": 18, "cells": (5, 16)},     # Океан
+    {"top": (240, 200, 160), "bottom": (200, 160, 120), "noise": 12, "cells": (3, 10)}, # Пустыня
+    {"top": (10, 10, 40), "bottom": (10, 10, 40), "noise": 10, "cells": (4, 3)},        # Космос
+]
+# Версия генератора: входит в имена файлов кэша, старые фоны не подхватятся
+BACKGROUND_VERSION = 1
+BACKGROUND_DIR = "background_cache"
+
+def background_name(level_index, seed):
+    return f"level_background_{level_index}_seed{seed}_v{BACKGROUND_VERSION}"
+
+class BackgroundCache:
+    """Фоны по умолчанию: в памяти, в пакете текстур и в файлах на диске.
+    
+    Фон полностью задается (уровень, seed, размер), поэтому его можно
+    построить один раз и дальше читать готовые пиксели. Файлы кэша -
+    пакеты текстур из одной картинки (texture_pack.py), они
+    отображаются в память без декодирования.
+    """
+    def __init__(self, directory=BACKGROUND_DIR):
+        self.directory = directory
+        self.backgrounds = {}  # (уровень, seed, размер) -> Surface
+    
+    def get(self, level_index, seed, size):
+        key = (level_index, seed, tuple(size))
+        if key not in self.backgrounds:
+            self.backgrounds[key] = self.load_or_build(level_index, seed, tuple(size))
+        return self.backgrounds[key]
+    
+    def load_or_build(self, level_index, seed, size):
+        name = texture_pack.entry_name(background_name(level_index, seed), size)
+        background = ASSETS.packed(name)
+        if background is not None:
+            return background
+        
+        cache_file = os.path.join(self.directory, name.replace("@", "_") + ".pack")
+        pack = texture_pack.TexturePack.open(cache_file)
+        background = None if pack is None else pack.surface(name)
+        if background is not None:
+            return ASSETS.match_display(background)
+        
+        background = create_level_background(level_index, seed, size)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            texture_pack.write_pack(cache_file, [(name, background, None)])
+        except (OSError, pygame.error) as e:
+            print(f"Не удалось сохранить фон {cache_file}: {e}")
         return background
-    except pygame.error as e:
-        print(f"Ошибка загрузки фона для уровня {level_index}: {e}")
-        return create_level_background(level_index)
 
-def create_level_background(level_index):
-    """Создание фона по умолчанию для уровня"""
-    background = pygame.Surface((WIDTH, HEIGHT))
-    level = LEVELS[level_index]
+BACKGROUNDS = BackgroundCache()
+
+def background_base(style, seed, size):
+    """Градиент сверху вниз с плавным шумом (NumPy и surfarray).
+    
+    Шум - интерполяция случайной решетки style["cells"] со сглаживанием
+    smoothstep, посчитанная двумя умножениями матриц. Без NumPy - только
+    градиент: столбец высотой в фон, растянутый по ширине.
+    """
+    width, height = size
+    background = pygame.Surface(size)
+    try:
+        import numpy as np
+    except ImportError:
+        column = pygame.Surface((1, height))
+        for y in range(height):
+            t = y / height
+            column.set_at((0, y), [round(a + (b - a) * t) for a, b in zip(style["top"], style["bottom"])])
+        return pygame.transform.scale(column, size)
+    
+    rng = np.random.default_rng(seed)
+    t = np.arange(height, dtype=np.float32) / height
+    gradient = np.array(style["top"], np.float32) + np.outer(t, np.subtract(style["bottom"], style["top"]))
+    
+    # Интерполяция решетки по x и по y - это умножение на матрицы весов:
+    # в каждой строке два соседних узла с весами 1 - f и f
+    def weights(length, cells):
+        position = np.arange(length) * cells / length
+        index = position.astype(int)
+        fraction = position - index
+        fraction = fraction * fraction * (3 - 2 * fraction)
+        matrix = np.zeros((length, cells + 1), np.float32)
+        matrix[np.arange(length), index] = 1 - fraction
+        matrix[np.arange(length), index + 1] = fraction
+        return matrix
+    
+    cells_x, cells_y = style["cells"]
+    lattice = rng.uniform(-style["noise"], style["noise"], (cells_x + 1, cells_y + 1)).astype(np.float32)
+    noise = weights(width, cells_x) @ lattice @ weights(height, cells_y).T
+    
+    # Каналы считаются отдельными плоскостями (сложение по непрерывной
+    # памяти), surfarray получает их представлением (ширина, высота, RGB)
+    channels = np.empty((3, width, height), np.float32)
+    for channel in range(3):
+        np.add(noise, gradient[:, channel], out=channels[channel])
+    np.clip(channels, 0, 255, out=channels)
+    pygame.surfarray.blit_array(background, channels.astype(np.uint8).transpose(1, 2, 0))
+    return background
+
+def create_level_background(level_index, seed=0, size=(WIDTH, HEIGHT)):
+    """Создание фона по умолчанию для уровня.
+    
+    Один и тот же seed дает один и тот же фон; детали расставляются
+    в долях размера, поэтому фон строится для любого разрешения.
+    """
+    width, height = size
+    scale = height / 400  # Размеры деталей подобраны для высоты 400
+    rng = random.Random(seed)
+    background = background_base(BACKGROUND_STYLES[level_index], seed, size)
+    
+    def px(value):
+        return max(1, round(value * scale))
     
-    # Создаем уникальный фон для каждого уровня
     if level_index == 0:  # Лес
-        # Градиент от светло-зеленого к темно-зеленому
-        for y in range(HEIGHT):
-            green = 200 - int((y / HEIGHT) * 100)
-            color = (50, green, 50)
-            pygame.draw.line(background, color, (0, y), (WIDTH, y))
-        
         # Добавляем деревья
         for _ in range(30):
-            x = random.randint(0, WIDTH)
-            y = random.randint(0, HEIGHT)
-            tree_color = (0, random.randint(100, 150), 0)
-            pygame.draw.rect(background, tree_color, (x, y, 15, 30))
-            pygame.draw.circle(background, tree_color, (x + 7, y - 10), 20)
+            x = rng.randint(0, width)
+            y = rng.randint(0, height)
+            tree_color = (0, rng.randint(100, 150), 0)
+            pygame.draw.rect(background, tree_color, (x, y, px(15), px(30)))
+            pygame.draw.circle(background, tree_color, (x + px(7), y - px(10)), px(20))
             
     elif level_index == 1:  # Горы
-        # Градиент от светло-серого к темно-серому
-        for y in range(HEIGHT):
-            gray = 200 - int((y / HEIGHT) * 100)
-            color = (gray, gray, gray)
-            pygame.draw.line(background, color, (0, y), (WIDTH, y))
-        
         # Добавляем горные пики
         for i in range(5):
-            x = i * (WIDTH // 5)
+            x = i * (width // 5)
             points = [
-                (x, HEIGHT),
-                (x + 50, HEIGHT - 150),
-                (x + 100, HEIGHT)
+                (x, height),
+                (x + width // 12, height - px(150)),
+                (x + width // 6, height)
             ]
-            mountain_color = (random.randint(150, 200), random.randint(150, 200), random.randint(150, 200))
+            mountain_color = (rng.randint(150, 200), rng.randint(150, 200), rng.randint(150, 200))
             pygame.draw.polygon(background, mountain_color, points)
             
     elif level_index == 2:  # Океан
-        # Градиент от светло-голубого к темно-синему
-        for y in range(HEIGHT):
-            blue = 255 - int((y / HEIGHT) * 155)
-            color = (0, 100, blue)
-            pygame.draw.line(background, color, (0, y), (WIDTH, y))
-        
         # Добавляем волны
         for i in range(10):
-            y = HEIGHT - 50 + random.randint(-10, 10)
+            y = height - px(50) + rng.randint(-px(10), px(10))
             pygame.draw.arc(background, (0, 50, 200), 
-                           (i * 60, y, 60, 30), 0, 3.14, 3)
+                           (i * width // 10, y, width // 10, px(30)), 0, 3.14, px(3))
             
     elif level_index == 3:  # Пустыня
-        # Песочный градиент
-        for y in range(HEIGHT):
-            sand = 240 - int((y / HEIGHT) * 40)
-            color = (sand, sand - 40, sand - 80)
-            pygame.draw.line(background, color, (0, y), (WIDTH, y))
-        
         # Добавляем кактусы
         for _ in range(20):
-            x = random.randint(0, WIDTH)
-            y = random.randint(HEIGHT - 100, HEIGHT - 30)
-            cactus_color = (0, random.randint(150, 200), 0)
-            pygame.draw.rect(background, cactus_color, (x, y, 10, 40))
-            pygame.draw.rect(background, cactus_color, (x - 10, y + 10, 10, 20))
-            pygame.draw.rect(background, cactus_color, (x + 10, y + 15, 10, 15))
+            x = rng.randint(0, width)
+            y = rng.randint(height - px(100), height - px(30))
+            cactus_color = (0, rng.randint(150, 200), 0)
+            pygame.draw.rect(background, cactus_color, (x, y, px(10), px(40)))
+            pygame.draw.rect(background, cactus_color, (x - px(10), y + px(10), px(10), px(20)))
+            pygame.draw.rect(background, cactus_color, (x + px(10), y + px(15), px(10), px(15)))
             
     elif level_index == 4:  # Космос
-        # Темный фон с звездами
-        background.fill((10, 10, 40))
-        
         # Звезды
         for _ in range(100):
-            x = random.randint(0, WIDTH)
-            y = random.randint(0, HEIGHT)
-            size = random.randint(1, 3)
-            brightness = random.randint(200, 255)
-            pygame.draw.circle(background, (brightness, brightness, brightness), (x, y), size)
+            x = rng.randint(0, width)
+            y = rng.randint(0, height)
+            radius = px(rng.randint(1, 3))
+            brightness = rng.randint(200, 255)
+            pygame.draw.circle(background, (brightness, brightness, brightness), (x, y), radius)
         
         # Планеты
         for i in range(3):
-            x = random.randint(100, WIDTH - 100)
-            y = random.randint(50, HEIGHT - 50)
-            radius = random.randint(30, 60)
+            x = rng.randint(px(100), width - px(100))
+            y = rng.randint(px(50), height - px(50))
+            radius = px(rng.randint(30, 60))
             planet_color = (
-                random.randint(100, 200),
-                random.randint(100, 200),
-                random.randint(100, 200)
+                rng.randint(100, 200),
+                rng.randint(100, 200),
+                rng.randint(100, 200)
             )
             pygame.draw.circle(background, planet_color, (x, y), radius)
     
-    return background
+    return ASSETS.to_display_format(background)
 
 def load_puzzle_cover():
     """Загрузка картинки для закрытых пазлов"""
-    try:
-        if os.path.exists("puzzle_cover.jpg"):
-            cover = pygame.image.load("puzzle_cover.jpg")
-            return cover
-        elif os.path.exists("puzzle_cover.png"):
-            cover = pygame.image.load("puzzle_cover.png")
-            return cover
-        else:
-            print("Файлы puzzle_cover.jpg или puzzle_cover.png не найдены")
-            return create_default_puzzle_cover()
-    except pygame.error as e:
-        print(f"Ошибка загрузки картинки пазла: {e}")
-        return create_default_puzzle_cover()
+    for path in ("puzzle_cover.jpg", "puzzle_cover.png"):
+        if os.path.exists(path):
+            cover = ASSETS.image(path)
+            if cover is not None:
+                return cover
+    
+    print("Используется картинка пазла по умолчанию")
+    return ASSETS.generate("default_puzzle_cover", create_default_puzzle_cover,
+                           texture_pack.entry_name("default_puzzle_cover"))
 
 def create_default_puzzle_cover():
     """Создание картинки для пазлов по умолчанию"""
@@ -953,8 +1721,7 @@ def create_default_puzzle_cover():
         pygame.draw.line(cover, (70, 70, 100), (0, i), (200, i), 1)
     
     # Рисуем значок вопроса
-    font = pygame.font.SysFont('arial', 80)
-    text = font.render("?", True, (150, 150, 180))
+    text = render_text("?", 80, (150, 150, 180))
     text_rect = text.get_rect(center=(100, 75))
     cover.blit(text, text_rect)
     
@@ -963,11 +1730,11 @@ def create_default_puzzle_cover():
     
     return cover
 
-def get_puzzle_regions():
-    """Определяем регионы для 6 пазлов (2x3)"""
+def get_puzzle_regions(size=(WIDTH, HEIGHT)):
+    """Определяем регионы для 6 пазлов (2x3) на картинке размера size"""
     regions = []
-    puzzle_width = WIDTH // 3
-    puzzle_height = HEIGHT // 2
+    puzzle_width = size[0] // 3
+    puzzle_height = size[1] // 2
     
     for row in range(2):
         for col in range(3):
@@ -977,72 +1744,140 @@ def get_puzzle_regions():
     
     return regions
 
+class PuzzleOverlay:
+    """Фон уровня с закрытыми пазлами, собранный один раз на уровень.
+
+    Регионы перерисовываются только при смене их состояния,
+    поэтому в обычном кадре остается один blit готовой поверхности.
+    """
+    def __init__(self, background, puzzle_cover, size):
+        self.background = background
+        self.puzzle_cover = puzzle_cover
+        self.regions = get_puzzle_regions(size)
+        self.surface = pygame.Surface(size)
+        self.region_states = [None] * len(self.regions)
+        self.label_backgrounds = {}
+
+        # Все регионы одного размера - обложку масштабируем один раз
+        self.scaled_covers = {}
+        for region in self.regions:
+            if region.size not in self.scaled_covers:
+                self.scaled_covers[region.size] = pygame.transform.scale(puzzle_cover, region.size)
+
+        if background is None:
+            self.surface.fill((30, 30, 60))
+        else:
+            self.surface.blit(background, (0, 0))
+
+    def matches(self, background, puzzle_cover, size):
+        return (self.background is background and self.puzzle_cover is puzzle_cover
+                and self.surface.get_size() == size)
+
+    def update(self, revealed_regions, available_puzzles):
+        """Перерисовка только тех регионов, состояние которых изменилось"""
+        for i, region in enumerate(self.regions):
+            state = (i in revealed_regions, i in available_puzzles)
+            if state != self.region_states[i]:
+                self.draw_region(i, region, *state)
+                self.region_states[i] = state
+
+    def draw_region(self, index, region, revealed, available):
+        # Восстанавливаем фон под регионом
+        if self.background is None:
+            self.surface.fill((30, 30, 60), region)
+        else:
+            self.surface.blit(self.background, region, region)
+
+        if not revealed:
+            self.surface.blit(self.scaled_covers[region.size], (region.x, region.y))
+            if available:
+                self.draw_label(index, region, (200, 200, 200), 200)
+        else:
+            pygame.draw.rect(self.surface, WHITE, region, 3)
+            self.draw_label(index, region, WHITE, 150)
+
+    def draw_label(self, index, region, color, alpha):
+        draw_puzzle_label(self.surface, index, region, color, alpha, self.label_backgrounds)
+
+def draw_puzzle_label(surface, index, region, color, alpha, label_backgrounds):
+    """Номер пазла на полупрозрачной подложке в центре региона"""
+    text = render_text(str(index + 1), 20, color)
+    text_rect = text.get_rect(center=region.center)
+
+    bg_size = (text.get_width() + 10, text.get_height() + 5)
+    text_bg = label_backgrounds.get((bg_size, alpha))
+    if text_bg is None:
+        text_bg = pygame.Surface(bg_size, pygame.SRCALPHA)
+        text_bg.fill((0, 0, 0, alpha))
+        label_backgrounds[(bg_size, alpha)] = text_bg
+    surface.blit(text_bg, (text_rect.x - 5, text_rect.y - 2))
+    surface.blit(text, text_rect)
+
+# Слой пазлов текущего уровня
+_puzzle_overlay = None
+
 def draw_puzzle_overlay(surface, revealed_regions, background, puzzle_cover, available_puzzles, game_won=False):
     """Отрисовка пазлов с картинкой для закрытых регионов"""
-    if background is None:
-        surface.fill((30, 30, 60))
-    else:
-        surface.blit(background, (0, 0))
-    
+    global _puzzle_overlay
+
     if game_won:
-        return
-    
-    regions = get_puzzle_regions()
-    
-    for i, region in enumerate(regions):
-        if i not in revealed_regions:
-            scaled_cover = pygame.transform.scale(puzzle_cover, (region.width, region.height))
-            surface.blit(scaled_cover, (region.x, region.y))
-            
-            if i in available_puzzles:
-                font = pygame.font.SysFont('arial', 20)
-                text = font.render(str(i + 1), True, (200, 200, 200))
-                text_rect = text.get_rect(center=region.center)
-                
-                text_bg = pygame.Surface((text.get_width() + 10, text.get_height() + 5), pygame.SRCALPHA)
-                text_bg.fill((0, 0, 0, 200))
-                surface.blit(text_bg, (text_rect.x - 5, text_rect.y - 2))
-                surface.blit(text, text_rect)
+        if background is None:
+            surface.fill((30, 30, 60))
         else:
-            pygame.draw.rect(surface, WHITE, region, 3)
-            
-            font = pygame.font.SysFont('arial', 20)
-            text = font.render(str(i + 1), True, WHITE)
-            text_rect = text.get_rect(center=region.center)
-            
-            text_bg = pygame.Surface((text.get_width() + 10, text.get_height() + 5), pygame.SRCALPHA)
-            text_bg.fill((0, 0, 0, 150))
-            surface.blit(text_bg, (text_rect.x - 5, text_rect.y - 2))
-            surface.blit(text, text_rect)
+            surface.blit(background, (0, 0))
+        return
+
+    size = surface.get_size()
+    if _puzzle_overlay is None or not _puzzle_overlay.matches(background, puzzle_cover, size):
+        _puzzle_overlay = PuzzleOverlay(background, puzzle_cover, size)
+    _puzzle_overlay.update(revealed_regions, available_puzzles)
+    surface.blit(_puzzle_overlay.surface, (0, 0))
+
+# Кэш слоя сетки: ключ (размер экрана, GRID_SIZE) -> готовая поверхность
+_grid_overlay_cache = {}
+
+def build_grid_overlay(size, grid_size):
+    """Построение полупрозрачного слоя сетки для заданного размера экрана"""
+    width, height = size
+    overlay = pygame.Surface((width, height), pygame.SRCALPHA)
+    for y in range(0, height, grid_size):
+        for x in range(0, width, grid_size):
+            overlay.fill((255, 255, 255, 30), (x, y, grid_size, grid_size))
+    return overlay
+
+def get_grid_overlay(size, grid_size):
+    """Получение слоя сетки из кэша (пересобирается при смене размеров)"""
+    key = (tuple(size), grid_size)
+    overlay = _grid_overlay_cache.get(key)
+    if overlay is None:
+        # Старые размеры больше не нужны - держим только актуальный слой
+        _grid_overlay_cache.clear()
+        overlay = build_grid_overlay(size, grid_size)
+        _grid_overlay_cache[key] = overlay
+    return overlay
 
 def draw_grid(surface):
-    """Отрисовка полупрозрачной сетки"""
-    for y in range(0, HEIGHT, GRID_SIZE):
-        for x in range(0, WIDTH, GRID_SIZE):
-            rect = pygame.Rect(x, y, GRID_SIZE, GRID_SIZE)
-            grid_surface = pygame.Surface((GRID_SIZE, GRID_SIZE), pygame.SRCALPHA)
-            grid_surface.fill((255, 255, 255, 30))
-            surface.blit(grid_surface, (x, y))
+    """Отрисовка полупрозрачной сетки одним blit"""
+    surface.blit(get_grid_overlay(surface.get_size(), GRID_SIZE), (0, 0))
 
 def show_score(surface, score, revealed_puzzles_set, current_level, game_won=False):
     """Отображение счета и прогресса"""
-    font = pygame.font.SysFont('arial', 20)
     
     current_level_data = LEVELS[current_level]
     
     if game_won:
-        score_text = font.render(f'ФИНАЛЬНЫЙ СЧЕТ: {score}', True, GOLD)
-        level_text = font.render(f'УРОВЕНЬ: {current_level_data["name"]}', True, GOLD)
-        puzzle_text = font.render('ВСЕ ПАЗЛЫ СОБРАНЫ!', True, GOLD)
+        score_text = render_text(f'ФИНАЛЬНЫЙ СЧЕТ: {score}', 20, GOLD)
+        level_text = render_text(f'УРОВЕНЬ: {current_level_data["name"]}', 20, GOLD)
+        puzzle_text = render_text('ВСЕ ПАЗЛЫ СОБРАНЫ!', 20, GOLD)
     else:
-        score_text = font.render(f'Счет: {score}', True, WHITE)
-        level_text = font.render(f'Уровень: {current_level_data["name"]}', True, WHITE)
+        score_text = render_text(f'Счет: {score}', 20, WHITE)
+        level_text = render_text(f'Уровень: {current_level_data["name"]}', 20, WHITE)
         
         # Получаем количество открытых пазлов из множества
         puzzles_opened_in_level = len(revealed_puzzles_set)
-        puzzles_in_level = 6
+        puzzles_in_level = PUZZLES_PER_LEVEL
         
-        puzzle_text = font.render(f'Пазлов в уровне: {puzzles_opened_in_level}/{puzzles_in_level}', True, WHITE)
+        puzzle_text = render_text(f'Пазлов в уровне: {puzzles_opened_in_level}/{puzzles_in_level}', 20, WHITE)
         
         # Показываем прогресс до следующего уровня
         next_level_index = current_level + 1
@@ -1050,11 +1885,11 @@ def show_score(surface, score, revealed_puzzles_set, current_level, game_won=Fal
             next_level_data = LEVELS[next_level_index]
             puzzles_for_next_level = next_level_data["puzzles_needed"] - TOTAL_PUZZLES_COLLECTED
             if puzzles_for_next_level > 0:
-                next_level_text = font.render(f'До уровня "{next_level_data["name"]}": {puzzles_for_next_level} пазлов', True, YELLOW)
+                next_level_text = render_text(f'До уровня "{next_level_data["name"]}": {puzzles_for_next_level} пазлов', 20, YELLOW)
             else:
-                next_level_text = font.render('Новый уровень доступен!', True, GOLD)
+                next_level_text = render_text('Новый уровень доступен!', 20, GOLD)
         else:
-            next_level_text = font.render('Последний уровень!', True, GOLD)
+            next_level_text = render_text('Последний уровень!', 20, GOLD)
     
     # Фон для текста
     texts_to_display = [score_text, level_text, puzzle_text]
@@ -1073,6 +1908,8 @@ def show_score(surface, score, revealed_puzzles_set, current_level, game_won=Fal
     for text in texts_to_display:
         surface.blit(text, (10, y_offset))
         y_offset += 27
+    
+    return pygame.Rect((5, 5), text_bg.get_size())
 
 def show_level_unlocked(surface, level_index):
     """Показ уведомления об открытии уровня"""
@@ -1083,14 +1920,11 @@ def show_level_unlocked(surface, level_index):
     overlay.fill((0, 0, 0, 180))
     surface.blit(overlay, (0, 0))
     
-    font_large = pygame.font.SysFont('arial', 50)
-    font_medium = pygame.font.SysFont('arial', 30)
-    font_small = pygame.font.SysFont('arial', 24)
     
-    unlocked_text = font_large.render('НОВЫЙ УРОВЕНЬ!', True, GOLD)
-    level_name_text = font_medium.render(f'"{level["name"]}"', True, level["color"])
-    info_text = font_small.render('Доступен для игры', True, WHITE)
-    continue_text = font_small.render('Нажмите любую клавишу для продолжения', True, WHITE)
+    unlocked_text = render_text('НОВЫЙ УРОВЕНЬ!', 50, GOLD)
+    level_name_text = render_text(f'"{level["name"]}"', 30, level["color"])
+    info_text = render_text('Доступен для игры', 24, WHITE)
+    continue_text = render_text('Нажмите любую клавишу для продолжения', 24, WHITE)
     
     # Фон для текста
     text_area = pygame.Surface((WIDTH - 100, 200), pygame.SRCALPHA)
@@ -1103,8 +1937,7 @@ def show_level_unlocked(surface, level_index):
     pygame.draw.rect(level_icon, WHITE, level_icon.get_rect(), 3)
     
     # Номер уровня
-    font_icon = pygame.font.SysFont('arial', 40)
-    icon_text = font_icon.render(str(level_index + 1), True, WHITE)
+    icon_text = render_text(str(level_index + 1), 40, WHITE)
     icon_rect = icon_text.get_rect(center=(40, 40))
     level_icon.blit(icon_text, icon_rect)
     
@@ -1114,18 +1947,16 @@ def show_level_unlocked(surface, level_index):
     surface.blit(info_text, (WIDTH//2 - info_text.get_width()//2, HEIGHT//2 + 50))
     surface.blit(continue_text, (WIDTH//2 - continue_text.get_width()//2, HEIGHT//2 + 90))
     
-    pygame.display.update()
+    present()
     
-    # Ждем нажатия клавиши
-    waiting = True
-    while waiting:
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                return False
-            if event.type == pygame.KEYDOWN:
-                waiting = False
-    return True
+    # Ждем нажатия клавиши (без опроса в цикле)
+    while True:
+        event = to_logical(pygame.event.wait())
+        if event.type == pygame.QUIT:
+            pygame.quit()
+            return False
+        if event.type == pygame.KEYDOWN:
+            return True
 
 def show_level_completed(surface, score, current_level_index, next_level_available):
     """Показ экрана завершения уровня"""
@@ -1136,22 +1967,19 @@ def show_level_completed(surface, score, current_level_index, next_level_availab
     overlay.fill((0, 0, 0, 180))
     surface.blit(overlay, (0, 0))
     
-    font_large = pygame.font.SysFont('arial', 60)
-    font_medium = pygame.font.SysFont('arial', 35)
-    font_small = pygame.font.SysFont('arial', 28)
     
-    completed_text = font_large.render('УРОВЕНЬ ПРОЙДЕН!', True, GOLD)
-    level_text = font_medium.render(f'"{current_level["name"]}"', True, current_level["color"])
-    score_text = font_medium.render(f'Счет на уровне: {score}', True, WHITE)
+    completed_text = render_text('УРОВЕНЬ ПРОЙДЕН!', 60, GOLD)
+    level_text = render_text(f'"{current_level["name"]}"', 35, current_level["color"])
+    score_text = render_text(f'Счет на уровне: {score}', 35, WHITE)
     
     if next_level_available:
-        next_text = font_medium.render('Следующий уровень разблокирован!', True, YELLOW)
-        continue_text = font_small.render('Нажмите ПРОБЕЛ для следующего уровня', True, WHITE)
-        menu_text = font_small.render('Или ESC для выбора уровня', True, WHITE)
+        next_text = render_text('Следующий уровень разблокирован!', 35, YELLOW)
+        continue_text = render_text('Нажмите ПРОБЕЛ для следующего уровня', 28, WHITE)
+        menu_text = render_text('Или ESC для выбора уровня', 28, WHITE)
     else:
-        next_text = font_medium.render('Это последний уровень!', True, YELLOW)
-        continue_text = font_small.render('Нажмите ESC для выбора уровня', True, WHITE)
-        menu_text = font_small.render('', True, WHITE)
+        next_text = render_text('Это последний уровень!', 35, YELLOW)
+        continue_text = render_text('Нажмите ESC для выбора уровня', 28, WHITE)
+        menu_text = render_text('', 28, WHITE)
     
     # Фон для текста
     text_area = pygame.Surface((WIDTH - 100, 250), pygame.SRCALPHA)
@@ -1165,26 +1993,46 @@ def show_level_completed(surface, score, current_level_index, next_level_availab
     surface.blit(continue_text, (WIDTH//2 - continue_text.get_width()//2, HEIGHT//2 + 100))
     surface.blit(menu_text, (WIDTH//2 - menu_text.get_width()//2, HEIGHT//2 + 130))
     
-    pygame.display.update()
+    present()
     
-    # Ждем нажатия клавиши
-    waiting = True
-    while waiting:
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                return None
-            if event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_SPACE and next_level_available:
-                    return "next_level"
-                elif event.key == pygame.K_ESCAPE:
-                    return "menu"
-                elif event.key == pygame.K_r:
-                    return "restart"
-    return None
+    # Ждем нажатия клавиши (без опроса в цикле)
+    while True:
+        event = to_logical(pygame.event.wait())
+        if event.type == pygame.QUIT:
+            pygame.quit()
+            return None
+        if event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_SPACE and next_level_available:
+                return "next_level"
+            elif event.key == pygame.K_ESCAPE:
+                return "menu"
+            elif event.key == pygame.K_r:
+                return "restart"
+
+def show_game_over(surface, score, revealed_puzzles_set, background, puzzle_cover, available_puzzles, level_index, best_score=None):
+    """Показ экрана проигрыша.
 
-def show_game_over(surface, score, revealed_puzzles_set, background, puzzle_cover, available_puzzles, level_index):
-    """Показ экрана проигрыша"""
+    Экран рисуется один раз, затем ждем нажатия клавиши; перерисовка -
+    только когда окно просит об этом. Возвращает "restart", "menu" или
+    None при закрытии окна.
+    """
+    draw_game_over(surface, score, revealed_puzzles_set, background, puzzle_cover,
+                   available_puzzles, level_index, best_score)
+    while True:
+        event = to_logical(pygame.event.wait())
+        if event.type == pygame.QUIT:
+            return None
+        if event.type in REDRAW_EVENTS:
+            draw_game_over(surface, score, revealed_puzzles_set, background, puzzle_cover,
+                           available_puzzles, level_index, best_score)
+        elif event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_r:
+                return "restart"
+            elif event.key == pygame.K_ESCAPE:
+                return "menu"
+
+def draw_game_over(surface, score, revealed_puzzles_set, background, puzzle_cover, available_puzzles, level_index, best_score=None):
+    """Отрисовка экрана проигрыша"""
     puzzles_in_current_level = len(revealed_puzzles_set)
         
     draw_puzzle_overlay(surface, set(range(puzzles_in_current_level)), background, puzzle_cover, available_puzzles)
@@ -1193,18 +2041,18 @@ def show_game_over(surface, score, revealed_puzzles_set, background, puzzle_cove
     overlay.fill((0, 0, 0, 180))
     surface.blit(overlay, (0, 0))
     
-    font_large = pygame.font.SysFont('arial', 50)
-    font_medium = pygame.font.SysFont('arial', 30)
-    font_small = pygame.font.SysFont('arial', 24)
     
     level = LEVELS[level_index]
     
-    game_over_text = font_large.render('ИГРА ОКОНЧЕНА!', True, RED)
-    level_text = font_medium.render(f'Уровень: {level["name"]}', True, level["color"])
-    score_text = font_medium.render(f'Счет: {score}', True, WHITE)
-    puzzle_text = font_medium.render(f'Всего собрано пазлов: {TOTAL_PUZZLES_COLLECTED}', True, WHITE)
-    restart_text = font_small.render('Нажмите R для перезапуска уровня', True, WHITE)
-    menu_text = font_small.render('Нажмите ESC для выбора уровня', True, WHITE)
+    game_over_text = render_text('ИГРА ОКОНЧЕНА!', 50, RED)
+    level_text = render_text(f'Уровень: {level["name"]}', 30, level["color"])
+    if best_score is None:
+        score_text = render_text(f'Счет: {score}', 30, WHITE)
+    else:
+        score_text = render_text(f'Счет: {score}  Рекорд: {best_score}', 30, WHITE)
+    puzzle_text = render_text(f'Всего собрано пазлов: {TOTAL_PUZZLES_COLLECTED}', 30, WHITE)
+    restart_text = render_text('Нажмите R для перезапуска уровня', 24, WHITE)
+    menu_text = render_text('Нажмите ESC для выбора уровня', 24, WHITE)
     
     surface.blit(game_over_text, (WIDTH//2 - game_over_text.get_width()//2, HEIGHT//2 - 100))
     surface.blit(level_text, (WIDTH//2 - level_text.get_width()//2, HEIGHT//2 - 40))
@@ -1213,107 +2061,66 @@ def show_game_over(surface, score, revealed_puzzles_set, background, puzzle_cove
     surface.blit(restart_text, (WIDTH//2 - restart_text.get_width()//2, HEIGHT//2 + 80))
     surface.blit(menu_text, (WIDTH//2 - menu_text.get_width()//2, HEIGHT//2 + 110))
     
-    pygame.display.update()
-
-class Snake:
-    def __init__(self, sound_manager, current_level_index):
-        self.positions = [(GRID_WIDTH // 2, GRID_HEIGHT // 2)]
-        self.direction = (1, 0)
-        self.length = 1
-        self.score = 0
-        self.sound_manager = sound_manager
-        self.revealed_puzzles = set()
-        self.available_puzzles = list(range(6))
-        random.shuffle(self.available_puzzles)
-        self.current_level_index = current_level_index
-        self.game_won = False
-        self.new_level_unlocked = False
-        self.unlocked_level_index = None
-        
-    def get_head_position(self):
-        return self.positions[0]
+    present()
+
+# Цвета еды по ее типу (очки и редкость - в snake_core.FOOD_TYPES)
+FOOD_COLORS = {
+    "normal": RED,
+    "good": ORANGE,
+    "great": YELLOW,
+    "excellent": BLUE,
+    "amazing": PURPLE
+}
+
+# Клавиши поворота змейки
+DIRECTION_KEYS = {
+    pygame.K_UP: snake_core.UP,
+    pygame.K_DOWN: snake_core.DOWN,
+    pygame.K_LEFT: snake_core.LEFT,
+    pygame.K_RIGHT: snake_core.RIGHT
+}
+
+class Snake(snake_core.Snake):
+    """Змейка с отрисовкой (логика - в snake_core.Snake)"""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.previous_tail = self.positions[-1]
     
     def move(self):
-        if self.game_won:
-            return False
-            
-        head_x, head_y = self.get_head_position()
-        dir_x, dir_y = self.direction
-        new_x = (head_x + dir_x) % GRID_WIDTH
-        new_y = (head_y + dir_y) % GRID_HEIGHT
-        
-        if (new_x, new_y) in self.positions[1:]:
-            return True
-            
-        self.positions.insert(0, (new_x, new_y))
-        if len(self.positions) > self.length:
-            self.positions.pop()
-        return False
-    
-    def grow(self, points):
-        self.length += 1
-        self.score += points
-        
-        # Открываем новый пазл каждые 100 очков
-        if not self.game_won and self.score // 100 > len(self.revealed_puzzles):
-            if self.available_puzzles:
-                new_puzzle = self.available_puzzles.pop(0)
-                self.revealed_puzzles.add(new_puzzle)
-                global TOTAL_PUZZLES_COLLECTED
-                TOTAL_PUZZLES_COLLECTED += 1
-                
-                if self.sound_manager["puzzle_open"]:
-                    self.sound_manager["puzzle_open"].play()
-                print(f"Открыт пазл {new_puzzle + 1}! Всего: {TOTAL_PUZZLES_COLLECTED}")
-                
-                # Сохраняем прогресс
-                save_progress()
-                
-                # Проверяем, собраны ли все пазлы уровня
-                if len(self.revealed_puzzles) == 6:
-                    self.game_won = True
-                    if self.sound_manager["win"]:
-                        self.sound_manager["win"].play()
-                    print(f"Уровень пройден! Всего пазлов: {TOTAL_PUZZLES_COLLECTED}")
-                    
-                    # Отмечаем текущий уровень как пройденный
-                    LEVELS[self.current_level_index]["completed"] = True
-                    
-                    # Проверяем и открываем следующий уровень
-                    next_level_index = self.current_level_index + 1
-                    if next_level_index < len(LEVELS):
-                        if TOTAL_PUZZLES_COLLECTED >= LEVELS[next_level_index]["puzzles_needed"]:
-                            if not LEVELS[next_level_index]["unlocked"]:
-                                LEVELS[next_level_index]["unlocked"] = True
-                                self.new_level_unlocked = True
-                                self.unlocked_level_index = next_level_index
-                                if self.sound_manager["level_unlock"]:
-                                    self.sound_manager["level_unlock"].play()
-                                print(f"Открыт новый уровень: {LEVELS[next_level_index]['name']}!")
-                    save_progress()
-                
-                # Проверяем, открылся ли новый уровень по количеству пазлов
-                for i, level in enumerate(LEVELS):
-                    if not level["unlocked"] and TOTAL_PUZZLES_COLLECTED >= level["puzzles_needed"]:
-                        level["unlocked"] = True
-                        self.new_level_unlocked = True
-                        self.unlocked_level_index = i
-                        if self.sound_manager["level_unlock"]:
-                            self.sound_manager["level_unlock"].play()
-                        print(f"Открыт новый уровень: {level['name']}!")
-                        save_progress()
-        
-        if self.sound_manager["eat"]:
-            self.sound_manager["eat"].play()
-    
-    def change_direction(self, new_direction):
-        if (new_direction[0] * -1, new_direction[1] * -1) != self.direction:
-            self.direction = new_direction
-    
-    def draw(self, surface):
-        for i, position in enumerate(self.positions):
-            rect = pygame.Rect(position[0] * GRID_SIZE, position[1] * GRID_SIZE, 
-                             GRID_SIZE, GRID_SIZE)
+        # Каждый сегмент до шага стоял на месте следующего, а последний -
+        # на месте прежнего хвоста: его и запоминаем для плавной отрисовки
+        tail = self.positions[-1]
+        collided = super().move()
+        if not collided:
+            self.previous_tail = tail
+        return collided
+    
+    def segment_position(self, i, alpha):
+        """Координаты сегмента i в пикселях между прошлой и текущей клеткой"""
+        x, y = self.positions[i]
+        if alpha >= 1.0:
+            return x * GRID_SIZE, y * GRID_SIZE
+        prev_x, prev_y = self.positions[i + 1] if i + 1 < len(self.positions) else self.previous_tail
+        # Переход через край поля не сглаживаем
+        if abs(x - prev_x) > 1 or abs(y - prev_y) > 1:
+            return x * GRID_SIZE, y * GRID_SIZE
+        return (round((prev_x + (x - prev_x) * alpha) * GRID_SIZE),
+                round((prev_y + (y - prev_y) * alpha) * GRID_SIZE))
+    
+    def draw(self, surface, alpha=1.0, offset=(0, 0)):
+        """Отрисовка змейки, возвращает список нарисованных клеток.
+        
+        alpha - доля пройденного пути от прошлого тика до следующего
+        (0 - сегменты на прежних клетках, 1 - на текущих). offset -
+        левый верхний угол камеры на поле; сегменты вне кадра пропускаются.
+        """
+        rects = []
+        view = surface.get_clip()
+        for i in range(len(self.positions)):
+            x, y = self.segment_position(i, alpha)
+            rect = pygame.Rect(x - offset[0], y - offset[1], GRID_SIZE, GRID_SIZE)
+            if not view.colliderect(rect):
+                continue
             if i == 0:
                 pygame.draw.rect(surface, SNAKE_COLOR, rect)  # Используем выбранный цвет
             else:
@@ -1322,64 +2129,293 @@ class Snake:
                 color = darker_color if i % 2 == 0 else tuple(max(0, c - 20) for c in SNAKE_COLOR)
                 pygame.draw.rect(surface, color, rect)
             pygame.draw.rect(surface, BLACK, rect, 1)
+            rects.append(rect)
+        return rects
 
-class Food:
-    def __init__(self):
-        self.position = (0, 0)
-        self.points = 10
-        self.color = RED
-        self.type = "normal"
-        self.randomize_position()
-        self.randomize_type()
-    
-    def randomize_position(self):
-        self.position = (random.randint(0, GRID_WIDTH - 1), 
-                        random.randint(0, GRID_HEIGHT - 1))
-    
-    def randomize_type(self):
-        food_types = [
-            {"points": 10, "color": RED, "name": "normal", "rarity": 50},
-            {"points": 20, "color": ORANGE, "name": "good", "rarity": 30},
-            {"points": 30, "color": YELLOW, "name": "great", "rarity": 15},
-            {"points": 40, "color": BLUE, "name": "excellent", "rarity": 4},
-            {"points": 50, "color": PURPLE, "name": "amazing", "rarity": 1}
-        ]
-        
-        total_rarity = sum(food["rarity"] for food in food_types)
-        roll = random.randint(1, total_rarity)
-        
-        current_rarity = 0
-        for food_type in food_types:
-            current_rarity += food_type["rarity"]
-            if roll <= current_rarity:
-                self.points = food_type["points"]
-                self.color = food_type["color"]
-                self.type = food_type["name"]
-                break
-    
-    def draw(self, surface):
-        rect = pygame.Rect(self.position[0] * GRID_SIZE, self.position[1] * GRID_SIZE,
-                         GRID_SIZE, GRID_SIZE)
-        
-        pygame.draw.rect(surface, self.color, rect)
-        
-        if self.points == 20:
+# Спрайты еды и препятствий: (вид, тип еды, очки) -> Surface клетки
+ENTITY_SPRITES = {}
+
+def build_entity_sprite(kind, food_type, points):
+    sprite = pygame.Surface((GRID_SIZE, GRID_SIZE))
+    rect = sprite.get_rect()
+    if kind == "obstacle":
+        sprite.fill((90, 90, 90))
+        pygame.draw.rect(sprite, (60, 60, 60), rect.inflate(-8, -8))
+    elif kind == "moving_obstacle":
+        sprite.fill((150, 50, 50))
+        pygame.draw.circle(sprite, ORANGE, rect.center, GRID_SIZE // 4)
+    else:
+        sprite.fill(FOOD_COLORS[food_type])
+        if points == 20:
             inner_rect = pygame.Rect(rect.x + 5, rect.y + 5, GRID_SIZE - 10, GRID_SIZE - 10)
-            pygame.draw.rect(surface, YELLOW, inner_rect)
-        elif self.points == 30:
-            pygame.draw.circle(surface, ORANGE, rect.center, GRID_SIZE // 3)
-        elif self.points == 40:
+            pygame.draw.rect(sprite, YELLOW, inner_rect)
+        elif points == 30:
+            pygame.draw.circle(sprite, ORANGE, rect.center, GRID_SIZE // 3)
+        elif points == 40:
             points = [
                 (rect.centerx, rect.y + 3),
                 (rect.x + GRID_SIZE - 3, rect.centery),
                 (rect.centerx, rect.y + GRID_SIZE - 3),
                 (rect.x + 3, rect.centery)
             ]
-            pygame.draw.polygon(surface, WHITE, points)
-        elif self.points == 50:
-            pygame.draw.circle(surface, WHITE, rect.center, GRID_SIZE // 4)
-        
-        pygame.draw.rect(surface, BLACK, rect, 1)
+            pygame.draw.polygon(sprite, WHITE, points)
+        elif points == 50:
+            pygame.draw.circle(sprite, WHITE, rect.center, GRID_SIZE // 4)
+    
+    pygame.draw.rect(sprite, BLACK, rect, 1)
+    return sprite
+
+def entity_sprite(entity):
+    key = (entity.kind, getattr(entity, "type", None), getattr(entity, "points", None))
+    if key not in ENTITY_SPRITES:
+        ENTITY_SPRITES[key] = build_entity_sprite(*key)
+    return ENTITY_SPRITES[key]
+
+def draw_entities(surface, entities, offset=(0, 0)):
+    """Еда и препятствия: один вызов blits на каждый вид сущностей.
+    
+    Возвращает список нарисованных клеток (для обновления участков экрана).
+    """
+    rects = []
+    for group in entities.kinds.values():
+        rects.extend(surface.blits([
+            (entity_sprite(entity), (entity.position[0] * GRID_SIZE - offset[0],
+                                     entity.position[1] * GRID_SIZE - offset[1]))
+            for entity in group]))
+    return rects
+
+class DirtyRectRenderer:
+    """Отрисовка игры с обновлением только изменившихся участков экрана.
+
+    Статичная часть кадра (фон, пазлы, сетка) хранится в отдельной
+    поверхности. Каждый кадр из нее восстанавливаются клетки, где змейка
+    и еда были нарисованы в прошлый раз, а в present уходят
+    только эти прямоугольники. При открытии пазла кадр рисуется целиком.
+    """
+    def __init__(self, surface):
+        self.surface = surface
+        self.scene = pygame.Surface(surface.get_size())
+        self.scene_state = None
+        self.hud_state = None
+        self.hud_rect = None
+        self.previous_rects = []
+        self.full_redraw = True
+
+    def invalidate(self):
+        """Следующий кадр будет нарисован целиком"""
+        self.full_redraw = True
+
+    def draw_entities(self, snake, entities, alpha=1.0):
+        rects = snake.draw(self.surface, alpha)
+        rects.extend(draw_entities(self.surface, entities))
+        return rects
+
+    def render(self, snake, entities, background, puzzle_cover, level_index, game_won, alpha=1.0):
+        scene_state = (id(background), frozenset(snake.revealed_puzzles),
+                       tuple(snake.available_puzzles), game_won)
+        hud_state = (snake.score, len(snake.revealed_puzzles), level_index,
+                     TOTAL_PUZZLES_COLLECTED, game_won)
+
+        if self.full_redraw or scene_state != self.scene_state:
+            draw_puzzle_overlay(self.scene, snake.revealed_puzzles, background, puzzle_cover,
+                                snake.available_puzzles, game_won)
+            draw_grid(self.scene)
+            self.surface.blit(self.scene, (0, 0))
+            self.previous_rects = self.draw_entities(snake, entities, alpha)
+            self.hud_rect = show_score(self.surface, snake.score, snake.revealed_puzzles,
+                                       level_index, game_won)
+            self.scene_state = scene_state
+            self.hud_state = hud_state
+            self.full_redraw = False
+            present()
+            return
+
+        # Стираем змейку и еду с прошлого кадра
+        old_rects = self.previous_rects
+        for rect in old_rects:
+            self.surface.blit(self.scene, rect, rect)
+        new_rects = self.draw_entities(snake, entities, alpha)
+        dirty_rects = old_rects + new_rects
+
+        # Счет рисуется поверх змейки - обновляем его при смене текста
+        # или если змейка проползла под ним
+        if (hud_state != self.hud_state or self.hud_rect.collidelist(old_rects) != -1
+                or self.hud_rect.collidelist(new_rects) != -1):
+            old_hud_rect = self.hud_rect
+            self.surface.blit(self.scene, old_hud_rect, old_hud_rect)
+            self.surface.set_clip(old_hud_rect)
+            self.draw_entities(snake, entities, alpha)
+            self.surface.set_clip(None)
+            self.hud_rect = show_score(self.surface, snake.score, snake.revealed_puzzles,
+                                       level_index, game_won)
+            self.hud_state = hud_state
+            dirty_rects.append(old_hud_rect.union(self.hud_rect))
+
+        self.previous_rects = new_rects
+        present(dirty_rects)
+
+def stretched_span(start, end, source_length, area_length):
+    """Отрезок исходной картинки для отрезка [start, end) ее растянутой копии.
+    
+    Возвращает (начало и длина в исходной картинке, начало и длина после
+    smoothscale) так, чтобы куски совпадали с растяжением картинки
+    целиком: при увеличении smoothscale ставит крайние пиксели точно на
+    края, при уменьшении усредняет пиксели с выравниванием по краям.
+    """
+    if source_length >= area_length or source_length == 1:
+        scale = source_length / area_length
+        first = int(start * scale)
+        last = min(source_length, math.ceil(end * scale))
+        return first, last - first, round(first / scale), max(1, round((last - first) / scale))
+    scale = (source_length - 1) / (area_length - 1)
+    first = min(int(start * scale), source_length - 2)
+    last = max(min(source_length - 1, math.ceil((end - 1) * scale)), first + 1)
+    return first, last - first + 1, round(first / scale), round((last - first) / scale) + 1
+
+def blit_stretched_part(dest, source, area, clip):
+    """Часть картинки source, растянутой на area, которая попадает в clip.
+    
+    Рисуется в dest с началом координат в clip.topleft. Масштабируется
+    только нужный кусок исходной картинки, поэтому растягивать можно
+    на поле любого размера, а соседние куски сходятся без швов.
+    """
+    part = area.clip(clip)
+    if not part.width or not part.height:
+        return
+    left, width, x, scaled_width = stretched_span(part.left - area.left, part.right - area.left,
+                                                  source.get_width(), area.width)
+    top, height, y, scaled_height = stretched_span(part.top - area.top, part.bottom - area.top,
+                                                   source.get_height(), area.height)
+    scaled = pygame.transform.smoothscale(source.subsurface((left, top, width, height)),
+                                          (scaled_width, scaled_height))
+    dest.blit(scaled, (area.left + x - clip.left, area.top + y - clip.top))
+
+class ChunkedBoardRenderer:
+    """Отрисовка поля больше окна: камера и кэш готовых кусков поля.
+    
+    Поле делится на куски CHUNK_CELLS x CHUNK_CELLS клеток. Кусок (фон,
+    пазлы, сетка) рисуется один раз и хранится, пока не изменится
+    состояние задевающих его регионов пазлов; в кадр попадают только
+    куски, которые видит камера. Картинка уровня и регионы пазлов
+    растягиваются на все поле. Змейка и еда рисуются поверх со сдвигом
+    камеры, сегменты вне кадра пропускаются.
+    """
+    def __init__(self, surface, board):
+        self.surface = surface
+        self.world = pygame.Rect(0, 0, board[0] * GRID_SIZE, board[1] * GRID_SIZE)
+        self.chunk_size = CHUNK_CELLS * GRID_SIZE
+        self.regions = get_puzzle_regions(self.world.size)
+        self.chunks = OrderedDict()  # (столбец, строка) -> (состояние, Surface)
+        self.chunk_regions = {}      # (столбец, строка) -> регионы, задевающие кусок
+        self.label_backgrounds = {}
+    
+    def invalidate(self):
+        """Совместимость с DirtyRectRenderer: кадр и так рисуется целиком"""
+    
+    def camera(self, snake, alpha):
+        """Видимая часть поля: окно с центром на голове змейки"""
+        x, y = snake.segment_position(0, alpha)
+        view = self.surface.get_rect(center=(x + GRID_SIZE // 2, y + GRID_SIZE // 2))
+        # Не выходим за край поля (меньшее окна поле - по центру)
+        return view.clamp(self.world)
+    
+    def chunk_rect(self, key):
+        return pygame.Rect(key[0] * self.chunk_size, key[1] * self.chunk_size,
+                           self.chunk_size, self.chunk_size)
+    
+    def get_chunk(self, key, background, puzzle_cover, revealed, available, game_won):
+        """Готовый кусок поля (перерисовывается при смене его пазлов)"""
+        if key not in self.chunk_regions:
+            rect = self.chunk_rect(key)
+            self.chunk_regions[key] = [i for i, region in enumerate(self.regions) if region.colliderect(rect)]
+        regions = self.chunk_regions[key]
+        state = (id(background), id(puzzle_cover), game_won,
+                 tuple((i in revealed, i in available) for i in regions))
+        
+        cached = self.chunks.get(key)
+        if cached is not None:
+            self.chunks.move_to_end(key)
+            if cached[0] == state:
+                return cached[1]
+        chunk = cached[1] if cached is not None else pygame.Surface((self.chunk_size, self.chunk_size))
+        self.draw_chunk(chunk, self.chunk_rect(key), regions, background, puzzle_cover,
+                        revealed, available, game_won)
+        self.chunks[key] = (state, chunk)
+        if len(self.chunks) > CHUNK_CACHE_SIZE:
+            self.chunks.popitem(last=False)
+        return chunk
+    
+    def draw_chunk(self, chunk, rect, regions, background, puzzle_cover, revealed, available, game_won):
+        if background is None:
+            chunk.fill((30, 30, 60))
+        else:
+            blit_stretched_part(chunk, background, self.world, rect)
+        if not game_won:
+            for i in regions:
+                region = self.regions[i]
+                local = region.move(-rect.x, -rect.y)
+                if i not in revealed:
+                    blit_stretched_part(chunk, puzzle_cover, region, rect)
+                    if i in available:
+                        draw_puzzle_label(chunk, i, local, (200, 200, 200), 200, self.label_backgrounds)
+                else:
+                    pygame.draw.rect(chunk, WHITE, local, 3)
+                    draw_puzzle_label(chunk, i, local, WHITE, 150, self.label_backgrounds)
+        chunk.blit(get_grid_overlay(chunk.get_size(), GRID_SIZE), (0, 0))
+    
+    def render(self, snake, entities, background, puzzle_cover, level_index, game_won, alpha=1.0):
+        view = self.camera(snake, alpha)
+        if not self.world.contains(view):
+            self.surface.fill(BLACK)
+        
+        first_col, first_row = max(0, view.left // self.chunk_size), max(0, view.top // self.chunk_size)
+        last_col = (min(view.right, self.world.right) - 1) // self.chunk_size
+        last_row = (min(view.bottom, self.world.bottom) - 1) // self.chunk_size
+        for row in range(first_row, last_row + 1):
+            for col in range(first_col, last_col + 1):
+                chunk = self.get_chunk((col, row), background, puzzle_cover, snake.revealed_puzzles,
+                                       snake.available_puzzles, game_won)
+                rect = self.chunk_rect((col, row))
+                visible = rect.clip(self.world)
+                self.surface.blit(chunk, (visible.x - view.x, visible.y - view.y),
+                                  visible.move(-rect.x, -rect.y))
+        
+        snake.draw(self.surface, alpha, view.topleft)
+        draw_entities(self.surface, entities, view.topleft)
+        show_score(self.surface, snake.score, snake.revealed_puzzles, level_index, game_won)
+        present()
+
+def create_game(level_index, progress):
+    """Новая партия на уровне с рисуемой змейкой"""
+    width, height = board_size()
+    return snake_core.SnakeGame(level_index, progress, width, height, snake_cls=Snake)
+
+def play_sound(sounds, name):
+    if sounds.get(name):
+        sounds[name].play()
+
+def handle_game_events(events, sounds, progress):
+    """Звуки, сообщения и сохранение прогресса по событиям игры"""
+    global TOTAL_PUZZLES_COLLECTED
+    for name, value in events:
+        if name == "puzzle_open":
+            TOTAL_PUZZLES_COLLECTED = progress.total_puzzles
+            play_sound(sounds, "puzzle_open")
+            print(f"Открыт пазл {value + 1}! Всего: {TOTAL_PUZZLES_COLLECTED}")
+            record_progress_event("puzzle_collected", puzzle=value,
+                                  total_puzzles=TOTAL_PUZZLES_COLLECTED)
+        elif name == "level_completed":
+            play_sound(sounds, "win")
+            print(f"Уровень пройден! Всего пазлов: {TOTAL_PUZZLES_COLLECTED}")
+            record_progress_event("level_completed", level=value)
+        elif name == "level_unlock":
+            play_sound(sounds, "level_unlock")
+            print(f"Открыт новый уровень: {LEVELS[value]['name']}!")
+            record_progress_event("level_unlocked", level=value)
+        elif name == "eat":
+            play_sound(sounds, "eat")
+        elif name == "board_full":
+            print("Поле заполнено!")
 
 def play_game(level_index):
     """Запуск игры на выбранном уровне"""
@@ -1392,150 +2428,177 @@ def play_game(level_index):
     # Загружаем фон для выбранного уровня
     background = load_background_for_level(level_index)
     
-    # Создаем змейку и еду
-    snake = Snake(sounds, level_index)
-    food = Food()
+    # Создаем партию (змейку и еду)
+    progress = snake_core.Progress(LEVELS, TOTAL_PUZZLES_COLLECTED)
+    game = create_game(level_index, progress)
     
     # Игровые переменные
-    game_over = False
-    game_won = False
     game_over_sound_played = False
     win_sound_played = False
+    best_score = None
     clock = pygame.time.Clock()
+    # Поле больше окна рисуется кусками через камеру
+    board = board_size()
+    large_board = board[0] > GRID_WIDTH or board[1] > GRID_HEIGHT
+    renderer = ChunkedBoardRenderer(screen, board) if large_board else DirtyRectRenderer(screen)
+    
+    # Логика идет с шагом tick_time (SNAKE_SPEED тиков в секунду), а кадры
+    # рисуются с частотой RENDER_FPS; накопитель хранит время, которое
+    # еще не отработано тиками
+    tick_time = 1.0 / SNAKE_SPEED
+    accumulator = 0.0
     
     # Основной игровой цикл
     while True:
-        for event in pygame.event.get():
+        frame_time = clock.tick(RENDER_FPS) / 1000
+        
+        # Ввод читается каждый кадр, повороты копятся в очереди партии
+        restart = False
+        for event in map(to_logical, pygame.event.get()):
             if event.type == pygame.QUIT:
                 return "quit"
                 
             if event.type == pygame.KEYDOWN:
-                if game_over or game_won:
+                if game.finished:
                     # Обработка на экране завершения
-                    pass
+                    if game.game_over and event.key == pygame.K_r:
+                        restart = True
+                    elif game.game_over and event.key == pygame.K_ESCAPE:
+                        # Возврат к выбору уровня
+                        return "menu"
                 else:
-                    if event.key == pygame.K_UP:
-                        snake.change_direction((0, -1))
-                    elif event.key == pygame.K_DOWN:
-                        snake.change_direction((0, 1))
-                    elif event.key == pygame.K_LEFT:
-                        snake.change_direction((-1, 0))
-                    elif event.key == pygame.K_RIGHT:
-                        snake.change_direction((1, 0))
+                    if event.key in DIRECTION_KEYS:
+                        game.queue_direction(DIRECTION_KEYS[event.key])
                     elif event.key == pygame.K_SPACE:
                         # Пауза музыки
-                        if pygame.mixer.music.get_busy():
-                            pygame.mixer.music.pause()
-                        else:
-                            pygame.mixer.music.unpause()
+                        toggle_music_pause()
                     elif event.key == pygame.K_ESCAPE:
                         # Возврат в меню
                         return "menu"
         
+        if restart:
+            # Перезапуск уровня
+            game = create_game(level_index, progress)
+            game_over_sound_played = False
+            win_sound_played = False
+            accumulator = 0.0
+            renderer.invalidate()
+            restart_music()
+            continue
+        
         # Игровая логика
-        if not game_over and not game_won:
-            game_over = snake.move()
-            game_won = snake.game_won
+        if not game.finished:
+            # После долгой паузы (загрузка, перетаскивание окна) не
+            # догоняем пропущенное время десятками тиков подряд
+            accumulator += min(frame_time, MAX_FRAME_TIME)
+            while accumulator >= tick_time and not game.finished:
+                handle_game_events(game.step(), sounds, progress)
+                accumulator -= tick_time
+                if game.finished:
+                    best_score = record_high_score(level_index, game.snake.score,
+                                                   len(game.snake.revealed_puzzles))
+            if game.game_over:
+                continue
             
             # Проверяем открытие новых уровней
-            if snake.new_level_unlocked:
+            if game.snake.new_level_unlocked:
                 # Показываем уведомление об открытии уровня
-                show_level_unlocked(screen, snake.unlocked_level_index)
-                snake.new_level_unlocked = False
+                if not show_level_unlocked(screen, game.snake.unlocked_level_index):
+                    return "quit"
+                game.snake.new_level_unlocked = False
+                renderer.invalidate()
+                clock.tick()
             
-            if game_won and not win_sound_played:
-                pygame.mixer.music.stop()
-                if sounds.get("win"):
-                    sounds["win"].play()
+            if game.game_won and not win_sound_played:
+                stop_music()
+                play_sound(sounds, "win")
                 win_sound_played = True
             
-            # Проверяем съедание еды
-            if not game_won and snake.get_head_position() == food.position:
-                snake.grow(food.points)
-                food = Food()
-                while food.position in snake.positions:
-                    food.randomize_position()
-            
-            # Отрисовка
-            draw_puzzle_overlay(screen, snake.revealed_puzzles, background, puzzle_cover, 
-                              snake.available_puzzles, game_won)
-            draw_grid(screen)
-            snake.draw(screen)
-            food.draw(screen)
-            show_score(screen, snake.score, snake.revealed_puzzles, level_index, game_won)
-            pygame.display.update()
-            
-            clock.tick(SNAKE_SPEED)  # Используем настройку скорости
-        
-        elif game_won:
+            # Отрисовка: змейка между прошлой и текущей клеткой
+            alpha = 1.0 if game.finished else accumulator / tick_time
+            if large_board or DIRTY_RECT_RENDERING:
+                renderer.render(game.snake, game.entities, background, puzzle_cover, level_index,
+                                game.game_won, alpha)
+            else:
+                draw_puzzle_overlay(screen, game.snake.revealed_puzzles, background, puzzle_cover, 
+                                  game.snake.available_puzzles, game.game_won)
+                draw_grid(screen)
+                game.snake.draw(screen, alpha)
+                draw_entities(screen, game.entities)
+                show_score(screen, game.snake.score, game.snake.revealed_puzzles, level_index, game.game_won)
+                present()
+        
+        elif game.game_won:
             # Показ экрана завершения уровня
             next_level_available = (level_index + 1 < len(LEVELS) and 
                                   LEVELS[level_index + 1]["unlocked"])
-            action = show_level_completed(screen, snake.score, level_index, next_level_available)
+            action = show_level_completed(screen, game.snake.score, level_index, next_level_available)
             
             if action == "next_level":
                 # Переходим на следующий уровень
                 level_index += 1
                 background = load_background_for_level(level_index)
-                snake = Snake(sounds, level_index)
-                food = Food()
-                game_over = False
-                game_won = False
+                game = create_game(level_index, progress)
                 game_over_sound_played = False
                 win_sound_played = False
+                renderer.invalidate()
                 # Перезапускаем музыку
-                pygame.mixer.music.play(-1)
-                pygame.mixer.music.set_volume(MUSIC_VOLUME)
+                restart_music()
             elif action == "menu":
                 # Возвращаемся к выбору уровня
                 return "menu"
             elif action == "restart":
                 # Перезапускаем текущий уровень
-                snake = Snake(sounds, level_index)
-                food = Food()
-                game_over = False
-                game_won = False
+                game = create_game(level_index, progress)
                 game_over_sound_played = False
                 win_sound_played = False
+                renderer.invalidate()
                 # Перезапускаем музыку
-                pygame.mixer.music.play(-1)
-                pygame.mixer.music.set_volume(MUSIC_VOLUME)
+                restart_music()
             elif action is None:
                 pygame.quit()
                 return "quit"
+            accumulator = 0.0
+            clock.tick()
                 
         else:
-            pygame.mixer.music.stop()
+            stop_music()
             
             if not game_over_sound_played and sounds.get("game_over"):
                 sounds["game_over"].play()
                 game_over_sound_played = True
             
-            # Обработка нажатий на экране game over
-            show_game_over(screen, snake.score, snake.revealed_puzzles, background, 
-                         puzzle_cover, snake.available_puzzles, level_index)
-            
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    pygame.quit()
-                    return "quit"
-                if event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_r:
-                        # Перезапуск уровня
-                        snake = Snake(sounds, level_index)
-                        food = Food()
-                        game_over = False
-                        game_won = False
-                        game_over_sound_played = False
-                        win_sound_played = False
-                        pygame.mixer.music.play(-1)
-                        pygame.mixer.music.set_volume(MUSIC_VOLUME)
-                    elif event.key == pygame.K_ESCAPE:
-                        # Возврат к выбору уровня
-                        return "menu"
+            # Экран game over ждет R или ESC, не перерисовываясь каждый кадр
+            action = show_game_over(screen, game.snake.score, game.snake.revealed_puzzles, background, 
+                                    puzzle_cover, game.snake.available_puzzles, level_index, best_score)
+            if action is None:
+                return "quit"
+            elif action == "menu":
+                return "menu"
+            game = create_game(level_index, progress)
+            game_over_sound_played = False
+            win_sound_played = False
+            accumulator = 0.0
+            renderer.invalidate()
+            restart_music()
+            clock.tick()
 
 def main():
     """Главная функция игры"""
+    global BOARD_SIZE, DIRTY_RECT_RENDERING
+    parser = argparse.ArgumentParser(description="Змейка - Собери мир!")
+    parser.add_argument("--fullscreen", action="store_true",
+                        help="на весь экран (кадр растягивается с сохранением пропорций)")
+    parser.add_argument("--board", default=None,
+                        help="размер поля в клетках, например 500x500 (большая арена с камерой)")
+    parser.add_argument("--dirty-rects", action="store_true",
+                        help="перерисовывать в игре только изменившиеся участки экрана (для слабых машин)")
+    args = parser.parse_args()
+    if args.board:
+        BOARD_SIZE = tuple(int(value) for value in args.board.lower().split("x"))
+    DIRTY_RECT_RENDERING = args.dirty_rects or DIRTY_RECT_RENDERING
+    init_game(args.fullscreen or FULLSCREEN)
+    
     # Загружаем прогресс
     load_progress()
     
@@ -1592,6 +2655,7 @@ def main():
     
     # Сохраняем прогресс перед выходом
     save_progress()
+    get_progress_store().close()
     pygame.quit()
 
 if __name__ == "__main__":
@@ -0,0 +1,53 @@
+import random
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import batch_sim
+import snake_core
+
+N_GAMES = 1000
+MAX_TICKS = 5000
+
+
+def play_core(level_index, width, height, seed):
+    """Итоги N_GAMES партий snake_core.SnakeGame с жадной стратегией"""
+    rng = random.Random(seed)
+    score, won, ticks = [], [], []
+    for _ in range(N_GAMES):
+        game = snake_core.SnakeGame(level_index, snake_core.Progress(snake_core.copy_levels()),
+                                    width, height, rng=rng)
+        while not game.finished and game.ticks < MAX_TICKS:
+            game.step(snake_core.greedy_action(game))
+        score.append(game.snake.score)
+        won.append(game.game_won)
+        ticks.append(game.ticks)
+    return np.array(score), np.array(won), np.array(ticks)
+
+
+@pytest.mark.parametrize("level_index", [2, 4])
+def test_batch_matches_snake_game_with_obstacles(level_index):
+    """Несколько единиц еды и препятствия: та же статистика, что у SnakeGame"""
+    width, height = 30, 20
+    score, won, ticks = play_core(level_index, width, height, seed=1)
+    sim = batch_sim.BatchSnakeSim(N_GAMES, width, height, level_index=level_index, seed=1)
+    summary = sim.run(MAX_TICKS)
+
+    assert summary["score"].mean() == pytest.approx(score.mean(), rel=0.06)
+    assert summary["game_won"].mean() == pytest.approx(won.mean(), abs=0.04)
+    # Среднее число тиков зависит от редких зацикленных партий, медиана - нет
+    assert np.median(summary["ticks"]) == pytest.approx(np.median(ticks), rel=0.1)
+
+
+def test_obstacles_stay_on_free_cells():
+    """Препятствия не совпадают с едой, а движущиеся не пропадают с поля"""
+    level = snake_core.LEVELS[4]
+    sim = batch_sim.BatchSnakeSim(200, 30, 20, level_index=4, seed=2)
+    for _ in range(50):
+        sim.step(sim.greedy_actions())
+        games = sim.active
+        obstacles = (sim.visit[games] == batch_sim.OBSTACLE).sum(axis=1)
+        assert (obstacles == level["obstacles"] + level["moving_obstacles"]).all()
+        food = sim.food_cell[games]
+        assert (sim.visit[games[:, None], food] != batch_sim.OBSTACLE).all()
@@ -0,0 +1,44 @@
+import ast
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHECK_PROGRESS = """
+import test
+test.load_progress()
+print([(level["unlocked"], level["completed"]) for level in test.LEVELS])
+print(test.TOTAL_PUZZLES_COLLECTED)
+"""
+
+
+def tracked_files():
+    try:
+        result = subprocess.run(["git", "ls-files"], cwd=REPO_ROOT,
+                                capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        pytest.skip("нужен git-репозиторий")
+    return result.stdout.splitlines()
+
+
+def test_clean_checkout_starts_at_first_level(tmp_path):
+    """Чистый клон начинает с открытым первым уровнем и без пазлов"""
+    for name in tracked_files():
+        target = tmp_path / name
+        target.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy2(os.path.join(REPO_ROOT, name), target)
+
+    env = dict(os.environ, SDL_VIDEODRIVER="dummy", SDL_AUDIODRIVER="dummy")
+    result = subprocess.run([sys.executable, "-c", CHECK_PROGRESS], cwd=tmp_path,
+                            env=env, capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    levels, total_puzzles = result.stdout.strip().splitlines()[-2:]
+
+    levels = ast.literal_eval(levels)
+    assert levels[0] == (True, False)
+    assert all(level == (False, False) for level in levels[1:])
+    assert total_puzzles == "0"
@@ -0,0 +1,186 @@
+"""Пакет текстур уровней: заранее декодированные картинки в одном файле.
+
+Упаковщик (python texture_pack.py) один раз декодирует фоны уровней,
+масштабирует их до размера окна, рисует фоны и обложку по умолчанию и
+записывает пиксели без сжатия в формате экрана вместе с оглавлением.
+Игра отображает файл в память (mmap) и строит поверхности прямо на
+отображенных страницах через pygame.image.frombuffer - без декодирования
+JPEG, масштабирования и копирования пикселей.
+
+Формат файла:
+    MAGIC, длина оглавления (4 байта, little-endian), оглавление в JSON,
+    затем картинки, каждая с начала страницы (PAGE_SIZE байт).
+Запись оглавления: имя -> offset (от начала области картинок), width,
+height, pitch, format и для картинок из файлов source = [mtime_ns, size]
+исходного файла.
+"""
+import argparse
+import json
+import mmap
+import os
+import struct
+
+import pygame
+
+MAGIC = b"SNAKEPK1"
+PAGE_SIZE = 4096
+# Порядок байт BGRA совпадает с 32-битным XRGB8888 экрана на little-endian
+PIXEL_FORMAT = "BGRA"
+BYTES_PER_PIXEL = 4
+
+def entry_name(name, size=None):
+    """Имя записи: файл или сгенерированная картинка, с размером для масштабированных"""
+    return name if size is None else f"{name}@{size[0]}x{size[1]}"
+
+def source_stamp(path):
+    """Время изменения и размер исходного файла или None, если файла нет"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+def align(offset):
+    return (offset + PAGE_SIZE - 1) // PAGE_SIZE * PAGE_SIZE
+
+def data_offset(header_size):
+    """Начало области картинок: первая страница после оглавления"""
+    return align(len(MAGIC) + 4 + header_size)
+
+def write_pack(path, images):
+    """Запись пакета; images - список (имя, Surface, исходный файл или None)"""
+    index = {}
+    blobs = []
+    offset = 0
+    for name, surface, source in images:
+        pixels = pygame.image.tobytes(surface, PIXEL_FORMAT)
+        width, height = surface.get_size()
+        index[name] = {
+            "offset": offset,
+            "width": width,
+            "height": height,
+            "pitch": width * BYTES_PER_PIXEL,
+            "format": PIXEL_FORMAT,
+        }
+        if source is not None:
+            index[name]["source"] = source_stamp(source)
+        blobs.append(pixels)
+        offset = align(offset + len(pixels))
+
+    header = json.dumps(index, ensure_ascii=False).encode("utf-8")
+    data_start = data_offset(len(header))
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<I", len(header)))
+        f.write(header)
+        for (name, _, _), pixels in zip(images, blobs):
+            f.seek(data_start + index[name]["offset"])
+            f.write(pixels)
+        f.truncate(align(f.tell()))
+    os.replace(tmp_path, path)
+    return index
+
+class TexturePack:
+    """Открытый пакет текстур; поверхности ссылаются на отображенный файл.
+
+    Файл отображается с access=ACCESS_COPY: рисование на поверхности
+    не меняет файл, а страницы копируются только при записи в них.
+    Отображение не закрывается, пока живы поверхности.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        try:
+            self.mapping = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_COPY)
+            if self.mapping[:len(MAGIC)] != MAGIC:
+                raise ValueError("неверная сигнатура")
+            (header_size,) = struct.unpack_from("<I", self.mapping, len(MAGIC))
+            start = len(MAGIC) + 4
+            self.index = json.loads(self.mapping[start:start + header_size].decode("utf-8"))
+            self.data_start = data_offset(header_size)
+        except Exception:
+            self.file.close()
+            raise
+        self.buffer = memoryview(self.mapping)
+        self.surfaces = {}
+
+    @classmethod
+    def open(cls, path):
+        """Пакет из файла или None, если файла нет или он поврежден"""
+        if not os.path.exists(path):
+            return None
+        try:
+            return cls(path)
+        except (OSError, ValueError, struct.error) as e:
+            print(f"Пакет текстур {path} не загружен: {e}")
+            return None
+
+    def is_fresh(self, name, source):
+        """Запись есть и собрана из текущей версии файла source.
+
+        Если исходного файла нет, запись считается верной - пакет
+        можно поставлять без исходных JPEG.
+        """
+        entry = self.index.get(name)
+        if entry is None:
+            return False
+        if source is None or "source" not in entry:
+            return True
+        stamp = source_stamp(source)
+        return stamp is None or stamp == entry["source"]
+
+    def surface(self, name, source=None):
+        """Поверхность поверх отображенных пикселей или None"""
+        if not self.is_fresh(name, source):
+            return None
+        if name not in self.surfaces:
+            entry = self.index[name]
+            size = (entry["width"], entry["height"])
+            offset = self.data_start + entry["offset"]
+            pixels = self.buffer[offset:offset + entry["pitch"] * entry["height"]]
+            surface = pygame.image.frombuffer(pixels, size, entry["format"])
+            # Альфа в пакете всегда 255: без попиксельного смешивания
+            # блит идет так же быстро, как у convert()
+            surface.set_alpha(None)
+            self.surfaces[name] = surface
+        return self.surfaces[name]
+
+def build_pack(path):
+    """Сборка пакета из картинок уровней и картинок по умолчанию игры"""
+    import test as game
+
+    game.init_game()
+    size = (game.WIDTH, game.HEIGHT)
+    images = []
+    for level_index, level in enumerate(game.LEVELS):
+        image = game.ASSETS.decode_image(level["background_file"])
+        if image is not None:
+            images.append((entry_name(level["background_file"], size),
+                           pygame.transform.scale(image, size), level["background_file"]))
+        seed = level["background_seed"]
+        images.append((entry_name(game.background_name(level_index, seed), size),
+                       game.create_level_background(level_index, seed, size), None))
+
+    for cover_path in ("puzzle_cover.jpg", "puzzle_cover.png"):
+        cover = game.ASSETS.decode_image(cover_path) if os.path.exists(cover_path) else None
+        if cover is not None:
+            images.append((entry_name(cover_path), cover, cover_path))
+    images.append((entry_name("default_puzzle_cover"), game.create_default_puzzle_cover(), None))
+
+    index = write_pack(path, images)
+    total = sum(entry["pitch"] * entry["height"] for entry in index.values())
+    print(f"Пакет {path}: {len(index)} картинок, {total / 2**20:.1f} МБ пикселей")
+
+def main():
+    parser = argparse.ArgumentParser(description="Сборка пакета текстур уровней")
+    parser.add_argument("--out", default=None, help="файл пакета (по умолчанию TEXTURE_PACK_FILE игры)")
+    args = parser.parse_args()
+
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    import test as game
+    build_pack(args.out or game.TEXTURE_PACK_FILE)
+
+if __name__ == "__main__":
+    main()